@@ -1,20 +1,31 @@
 import streamlit as st
+import html
 import json
-import re
-from src.llm import get_interaction_response, clean_json_string
-from src.generator import generate_anti_portfolio_html
+import threading
+from src.checkpoints import get_checkpoint_store
+from src.config import set_config
+from src.llm import (
+    warm_up_llm,
+    LLMError,
+    StructuredOutputError
+)
 from src.utils import extract_text_from_pdf, extract_text_from_url
-from src.prompts import (
-    SYSTEM_PROMPT_ARCHIVIST,
-    SYSTEM_PROMPT_CRITIC,
-    SYSTEM_PROMPT_DIRECTOR,
-    SYSTEM_PROMPT_SOKRATES,
-    SYSTEM_PROMPT_EXTRACTOR,
-    SYSTEM_PROMPT_TRAJECTORY_PREDICTOR
+from src.prompts import SYSTEM_PROMPT_ARCHIVIST
+from src.pipeline import (
+    COMPLETE,
+    GENERATING,
+    INTERVIEWING,
+    ONBOARDING,
+    PROCESSING,
+    EMPTY_INTRO,
+    EMPTY_TURN,
+    SokratesPipeline,
+    SokratesSession,
+    fetch_github
 )
-from src.github_analyzer import GitHubAnalyzer, get_github_analysis_prompt
-from src.maieutic_questions import get_phase_questions, generate_adaptive_question
-from src.multi_source_analyzer import MultiSourceAnalyzer, get_multi_source_analysis_prompt
+from src.step_runner import StepRunner
+from src.telemetry import start_metrics_server
+from src.tracing import activate
 
 # setup & configuration
 st.set_page_config(page_title="SOKRATES", layout="wide")
@@ -28,33 +39,97 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# initialize session state
-if "messages" not in st.session_state:
-    st.session_state.messages = []
-if "step" not in st.session_state:
-    st.session_state.step = "onboarding" # onboarding -> processing -> interviewing -> generating -> complete
-if "user_context" not in st.session_state:
-    st.session_state.user_context = ""
-if "patterns" not in st.session_state:
-    st.session_state.patterns = {}
-if "analysis_facts" not in st.session_state:
-    st.session_state.analysis_facts = ""
-if "analysis_tensions" not in st.session_state:
-    st.session_state.analysis_tensions = ""
-if "sokrates_interaction_id" not in st.session_state:
-    st.session_state.sokrates_interaction_id = None
-if "turn_count" not in st.session_state:
-    st.session_state.turn_count = 0
-if "github_data" not in st.session_state:
-    st.session_state.github_data = None
-if "github_analysis" not in st.session_state:
-    st.session_state.github_analysis = None
-if "multi_source_data" not in st.session_state:
-    st.session_state.multi_source_data = None
-if "multi_source_analysis" not in st.session_state:
-    st.session_state.multi_source_analysis = None
-if "user_api_key" not in st.session_state:
-    st.session_state.user_api_key = None
+# the engine gets st.secrets as an explicit config, shared by every session of this process
+@st.cache_resource
+def load_config():
+    try:
+        values = st.secrets.to_dict()
+    except FileNotFoundError:
+        values = {}  # no secrets.toml
+    return set_config(values)
+
+config = load_config()
+
+# warm up the pooled llm connection once per process (in the background so the first page isn't blocked)
+@st.cache_resource
+def start_llm_warm_up():
+    # local servers also load the model and cache the first agent's system prompt
+    thread = threading.Thread(
+        target=warm_up_llm, kwargs={"prefixes": [SYSTEM_PROMPT_ARCHIVIST], "config": config}, daemon=True
+    )
+    thread.start()
+    return thread
+
+start_llm_warm_up()
+
+# optional prometheus endpoint for llm call metrics (see pages/admin.py for the in-app view)
+@st.cache_resource
+def start_metrics_endpoint():
+    port = config.get("METRICS_PORT")
+    return start_metrics_server(int(port)) if port else None
+
+start_metrics_endpoint()
+
+def read_uploaded_file(uploaded_file):
+    """Text of an uploaded PDF or text file"""
+    if uploaded_file.type == "application/pdf":
+        return extract_text_from_pdf(uploaded_file)
+    return str(uploaded_file.read(), "utf-8")
+
+def show_llm_error(error):
+    """Reports a typed LLM failure and halts this run, so no error text reaches the next agent"""
+    st.error(f"The language model call failed: {error}")
+    if error.retryable:
+        st.caption("This looks temporary. Retrying usually works.")
+    # any click reruns the script, which repeats the failed step (finished agent calls come from the cache)
+    st.button("Retry")
+    st.stop()
+
+# waterfall colours per span category (see src.tracing)
+TRACE_COLORS = {
+    "step": "#444", "pipeline": "#6c8ebf", "stage": "#82b366", "llm": "#d79b00",
+    "http": "#9673a6", "io": "#b85450", "extract": "#23a6a6", "render": "#d6b656",
+}
+
+def render_trace_waterfall(trace):
+    """Debug panel: the session's spans as a waterfall, plus the Chrome trace download"""
+    rows = trace.waterfall()
+    total = max([row["start_ms"] + row["duration_ms"] for row in rows] + [1])
+    lines = []
+    for row in rows[-300:]:
+        left = 100 * row["start_ms"] / total
+        width = max(100 * row["duration_ms"] / total, 0.3)
+        color = TRACE_COLORS.get(row["category"], "#888")
+        lines.append(
+            f"<div style='font:11px monospace;white-space:nowrap;overflow:hidden' title='{html.escape(str(row['args']), quote=True)}'>"
+            f"<div style='display:inline-block;width:38%;overflow:hidden;text-overflow:ellipsis'>{html.escape(row['name'])}</div>"
+            f"<div style='display:inline-block;width:62%;position:relative;height:10px'>"
+            f"<div style='position:absolute;left:{left:.2f}%;width:{width:.2f}%;height:10px;background:{color}'></div></div>"
+            f"<div>{row['duration_ms']:.0f} ms</div></div>"
+        )
+    st.caption(f"{len(rows)} spans over {total / 1000:.1f} s (as of the start of this run)")
+    st.markdown("".join(lines), unsafe_allow_html=True)
+    st.download_button(
+        "Download Chrome trace",
+        data=json.dumps(trace.to_chrome()),
+        file_name=f"sokrates-trace-{trace.trace_id}.json",
+        mime="application/json"
+    )
+
+# initialize session state (everything the engine needs lives in one SokratesSession)
+checkpoints = get_checkpoint_store(config)
+if "sokrates" not in st.session_state:
+    # the session token in the url resumes a checkpointed session after a restart or on another replica
+    token = st.query_params.get("session")
+    resumed = SokratesPipeline.resume(token, checkpoints, config) if token and checkpoints else None
+    st.session_state.sokrates = resumed.session if resumed else SokratesSession()
+session = st.session_state.sokrates
+pipeline = SokratesPipeline(config, session, checkpoints=checkpoints)
+if checkpoints and session.step != ONBOARDING and st.query_params.get("session") != session.session_key:
+    st.query_params["session"] = session.session_key
+# every rerun is a new thread: spans recorded by this run (fetches, stages, extraction passes) go to the session trace
+if session.trace is not None:
+    activate(session.trace)
 
 # app interface flow
 
@@ -71,13 +146,20 @@ with st.sidebar:
         help="Get your free API key at https://aistudio.google.com/apikey"
     )
     if api_key_input:
-        st.session_state.user_api_key = api_key_input
+        if api_key_input != session.user_api_key:
+            # open the connection for the new key while the user fills in the form
+            threading.Thread(target=warm_up_llm, args=(api_key_input, None, config), daemon=True).start()
+        session.user_api_key = api_key_input
         st.success("API key configured")
     st.markdown("---")
     st.markdown("[Get a free API key](https://aistudio.google.com/apikey)")
+    # optional debug panel (TRACE_PANEL = true in secrets.toml)
+    if config.get("TRACE_PANEL", False) and session.trace is not None:
+        with st.expander("Session trace"):
+            render_trace_waterfall(session.trace)
 
 # step 1: onboarding (the "mindset reset")
-if st.session_state.step == "onboarding":
+if session.step == ONBOARDING:
     st.markdown("""
     **This is not a CV generator.** We are not looking for your job titles. We are looking for your *trajectory*.
     
@@ -96,167 +178,103 @@ if st.session_state.step == "onboarding":
         raw_input = st.text_area("Brain Dump / Bio / Notes", height=300)
     
     if st.button("Initialize Sokrates"):
-        # store user name
-        st.session_state.user_name = user_name.strip() if user_name else "Professional"
-        
-        combined_context = ""
+        uploaded_files = uploaded_files or []
+        urls = [url.strip() for url in (urls_input or "").split('\n') if url.strip()]
+
+        # github, files and urls are independent: fetch and parse them concurrently
+        runner = StepRunner(max_workers=8)
+        if github_username:
+            runner.add("github", fetch_github, username=github_username)
+        for index, uploaded_file in enumerate(uploaded_files):
+            runner.add(f"file-{index}", read_uploaded_file, uploaded_file=uploaded_file)
+        for index, url in enumerate(urls):
+            runner.add(f"url-{index}", extract_text_from_url, url=url)
+
+        with st.status("Gathering your sources...") as status:
+            for name, _ in runner.run():
+                if name == "github":
+                    st.write(f"GitHub activity for @{github_username} analyzed.")
+                elif name.startswith("file-"):
+                    st.write(f"Read {uploaded_files[int(name[5:])].name}.")
+                else:
+                    st.write(f"Fetched {urls[int(name[4:])]}.")
+            status.update(label="Sources gathered", state="complete")
+        sources = runner.results
 
         # process github analysis (optional but powerful)
+        github_data = None
         if github_username:
-            with st.spinner(f"Analyzing GitHub activity for @{github_username}..."):
-                try:
-                    analyzer = GitHubAnalyzer()
-                    github_data = analyzer.analyze_user(github_username)
-                    if github_data:
-                        st.session_state.github_data = github_data
-                        combined_context += f"\n--- GITHUB ANALYSIS ---\n"
-                        combined_context += f"Repositories: {len(github_data['project_complexity'])}\n"
-                        combined_context += f"Languages: {', '.join([lang['language'] for lang in github_data['language_evolution'][:5]])}\n"
-                        combined_context += f"Learning Pattern Signals Detected\n"
-                    else:
-                        st.warning(f"Could not analyze GitHub user @{github_username}")
-                except Exception as e:
-                    st.warning(f"GitHub analysis skipped: {str(e)}")
-
-        # process files
-        if uploaded_files:
-            for uploaded_file in uploaded_files:
-                if uploaded_file.type == "application/pdf":
-                    text = extract_text_from_pdf(uploaded_file)
-                    combined_context += f"\n--- FILE: {uploaded_file.name} ---\n{text}\n"
-                else: # txt
-                    text = str(uploaded_file.read(), "utf-8")
-                    combined_context += f"\n--- FILE: {uploaded_file.name} ---\n{text}\n"
-
-        # process urls
-        if urls_input:
-            urls = [url.strip() for url in urls_input.split('\n') if url.strip()]
-            for url in urls:
-                with st.spinner(f"Fetching {url}..."):
-                    text = extract_text_from_url(url)
-                    combined_context += text
-
-        # process raw input
-        if raw_input:
-            combined_context += f"\n--- USER NOTES ---\n{raw_input}\n"
-
-        if combined_context:
-            st.session_state.user_context = combined_context
-            st.session_state.step = "processing"
+            github_data, github_error = sources["github"]
+            if github_error:
+                st.warning(f"GitHub analysis skipped: {github_error}")
+            elif not github_data:
+                st.warning(f"Could not analyze GitHub user @{github_username}")
+
+        # assemble in input order so the context does not depend on which fetch finished first
+        has_input = pipeline.ingest(
+            github_data,
+            documents=[(uploaded_file.name, sources[f"file-{index}"]) for index, uploaded_file in enumerate(uploaded_files)],
+            url_texts=[sources[f"url-{index}"] for index in range(len(urls))],
+            notes=raw_input,
+            user_name=user_name.strip() if user_name else "Professional"
+        )
+
+        if has_input:
             st.rerun()
         else:
             st.warning("Please provide some input (File, URL, or Text) to proceed.")
 
 # step 1.5: processing (archivist & critic)
-elif st.session_state.step == "processing":
+elif session.step == PROCESSING:
     with st.status("Analyzing your professional DNA...", expanded=True) as status:
 
         # multi-source data extraction
         st.write("Extracting structured data from all sources...")
-        multi_analyzer = MultiSourceAnalyzer()
-        multi_source_data = multi_analyzer.analyze_text(st.session_state.user_context)
-        st.session_state.multi_source_data = multi_source_data
-
-        # extract key metrics (for context building, not displayed)
-        skills_found = multi_source_data['skills']['total_unique_skills']
-        projects_found = multi_source_data['projects']['total']
-        timeline_years = multi_source_data['timeline']['span']['total_years']
-
-        # agent 1: the archivist
-        st.write("Archivist is separating facts from narrative...")
-
-        # enhanced context with structured data
-        enhanced_context = f"""
-USER CONTENT:
-{st.session_state.user_context}
-
-STRUCTURED DATA EXTRACTED:
-- Timeline: {timeline_years} years of professional activity
-- Skills: {skills_found} unique skills across {len(multi_source_data['skills']['by_category'])} categories
-- Projects: {projects_found} projects identified
-- Education: {len(multi_source_data['education']['formal'])} formal degrees, {len(multi_source_data['education']['certifications'])} certifications
-- Learning Signals: {multi_source_data['learning_signals']['total']} growth indicators found
-- Career Progression: {multi_source_data['career_progression']['progression_detected']}
-
-Now extract the key FACTS from the content above.
-        """
-
-        facts, _ = get_interaction_response(
-            user_input=enhanced_context,
-            system_instruction=SYSTEM_PROMPT_ARCHIVIST
-        )
-        st.session_state.analysis_facts = facts
-        st.write("Facts extracted.")
-
-        # agent 2: the silent critic
-        st.write("Silent Critic is identifying tensions...")
-
-        # enhanced tensions analysis with structured data
-        tensions_context = f"""
-FACTS:
-{facts}
-
-DATA PATTERNS DETECTED:
-- Skill diversity: {multi_source_data['learning_velocity_indicators'].get('skill_diversity', {}).get('breadth_score', 'N/A')}% breadth
-- Average project complexity: {multi_source_data['projects'].get('complexity_distribution', {}).get('average', 'N/A')}
-- Learning signals: {multi_source_data['learning_signals']['by_type']}
-- Career progression: {multi_source_data['career_progression']['progression_detected']}
-
-Identify tensions and unanswered questions.
-        """
-
-        tensions, _ = get_interaction_response(
-            user_input=tensions_context,
-            system_instruction=SYSTEM_PROMPT_CRITIC
-        )
-        st.session_state.analysis_tensions = tensions
-        st.write("Tensions identified.")
+        try:
+            # each step starts as soon as its inputs are ready
+            for name, report in pipeline.analyze():
+                if name == "multi_source_data":
+                    # agent 1: the archivist
+                    st.write("Archivist is separating facts from narrative...")
+                elif name == "archivist":
+                    if report.total_cut:
+                        st.write(f"Context trimmed to budget ({report.summary()}).")
+                    st.write("Facts extracted.")
+                    # agent 2: the silent critic
+                    st.write("Silent Critic is identifying tensions...")
+                elif name == "critic":
+                    st.write("Tensions identified.")
+        except LLMError as e:
+            show_llm_error(e)
 
         status.update(label="Analysis Complete", state="complete", expanded=False)
     
-    # prepare sokrates context
-    initial_context = f"""
-    USER CONTEXT:
-    {st.session_state.user_context}
-    
-    ARCHIVIST REPORT (FACTS):
-    {st.session_state.analysis_facts}
-    
-    SILENT CRITIC REPORT (TENSIONS):
-    {st.session_state.analysis_tensions}
-    
-    Start the interview now.
-    """
-    
-    with st.spinner("Summoning Sokrates..."):
-        # first sokrates message (initializes the interaction id)
-        intro_msg, interaction_id = get_interaction_response(
-            user_input=initial_context, 
-            system_instruction=SYSTEM_PROMPT_SOKRATES
-        )
-    
-    # fallback if empty response (local model issue)
-    if not intro_msg or not intro_msg.strip():
-        intro_msg = "I have analyzed your background. Shall we begin?"
-    
-    # save the id for the conversation loop
-    st.session_state.sokrates_interaction_id = interaction_id
-    
-    # save to ui history
-    st.session_state.messages.append({"role": "assistant", "content": intro_msg})
-    
-    st.session_state.step = "interviewing"
+    # first sokrates message (initializes the interaction id), streamed as it is generated
+    with st.chat_message("assistant"):
+        intro_placeholder = st.empty()
+        try:
+            stream = pipeline.open_interview()
+            intro_placeholder.write_stream(stream)
+        except LLMError as e:
+            show_llm_error(e)
+
+        # saves the message and the id for the conversation loop, and starts the background analyses
+        intro = pipeline.finish_opening(stream)
+
+        # re-render if the filter had to restart the output (or the stream was empty)
+        if stream.replaced or intro == EMPTY_INTRO:
+            intro_placeholder.write(intro)
     st.rerun()
 
 # step 2: the maieutic conversation
-elif st.session_state.step == "interviewing":
+elif session.step == INTERVIEWING:
     
     # distinct visual container for the chat
     chat_container = st.container()
     
     # display chat history
     with chat_container:
-        for msg in st.session_state.messages:
+        for msg in session.messages:
             if msg["role"] != "system":
                 with st.chat_message(msg["role"]):
                     st.write(msg["content"])
@@ -264,93 +282,44 @@ elif st.session_state.step == "interviewing":
     # user input
     if prompt := st.chat_input("Your answer..."):
         # add user message to ui
-        st.session_state.messages.append({"role": "user", "content": prompt})
         with st.chat_message("user"):
             st.write(prompt)
             
         # generate ai response using the interaction id
         with st.chat_message("assistant"):
             response_placeholder = st.empty()
+
+            try:
+                # director output is internal, so it runs behind the spinner
+                with st.spinner("Thinking..."):
+                    stream = pipeline.answer(prompt)
+                # hard stop at turn 3 (accelerated mode)
+                if stream is None:
+                    st.rerun()
+                # streamed token by token; anything before '>>>' (incl. a fused directive) stays hidden
+                response_placeholder.write_stream(stream)
+            except LLMError as e:
+                # roll the turn back so the user can resend the same answer
+                pipeline.rollback_turn()
+                response_placeholder.empty()
+                show_llm_error(e)
+
+            full_response = pipeline.finish_turn(stream)
+
+            # re-render if the filter had to restart the output (or the stream was empty)
+            if stream.replaced or full_response == EMPTY_TURN:
+                response_placeholder.write(full_response)
             
-            # determine phase
-            st.session_state.turn_count += 1
-            turn = st.session_state.turn_count
-            
-            # hard stop at turn 3 (accelerated mode)
-            if turn >= 3:
-                st.session_state.step = "generating"
-                st.rerun()
-            
-            # --- director agent step ---
-            # the director decides what to ask based on the history
-            transcript = "\n".join([f"{m['role'].upper()}: {m['content']}" for m in st.session_state.messages[-4:]]) # last few turns
-            
-            # define phase for director
-            if turn == 1:
-                phase_context = "PHASE 1: ORIGINS. We need to know WHY they do what they do."
-            elif turn == 2:
-                phase_context = "PHASE 2: PROCESS. We need to know HOW they work (chaos vs structure)."
-            else:
-                phase_context = "PHASE 3: POTENTIAL. Test their limits with a hypothetical scenario."
-
-            director_input = f"""
-            CURRENT PHASE: {phase_context} (Turn {turn}/3)
-            TENSIONS: {st.session_state.analysis_tensions}
-            
-            RECENT HISTORY:
-            {transcript}
-            
-            USER JUST SAID: "{prompt}"
-            
-            Decide the next question directive.
-            """
-            
-            # combined spinner for both director and sokrates
-            with st.spinner("Thinking..."):
-                directive, _ = get_interaction_response(
-                    user_input=director_input,
-                    system_instruction=SYSTEM_PROMPT_DIRECTOR
-                )
-
-                # --- sokrates execution step ---
-                # sokrates phrases the question
-                sokrates_input = f"""
-                DIRECTIVE FROM DIRECTOR:
-                {directive}
-
-                USER ANSWER: {prompt}
-                """
-
-                full_response, new_id = get_interaction_response(
-                    user_input=sokrates_input,
-                    previous_interaction_id=st.session_state.sokrates_interaction_id
-                )
-
-                # fallback for empty response
-                if not full_response or not full_response.strip():
-                    full_response = "..."
-
-            # write response after spinner completes
-            response_placeholder.write(full_response)
-            
-            # update the id (though it usually stays the same for the same session, good practice to update)
-            if new_id:
-                st.session_state.sokrates_interaction_id = new_id
-            
-            if "[ANALYSIS COMPLETE]" in full_response:
-                st.session_state.step = "generating"
+            if session.step == GENERATING:
                 st.rerun()
-            else:
-                # response_placeholder.write(full_response) # Removed duplicate write
-                st.session_state.messages.append({"role": "assistant", "content": full_response})
 
 # step 3: the anti-portfolio reveal
-elif st.session_state.step == "generating":
+elif session.step == GENERATING:
     # show the conversation history in a subtle way during analysis
     st.markdown("### Analyzing Your Responses")
 
     with st.expander("Your Interview Transcript", expanded=False):
-        for msg in st.session_state.messages:
+        for msg in session.messages:
             if msg["role"] == "user":
                 st.markdown(f"**You**: {msg['content']}")
             elif msg["role"] == "assistant":
@@ -360,96 +329,37 @@ elif st.session_state.step == "generating":
     progress_bar = st.progress(0)
     status_text = st.empty()
 
-    # compile transcript from history
-    transcript = "\n".join([f"{m['role'].upper()}: {m['content']}" for m in st.session_state.messages if m['role'] != 'system'])
-
     progress_bar.progress(10)
     status_text.text("Analyzing interview patterns...")
 
-    # analyze github data if available
-    github_analysis_text = ""
-    if st.session_state.github_data:
-        progress_bar.progress(30)
-        status_text.text("Analyzing GitHub learning velocity...")
-        github_prompt = get_github_analysis_prompt(st.session_state.github_data)
-        github_analysis, _ = get_interaction_response(
-            user_input=github_prompt,
-            system_instruction="You are a data analyst. Extract learning patterns from GitHub data and return valid JSON only."
-        )
-        st.session_state.github_analysis = github_analysis
-        github_analysis_text = f"\n\nGITHUB LEARNING VELOCITY ANALYSIS:\n{github_analysis}\n"
-
-    # analyze multi-source data (cvs, portfolios, etc.)
-    multi_source_analysis_text = ""
-    if st.session_state.multi_source_data:
-        progress_bar.progress(50)
-        status_text.text("Analyzing professional background patterns...")
-        multi_source_prompt = get_multi_source_analysis_prompt(st.session_state.multi_source_data)
-        multi_source_analysis, _ = get_interaction_response(
-            user_input=multi_source_prompt,
-            system_instruction="You are a data analyst. Extract learning patterns from professional background data and return valid JSON only."
-        )
-        st.session_state.multi_source_analysis = multi_source_analysis
-        multi_source_analysis_text = f"\n\nPROFESSIONAL BACKGROUND ANALYSIS:\n{multi_source_analysis}\n"
-
-    # combine all data sources for comprehensive extraction
-    progress_bar.progress(70)
-    status_text.text("Extracting cognitive patterns and predictions...")
-
-    full_context = f"""Here is the interview transcript:
-
-{transcript}
-{github_analysis_text}
-{multi_source_analysis_text}
-
-INSTRUCTIONS:
-- Extract cognitive patterns from the interview
-- If GitHub analysis is present, integrate those learning velocity insights
-- If professional background analysis is present, integrate those career trajectory insights
-- Combine ALL available evidence for the most accurate predictions
-- Predict future growth trajectory based on ALL available evidence
-- Be specific with time estimates for learning new skills
-- Identify the high-leverage gap that would unlock next-level growth
-- Cross-reference insights from different data sources to validate patterns
-"""
-
-    # start fresh interaction for analysis (disconnecting from sokrates persona)
-    extraction, _ = get_interaction_response(
-        user_input=full_context,
-        system_instruction=SYSTEM_PROMPT_EXTRACTOR
-    )
-
-    progress_bar.progress(90)
-    status_text.text("Finalizing analysis...")
-
-    # clean json (mocking a parser for stability)
+    # the github and multi-source analyses were started in the background when processing finished;
+    # the extractor runs once both are in (its reply is constrained to EXTRACTOR_SCHEMA and validated)
+    progress_bar.progress(30)
+    status_text.text("Analyzing GitHub learning velocity and professional background...")
     try:
-        # use regex to find the json object within the text
-        json_match = re.search(r'\{.*\}', extraction, re.DOTALL)
-        if json_match:
-            clean_json = json_match.group(0)
-            # apply additional cleaning/repair
-            clean_json = clean_json_string(clean_json)
-
-            data = json.loads(clean_json)
-            st.session_state.patterns = data
-
-            progress_bar.progress(100)
-            status_text.text("Complete!")
-
-            st.session_state.step = "complete"
-            st.rerun()
-        else:
-            raise ValueError("No JSON found in response")
-    except Exception as e:
+        for stage in pipeline.generate():
+            if stage == "patterns":
+                progress_bar.progress(90)
+                status_text.text("Rendering your anti-portfolio...")
+            elif stage != "html":
+                # combine all data sources for comprehensive extraction
+                progress_bar.progress(60)
+                status_text.text("Extracting cognitive patterns and predictions...")
+    except LLMError as e:
         progress_bar.empty()
         status_text.empty()
-        st.error(f"Complex pattern detected. Raw output (Error: {str(e)}):")
-        st.write(extraction)
+        if isinstance(e, StructuredOutputError) and e.raw_text:
+            with st.expander("Raw model output"):
+                st.write(e.raw_text)
+        show_llm_error(e)
+
+    progress_bar.progress(100)
+    status_text.text("Complete!")
+
+    st.rerun()
 
 # step 4: final display (the deliverable) - ultra minimal
-elif st.session_state.step == "complete":
-    data = st.session_state.patterns
+elif session.step == COMPLETE:
 
     st.balloons()
 
@@ -464,7 +374,7 @@ elif st.session_state.step == "complete":
     col1, col2, col3 = st.columns([1, 2, 1])
 
     with col2:
-        html_content = generate_anti_portfolio_html(data, st.session_state.get('user_name', 'Professional'))
+        html_content = pipeline.render_html()
         st.download_button(
             "Download Your Anti-Portfolio",
             data=html_content,
@@ -480,7 +390,9 @@ elif st.session_state.step == "complete":
         st.markdown("---")
 
         if st.button("Start New Analysis", use_container_width=True):
+            pipeline.discard()
             st.session_state.clear()
+            st.query_params.clear()
             st.rerun()
 
     st.markdown("</div>", unsafe_allow_html=True)
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""
+Admin Page for SOKRATES
+Per-agent LLM latency, token and cost metrics for this server process
+"""
+
+import streamlit as st
+from src.config import get_config
+from src.llm import get_llm_endpoint_pool, get_llm_telemetry, get_response_cache
+
+st.set_page_config(page_title="SOKRATES Admin", layout="wide")
+st.title("LLM Telemetry")
+
+# the app's config (or secrets.toml when this page is opened first)
+config = get_config()
+
+# optional password gate (ADMIN_PASSWORD in secrets.toml)
+admin_password = config.get("ADMIN_PASSWORD")
+if admin_password and st.text_input("Admin password", type="password") != admin_password:
+    st.stop()
+
+telemetry = get_llm_telemetry(config)
+st.caption("Aggregated across all sessions since this server process started. Percentiles cover the last 1000 calls per agent, not counting response cache hits.")
+
+rows = telemetry.summary()
+if not rows:
+    st.info("No LLM calls recorded yet.")
+else:
+    total_cost = sum(row['cost_usd'] for row in rows)
+    total_calls = sum(row['calls'] for row in rows)
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Calls", total_calls)
+    col2.metric("Errors", sum(row['errors'] for row in rows))
+    col3.metric("Estimated cost", f"${total_cost:.4f}")
+
+    st.subheader("Per agent")
+    st.dataframe(rows, use_container_width=True)
+
+    st.subheader("Recent calls")
+    st.dataframe(
+        [
+            {
+                'agent': call['agent'],
+                'model': call['model'],
+                'queue_wait_s': round(call['queue_wait'], 3),
+                'ttft_s': round(call['ttft'], 3),
+                'latency_s': round(call['latency'], 3),
+                'input_tokens': call['input_tokens'],
+                'output_tokens': call['output_tokens'],
+                'cost_usd': round(call['cost_usd'], 6),
+                'cached': call['cached'],
+                'error': call['error'] or "",
+            }
+            for call in telemetry.recent_calls()
+        ],
+        use_container_width=True
+    )
+
+st.subheader("Response cache")
+st.json(get_response_cache(config).stats())
+
+# a replay never touches the endpoints, so the pool isn't started for it
+if config.get("LLM_PROVIDER", "google") == "local" and config.get("CASSETTE_MODE") != "replay":
+    st.subheader("Local endpoints")
+    st.dataframe(get_llm_endpoint_pool(config).stats(), use_container_width=True)
+
+col1, col2 = st.columns(2)
+with col1:
+    st.download_button(
+        "Download Prometheus metrics",
+        data=telemetry.to_prometheus(),
+        file_name="sokrates_metrics.prom",
+        mime="text/plain"
+    )
+with col2:
+    # resetting affects every session, so it needs the password gate
+    if st.button("Reset metrics", disabled=not admin_password, help=None if admin_password else "Set ADMIN_PASSWORD to enable"):
+        telemetry.reset()
+        st.rerun()
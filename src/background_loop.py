@@ -0,0 +1,75 @@
+"""
+Shared Background Event Loop for SOKRATES
+One asyncio loop on a daemon thread serves the async LLM calls of every session
+"""
+
+import asyncio
+import threading
+
+
+class BackgroundLoop:
+    """Runs an asyncio event loop forever on a daemon thread"""
+
+    def __init__(self, name="sokrates-llm-loop"):
+        self.name = name
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        """The running loop (started on first access)"""
+        with self._lock:
+            if self._loop is None or not self._thread.is_alive():
+                self._start()
+            return self._loop
+
+    def _start(self):
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.call_soon(ready.set)
+            self._loop.run_forever()
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=run, name=self.name, daemon=True)
+        self._thread.start()
+        ready.wait()
+
+    def submit(self, coro):
+        """
+        Schedule a coroutine on the loop from any thread.
+
+        Returns:
+            concurrent.futures.Future: call .result(timeout) to wait, .cancel() to cancel the task
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Submit a coroutine and block until it finishes (cancels it on timeout)"""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def stop(self):
+        """Stop the loop and wait for its thread to exit"""
+        with self._lock:
+            if self._loop is None:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop = None
+            self._thread = None
+
+
+# process-wide loop shared by all streamlit sessions
+_background_loop = BackgroundLoop()
+
+
+def get_background_loop():
+    """Return the process-wide background loop"""
+    return _background_loop
@@ -0,0 +1,130 @@
+"""
+Local Batch Worker for SOKRATES
+Runs OpenAI batch-format JSONL files (written by the local provider's submit_batch) against a local server
+
+Usage:
+    python -m src.batch_worker .sokrates_batches/batch-20250101-120000-abc123.input.jsonl
+    python -m src.batch_worker --dir .sokrates_batches --concurrency 4
+"""
+
+import argparse
+import glob
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.clients import LOCAL_BASE_URL, get_client
+
+
+def output_path_for(input_path):
+    """job.input.jsonl -> job.output.jsonl"""
+    if input_path.endswith(".input.jsonl"):
+        return input_path[:-len(".input.jsonl")] + ".output.jsonl"
+    return input_path + ".output.jsonl"
+
+
+def _done_ids(output_path):
+    """
+    custom_ids already answered successfully, so an interrupted batch resumes where
+    it stopped and failed requests are retried on the next run (the newer line wins).
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # a torn last line from a crash; the request is simply run again
+                continue
+            if not record.get('error'):
+                done.add(record['custom_id'])
+    return done
+
+
+def _run_request(client, record):
+    """One chat completion; returns the OpenAI batch output record"""
+    try:
+        completion = client.chat.completions.create(**record['body'])
+        return {
+            'custom_id': record['custom_id'],
+            'response': {'status_code': 200, 'body': completion.model_dump()},
+            'error': None
+        }
+    except Exception as e:
+        status = getattr(e, "status_code", None) or 500
+        return {
+            'custom_id': record['custom_id'],
+            'response': {'status_code': status, 'body': None},
+            'error': {'message': f"{type(e).__name__}: {str(e)}"}
+        }
+
+
+def run_batch_file(input_path, output_path=None, base_url=None, concurrency=4):
+    """
+    Runs every request in a batch input file that has no result yet.
+
+    Results are appended to the output file as they finish, one JSON line each.
+
+    Returns:
+        tuple: (requests run now, failed requests)
+    """
+    output_path = output_path or output_path_for(input_path)
+    done = _done_ids(output_path)
+
+    with open(input_path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    pending = [record for record in records if record['custom_id'] not in done]
+    if not pending:
+        return 0, 0
+
+    client = get_client("local", base_url=base_url or LOCAL_BASE_URL)
+    failed = 0
+
+    # terminate a torn last line so the next record starts on its own line
+    if os.path.exists(output_path) and os.path.getsize(output_path):
+        with open(output_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            torn = f.read(1) != b"\n"
+        if torn:
+            with open(output_path, "a") as out:
+                out.write("\n")
+
+    with open(output_path, "a") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(_run_request, client, record) for record in pending]
+        # write each result as soon as it is ready, so a crash loses at most the in-flight requests
+        for future in as_completed(futures):
+            result = future.result()
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+            if result['error']:
+                failed += 1
+
+    return len(pending), failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run SOKRATES local batch files against an OpenAI-compatible server.")
+    parser.add_argument("inputs", nargs="*", help="batch .input.jsonl files")
+    parser.add_argument("--dir", help="process every .input.jsonl file in this directory")
+    parser.add_argument("--base-url", default=LOCAL_BASE_URL, help=f"server URL (default {LOCAL_BASE_URL})")
+    parser.add_argument("--concurrency", type=int, default=4, help="parallel requests (default 4)")
+    args = parser.parse_args()
+
+    inputs = list(args.inputs)
+    if args.dir:
+        inputs.extend(sorted(glob.glob(os.path.join(args.dir, "*.input.jsonl"))))
+    if not inputs:
+        parser.error("give batch files or --dir")
+
+    for input_path in inputs:
+        ran, failed = run_batch_file(input_path, base_url=args.base_url, concurrency=args.concurrency)
+        print(f"{input_path}: {ran} requests run, {failed} failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Response Cache for SOKRATES
+Content-addressed caches for deterministic agent calls (Archivist, Critic, analyses) and rendered pages
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_cache_key(provider, model_name, system_instruction, user_input, response_schema=None, generation=None):
+    """
+    SHA-256 of the normalized request.
+
+    Whitespace at line ends and around the text is ignored, so prompts built from
+    indented f-strings hash the same regardless of formatting.
+    """
+    def normalize(text):
+        return "\n".join(line.strip() for line in (text or "").strip().splitlines())
+
+    request = {
+        "provider": provider,
+        "model": model_name,
+        "system_instruction": normalize(system_instruction),
+        "input": normalize(user_input),
+    }
+    # only structured calls carry a schema, so plain keys are unchanged
+    if response_schema:
+        request["response_schema"] = response_schema
+    # same for routed generation limits (max tokens, temperature, stop sequences)
+    if generation:
+        request["generation"] = generation
+    payload = json.dumps(request, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache: an in-memory LRU in front of an on-disk SQLite table.
+
+    Entries expire after ttl seconds. The memory tier is bounded by entry count,
+    the disk tier by total bytes (least recently used rows are dropped first).
+    """
+
+    def __init__(self, path=None, ttl=7 * 24 * 3600, max_memory_entries=256, max_disk_bytes=200 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self._db = None
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._db.commit()
+
+    def get(self, key):
+        """Return the cached value or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return entry[0]
+                del self._memory[key]
+
+            if self._db:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[1] > now:
+                    self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    self._remember(key, row[0], row[1])
+                    self._stats['disk_hits'] += 1
+                    return row[0]
+                if row:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self._stats['misses'] += 1
+            return None
+
+    def set(self, key, value):
+        """Store a value in both tiers"""
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+            self._stats['writes'] += 1
+
+            if self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (key, value, len(value.encode("utf-8")), expires_at, now)
+                )
+                self._evict_disk(now)
+                self._db.commit()
+
+    def _remember(self, key, value, expires_at):
+        """Insert into the memory tier (lock must be held)"""
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def _evict_disk(self, now):
+        """Drop expired rows, then least recently used rows beyond max_disk_bytes (lock must be held)"""
+        cursor = self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        self._stats['evictions'] += max(cursor.rowcount, 0)
+
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall():
+            if total <= self.max_disk_bytes:
+                break
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self._stats['evictions'] += 1
+
+    def clear(self):
+        """Remove every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            if self._db:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self):
+        """Hit/miss counters plus current sizes"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+            lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+            stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 3) if lookups else 0.0
+            return stats
+
+
+def make_render_key(data, user_name):
+    """SHA-256 of the patterns (key order ignored) and the user name"""
+    payload = json.dumps({"data": data, "user_name": user_name}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RenderCache:
+    """
+    In-memory LRU of rendered pages, bounded by total bytes.
+
+    get_or_render runs the renderer only on a miss; pages larger than the whole
+    budget are returned without being stored.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._pages = OrderedDict()  # key -> (page, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get_or_render(self, key, render):
+        with self._lock:
+            entry = self._pages.get(key)
+            if entry:
+                self._pages.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[0]
+            self._stats['misses'] += 1
+
+        # rendered outside the lock; if two sessions miss the same key, the first page stored is kept
+        page = render()
+        size = len(page.encode("utf-8"))
+        if size > self.max_bytes:
+            return page
+        with self._lock:
+            if key not in self._pages:
+                self._pages[key] = (page, size)
+                self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._pages.popitem(last=False)
+                self._bytes -= evicted
+                self._stats['evictions'] += 1
+        return page
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Hit/miss counters plus current sizes"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pages'] = len(self._pages)
+            stats['bytes'] = self._bytes
+            return stats
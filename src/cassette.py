@@ -0,0 +1,264 @@
+"""
+LLM Cassettes for SOKRATES
+Records agent calls to a JSONL file and replays them offline with simulated latency
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+
+from src.response_text import clean_response
+from src.transport import LLMResponseError
+
+
+RECORD = "record"
+REPLAY = "replay"
+
+
+class CassetteMissError(LLMResponseError):
+    """Replay mode found no recorded response for a request"""
+
+
+def _sha256(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def request_key(request):
+    """
+    Identifies a request independently of provider and model, so a cassette
+    recorded against Gemini replays under any LLM_PROVIDER.
+
+    The previous interaction ID is part of the key: replay hands out the recorded
+    IDs, so a replayed conversation continues with the same keys it was recorded with.
+    """
+    payload = json.dumps({
+        "agent": request.agent,
+        "system_instruction": _sha256(request.system_instruction),
+        "input": _sha256(request.user_input),
+        "response_schema": request.response_schema,
+        "previous_interaction_id": request.previous_interaction_id,
+    }, sort_keys=True)
+    return _sha256(payload)
+
+
+class Cassette:
+    """
+    JSONL file of recorded calls, one entry per line.
+
+    Entries keep the agent, hashes of the input and system prompt, the reply (or
+    the raw chunks of a stream), the interaction ID and the recorded timings; the
+    prompts themselves are not stored. Identical requests are replayed in the
+    order they were recorded.
+
+    Args:
+        path: cassette file
+        mode: "record" (append every call) or "replay" (serve calls from the file)
+        latency: "recorded" to sleep as long as the original call took, or a fixed
+            number of seconds per call (0 measures the pipeline without the model)
+    """
+
+    def __init__(self, path, mode=REPLAY, latency=0):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Cassette mode must be '{RECORD}' or '{REPLAY}'")
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self._entries = {}  # key -> [entry, ...] in recording order
+        self._served = {}  # key -> entries replayed so far
+        self._lock = threading.Lock()
+
+        if mode == REPLAY:
+            self._load()
+        else:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Cassette not found: {self.path}")
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of an interrupted recording
+                self._entries.setdefault(entry['key'], []).append(entry)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(entries) for entries in self._entries.values())
+
+    def rewind(self):
+        """Replay from the first recorded entry again (e.g. between benchmark runs)"""
+        with self._lock:
+            self._served.clear()
+
+    def record(self, provider, request, interaction_id, latency, response_text=None, chunks=None, ttft=None):
+        """Appends one call (response_text for blocking calls, chunks for streams)"""
+        entry = {
+            'key': request_key(request),
+            'agent': request.agent,
+            'provider': provider,
+            'model': request.model_name,
+            'input_hash': _sha256(request.user_input),
+            'previous_interaction_id': request.previous_interaction_id,
+            'interaction_id': interaction_id,
+            'response_text': response_text,
+            'chunks': chunks,
+            'latency': round(latency, 4),
+            'ttft': round(ttft, 4) if ttft is not None else None,
+            'recorded_at': time.time(),
+        }
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+            self._entries.setdefault(entry['key'], []).append(entry)
+
+    def lookup(self, request):
+        """
+        The next recorded entry for this request (the last one repeats once they run out).
+
+        Raises:
+            CassetteMissError: if the request was never recorded
+        """
+        key = request_key(request)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMissError(
+                    f"No recorded response for agent '{request.agent}' (input {_sha256(request.user_input)[:12]}) "
+                    f"in {self.path}",
+                    "cassette"
+                )
+            index = self._served.get(key, 0)
+            self._served[key] = index + 1
+            return entries[min(index, len(entries) - 1)]
+
+    def delay(self, entry):
+        """Seconds a replayed call should take"""
+        if self.latency == "recorded":
+            return entry.get('latency') or 0
+        return float(self.latency or 0)
+
+    @staticmethod
+    def response_text(entry):
+        """A recorded reply as a blocking call returns it"""
+        if entry.get('response_text') is not None:
+            return entry['response_text']
+        return clean_response("".join(entry.get('chunks') or []))
+
+    def chunks(self, entry):
+        """
+        Recorded stream chunks with the delay before each one: the time to first
+        token first, the rest of the call spread over the remaining chunks.
+        """
+        chunks = entry.get('chunks') or [entry.get('response_text') or ""]
+        total = self.delay(entry)
+        if self.latency == "recorded" and entry.get('ttft') is not None:
+            first = min(entry['ttft'], total)
+        else:
+            first = total / 2
+        rest = (total - first) / max(len(chunks) - 1, 1)
+        return [(chunk, first if i == 0 else rest) for i, chunk in enumerate(chunks)]
+
+
+class CassetteProvider:
+    """
+    Wraps a provider: in record mode calls go through and are written to the
+    cassette, in replay mode they are answered from it without touching the
+    network. Batch jobs are not recorded.
+    """
+
+    def __init__(self, provider, cassette):
+        self.provider = provider
+        self.cassette = cassette
+
+    def __getattr__(self, name):
+        # name, model_for, rate limits, batch support... come from the wrapped provider
+        return getattr(self.provider, name)
+
+    def complete(self, settings, request, transport, timer):
+        if self.cassette.mode == REPLAY:
+            entry = self.cassette.lookup(request)
+            time.sleep(self.cassette.delay(entry))
+            return self.cassette.response_text(entry), entry['interaction_id']
+
+        start = time.perf_counter()
+        response_text, interaction_id = self.provider.complete(settings, request, transport, timer)
+        self.cassette.record(
+            self.provider.name, request, interaction_id, time.perf_counter() - start, response_text=response_text
+        )
+        return response_text, interaction_id
+
+    async def acomplete(self, settings, request, transport, timer):
+        if self.cassette.mode == REPLAY:
+            entry = self.cassette.lookup(request)
+            await asyncio.sleep(self.cassette.delay(entry))
+            return self.cassette.response_text(entry), entry['interaction_id']
+
+        start = time.perf_counter()
+        response_text, interaction_id = await self.provider.acomplete(settings, request, transport, timer)
+        self.cassette.record(
+            self.provider.name, request, interaction_id, time.perf_counter() - start, response_text=response_text
+        )
+        return response_text, interaction_id
+
+    def stream(self, settings, request, transport, stream):
+        if self.cassette.mode == REPLAY:
+            entry = self.cassette.lookup(request)
+            for chunk, delay in self.cassette.chunks(entry):
+                time.sleep(delay)
+                yield chunk
+            stream.interaction_id = entry['interaction_id']
+            return
+
+        start = time.perf_counter()
+        chunks, ttft = [], None
+        for chunk in self.provider.stream(settings, request, transport, stream):
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            chunks.append(chunk)
+            yield chunk
+        self.cassette.record(
+            self.provider.name, request, stream.interaction_id, time.perf_counter() - start, chunks=chunks, ttft=ttft
+        )
+
+    async def astream(self, settings, request, transport, stream):
+        if self.cassette.mode == REPLAY:
+            entry = self.cassette.lookup(request)
+            for chunk, delay in self.cassette.chunks(entry):
+                await asyncio.sleep(delay)
+                yield chunk
+            stream.interaction_id = entry['interaction_id']
+            return
+
+        start = time.perf_counter()
+        chunks, ttft = [], None
+        async for chunk in self.provider.astream(settings, request, transport, stream):
+            if ttft is None:
+                ttft = time.perf_counter() - start
+            chunks.append(chunk)
+            yield chunk
+        self.cassette.record(
+            self.provider.name, request, stream.interaction_id, time.perf_counter() - start, chunks=chunks, ttft=ttft
+        )
+
+
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(path, mode=REPLAY, latency=0):
+    """Process-wide cassette for a path and mode (loaded or created on first use)"""
+    key = (os.path.abspath(path), mode)
+    with _cassettes_lock:
+        cassette = _cassettes.get(key)
+        if cassette is None:
+            cassette = Cassette(path, mode, latency)
+            _cassettes[key] = cassette
+        cassette.latency = latency
+        return cassette
@@ -0,0 +1,153 @@
+"""
+Session Checkpoints for SOKRATES
+Durable session snapshots keyed by session token, so a restarted server or another replica can resume a session
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from src.config import get_config
+
+
+def encode_snapshot(snapshot):
+    """Compact bytes for a snapshot dict (zlib-compressed JSON)"""
+    return zlib.compress(json.dumps(snapshot, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_snapshot(data):
+    return json.loads(zlib.decompress(data).decode("utf-8"))
+
+
+class CheckpointStore:
+    """
+    Where session snapshots live. Subclass it (save/load/delete) to keep them in a
+    shared database when replicas don't share a disk, and install it with
+    set_checkpoint_store.
+    """
+
+    def save(self, token, step, snapshot):
+        """Stores the latest snapshot dict for a session, replacing the previous one"""
+        raise NotImplementedError
+
+    def load(self, token):
+        """The latest snapshot dict for a session, or None"""
+        raise NotImplementedError
+
+    def delete(self, token):
+        raise NotImplementedError
+
+
+class MemoryCheckpointStore(CheckpointStore):
+    """Snapshots in this process only (tests, single-process hosts)"""
+
+    def __init__(self):
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def save(self, token, step, snapshot):
+        with self._lock:
+            self._snapshots[token] = encode_snapshot(snapshot)
+
+    def load(self, token):
+        with self._lock:
+            data = self._snapshots.get(token)
+        return decode_snapshot(data) if data is not None else None
+
+    def delete(self, token):
+        with self._lock:
+            self._snapshots.pop(token, None)
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    """
+    Snapshots in a SQLite file, one row per session token.
+
+    Sessions untouched for ttl seconds are dropped on the next save. Every process
+    (and replica) pointed at the same file sees the same sessions.
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # the timeout lets several processes write the same file
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                token TEXT PRIMARY KEY,
+                step TEXT NOT NULL,
+                snapshot BLOB NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    def save(self, token, step, snapshot):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sessions (token, step, snapshot, updated_at) VALUES (?, ?, ?, ?)",
+                (token, step, encode_snapshot(snapshot), now)
+            )
+            self._db.execute("DELETE FROM sessions WHERE updated_at <= ?", (now - self.ttl,))
+            self._db.commit()
+
+    def load(self, token):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT snapshot, updated_at FROM sessions WHERE token = ?", (token,)
+            ).fetchone()
+        if not row or row[1] <= time.time() - self.ttl:
+            return None
+        return decode_snapshot(row[0])
+
+    def delete(self, token):
+        with self._lock:
+            self._db.execute("DELETE FROM sessions WHERE token = ?", (token,))
+            self._db.commit()
+
+    def stats(self):
+        """Session count per step"""
+        with self._lock:
+            rows = self._db.execute("SELECT step, COUNT(*) FROM sessions GROUP BY step").fetchall()
+        return dict(rows)
+
+
+_checkpoint_store = None
+_checkpoint_store_configured = False
+_checkpoint_store_lock = threading.Lock()
+
+
+def get_checkpoint_store(config=None):
+    """
+    Returns the process-wide checkpoint store, or None if CHECKPOINTS = false.
+
+    Settings (all optional): CHECKPOINTS, CHECKPOINT_PATH, CHECKPOINT_TTL.
+    """
+    global _checkpoint_store, _checkpoint_store_configured
+    with _checkpoint_store_lock:
+        if not _checkpoint_store_configured:
+            config = config or get_config()
+            if config.get("CHECKPOINTS", True):
+                _checkpoint_store = SQLiteCheckpointStore(
+                    config.get("CHECKPOINT_PATH", ".sokrates_cache/sessions.sqlite3"),
+                    ttl=config.get("CHECKPOINT_TTL", 7 * 24 * 3600)
+                )
+            _checkpoint_store_configured = True
+        return _checkpoint_store
+
+
+def set_checkpoint_store(store):
+    """Replaces the process-wide checkpoint store (a CheckpointStore, or None to turn checkpoints off)"""
+    global _checkpoint_store, _checkpoint_store_configured
+    with _checkpoint_store_lock:
+        _checkpoint_store = store
+        _checkpoint_store_configured = True
+    return store
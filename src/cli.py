@@ -0,0 +1,320 @@
+"""
+Command Line for SOKRATES
+Runs the whole pipeline headless for many candidates, with scripted interview answers
+
+Usage:
+    python -m src.cli candidates/ --out results/
+    python -m src.cli manifest.jsonl --out results/ --workers 4 --max-llm-calls 8
+
+A candidates directory holds one sub-directory per candidate with its PDF/txt
+documents and an optional candidate.json:
+
+    {"name": "Ada Lovelace", "github": "ada", "urls": ["https://..."],
+     "notes": "free text", "answers": ["first answer", "second answer", "third answer"]}
+
+A manifest is a JSON list (or JSONL file) of the same objects with an "id" and
+"files" (paths relative to the manifest).
+
+Each finished candidate is written right away: html/<id>.html, then one line in
+results.jsonl. Candidates already marked "ok" there are skipped, so an
+interrupted run is resumed by starting it again.
+
+Every session is also checkpointed to sessions.sqlite3 under its candidate ID.
+With --update every candidate is run again from its checkpoint: only new or
+changed sources are extracted, only agent calls with changed inputs are made,
+and the interview is kept if the candidate's answers are unchanged.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from src.checkpoints import SQLiteCheckpointStore
+from src.config import get_config
+from src.pipeline import ONBOARDING, SokratesPipeline, SokratesSession
+from src.utils import extract_text_from_pdf
+
+CANDIDATE_FILE = "candidate.json"
+DOCUMENT_EXTENSIONS = (".pdf", ".txt")
+RESULTS_FILE = "results.jsonl"
+SESSIONS_FILE = "sessions.sqlite3"
+
+# set in each worker process: limits LLM calls in flight across all workers
+_llm_slots = None
+# set in each worker process: the output directory's session checkpoints
+_checkpoints = None
+
+
+# --- candidates ---
+
+def candidate_id(text):
+    """File-name-safe candidate ID"""
+    return re.sub(r"[^A-Za-z0-9._-]+", "-", text).strip("-.") or "candidate"
+
+
+def _candidate(fields, identifier, base_dir, files=()):
+    """Normalizes a candidate.json / manifest entry (file paths become absolute)"""
+    files = list(files) + [os.path.join(base_dir, path) for path in fields.get('files', [])]
+    return {
+        'id': identifier,
+        'name': fields.get('name') or "Professional",
+        'files': [os.path.abspath(path) for path in files],
+        'urls': list(fields.get('urls', [])),
+        'github': fields.get('github'),
+        'notes': fields.get('notes'),
+        'answers': list(fields.get('answers', [])),
+    }
+
+
+def load_candidates(path):
+    """
+    Reads a candidates directory or a JSON/JSONL manifest.
+
+    Returns:
+        list: candidate dicts (id, name, files, urls, github, notes, answers)
+
+    Raises:
+        ValueError: for duplicate IDs
+    """
+    candidates = []
+    if os.path.isdir(path):
+        for entry in sorted(os.listdir(path)):
+            directory = os.path.join(path, entry)
+            if not os.path.isdir(directory):
+                continue
+            fields = {}
+            if os.path.exists(os.path.join(directory, CANDIDATE_FILE)):
+                with open(os.path.join(directory, CANDIDATE_FILE)) as f:
+                    fields = json.load(f)
+            documents = [
+                os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                if name.lower().endswith(DOCUMENT_EXTENSIONS)
+            ]
+            candidates.append(_candidate(fields, candidate_id(fields.get('id') or entry), directory, documents))
+    else:
+        with open(path) as f:
+            if path.endswith(".jsonl"):
+                entries = [json.loads(line) for line in f if line.strip()]
+            else:
+                entries = json.load(f)
+        base_dir = os.path.dirname(os.path.abspath(path))
+        for index, fields in enumerate(entries, 1):
+            identifier = fields.get('id') or fields.get('name') or f"candidate-{index}"
+            candidates.append(_candidate(fields, candidate_id(str(identifier)), base_dir))
+
+    seen = set()
+    for candidate in candidates:
+        if candidate['id'] in seen:
+            raise ValueError(f"Duplicate candidate ID: {candidate['id']}")
+        seen.add(candidate['id'])
+    return candidates
+
+
+# --- one candidate (runs in a worker process) ---
+
+def _init_worker(llm_slots, checkpoint_path=None):
+    global _llm_slots, _checkpoints
+    _llm_slots = llm_slots
+    _checkpoints = SQLiteCheckpointStore(checkpoint_path) if checkpoint_path else None
+
+
+def _read_document(path):
+    if path.lower().endswith(".pdf"):
+        with open(path, "rb") as f:
+            return extract_text_from_pdf(f)
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+
+def run_candidate(candidate, update=False):
+    """
+    Ingestion, analysis, scripted interview, extraction and HTML for one candidate.
+
+    Args:
+        update: continue the candidate's checkpointed session and redo only what changed
+
+    Returns:
+        dict: result record; "html" holds the page (the parent process writes it to disk)
+    """
+    start = time.perf_counter()
+    warnings = []
+    pipeline = None
+    if update and _checkpoints is not None:
+        pipeline = SokratesPipeline.resume(candidate['id'], _checkpoints, get_config(), llm_slots=_llm_slots)
+    if pipeline is None:
+        # a new session per candidate (its own conversation history and background tasks)
+        pipeline = SokratesPipeline(
+            get_config(), SokratesSession(session_key=candidate['id']), llm_slots=_llm_slots, checkpoints=_checkpoints
+        )
+    session = pipeline.session
+    try:
+        sources = dict(
+            documents=[(os.path.basename(path), _read_document(path)) for path in candidate['files']],
+            urls=candidate['urls'],
+            notes=candidate['notes'],
+            user_name=candidate['name']
+        )
+        answers = candidate['answers']
+        if session.step == ONBOARDING:
+            has_input, warnings = pipeline.fetch_and_ingest(candidate['github'], **sources)
+        else:
+            earlier = [message['content'] for message in session.messages if message['role'] == "user"]
+            keep_interview = bool(earlier) and earlier == answers[:len(earlier)]
+            has_input, warnings = pipeline.reanalyze(candidate['github'], keep_interview=keep_interview, **sources)
+            if keep_interview:
+                answers = None
+        if not has_input:
+            raise ValueError("No input (files, URLs, GitHub or notes)")
+        html = pipeline.run_scripted(answers)
+    except Exception as e:
+        pipeline.cancel()
+        return {
+            'id': candidate['id'],
+            'name': candidate['name'],
+            'status': "error",
+            'error': f"{type(e).__name__}: {str(e)}",
+            'warnings': warnings,
+            'seconds': round(time.perf_counter() - start, 2),
+        }
+
+    return {
+        'id': candidate['id'],
+        'name': candidate['name'],
+        'status': "ok",
+        'error': None,
+        'warnings': warnings,
+        'seconds': round(time.perf_counter() - start, 2),
+        'stage_timings': session.stage_timings,
+        'patterns': session.patterns,
+        'directives': session.directives,
+        'transcript': session.messages,
+        'html': html,
+    }
+
+
+# --- output ---
+
+def _done_ids(results_path):
+    """Candidate IDs that already have an "ok" line (failed candidates are run again)"""
+    done = set()
+    if not os.path.exists(results_path):
+        return done
+    with open(results_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # a torn last line from a crash; that candidate is simply run again
+                continue
+            if record.get('status') == "ok":
+                done.add(record['id'])
+    return done
+
+
+def _terminate_torn_line(path):
+    """Ends a torn last line so the next record starts on its own line"""
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        torn = f.read(1) != b"\n"
+    if torn:
+        with open(path, "a") as out:
+            out.write("\n")
+
+
+def _write_html(html_dir, identifier, html):
+    """Writes the page atomically, so a crash never leaves half a file behind"""
+    path = os.path.join(html_dir, f"{identifier}.html")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(html)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def run_candidates(candidates, out_dir, workers=2, max_llm_calls=4, update=False):
+    """
+    Processes every candidate without an "ok" result in out_dir (every candidate,
+    incrementally, with update=True).
+
+    Each worker process handles one candidate at a time; LLM calls in flight are
+    capped at max_llm_calls across all workers. RATE_LIMITS apply per process.
+
+    Returns:
+        tuple: (candidates run now, failed candidates)
+    """
+    html_dir = os.path.join(out_dir, "html")
+    os.makedirs(html_dir, exist_ok=True)
+    results_path = os.path.join(out_dir, RESULTS_FILE)
+
+    done = set() if update else _done_ids(results_path)
+    pending = [candidate for candidate in candidates if candidate['id'] not in done]
+    if not pending:
+        return 0, 0
+    _terminate_torn_line(results_path)
+
+    failed = 0
+    llm_slots = multiprocessing.BoundedSemaphore(max_llm_calls)
+    with open(results_path, "a") as out, ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(llm_slots, os.path.join(out_dir, SESSIONS_FILE))
+    ) as pool:
+        futures = {pool.submit(run_candidate, candidate, update): candidate for candidate in pending}
+        for index, future in enumerate(as_completed(futures), 1):
+            candidate = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # the worker process itself died
+                result = {
+                    'id': candidate['id'], 'name': candidate['name'], 'status': "error",
+                    'error': f"{type(e).__name__}: {str(e)}", 'warnings': [], 'seconds': None
+                }
+
+            # the page first, then the line that marks the candidate as done
+            html = result.pop('html', None)
+            if html is not None:
+                result['html_path'] = os.path.relpath(_write_html(html_dir, result['id'], html), out_dir)
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+
+            if result['status'] != "ok":
+                failed += 1
+            detail = result['error'] or f"{result['seconds']}s"
+            print(f"[{index}/{len(pending)}] {result['id']}: {result['status']} ({detail})", flush=True)
+
+    return len(pending), failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="sokrates", description="Generate anti-portfolios for many candidates without the UI."
+    )
+    parser.add_argument("candidates", help="candidates directory, or a .json/.jsonl manifest")
+    parser.add_argument("--out", default="sokrates_results", help="output directory (default sokrates_results)")
+    parser.add_argument("--workers", type=int, default=2, help="candidates processed in parallel (default 2)")
+    parser.add_argument(
+        "--max-llm-calls", type=int, default=4, help="LLM calls in flight across all workers (default 4)"
+    )
+    parser.add_argument(
+        "--update", action="store_true",
+        help="run every candidate again, redoing only what changed since its last run (sources, answers)"
+    )
+    args = parser.parse_args(argv)
+    if args.workers < 1 or args.max_llm_calls < 1:
+        parser.error("--workers and --max-llm-calls must be at least 1")
+
+    candidates = load_candidates(args.candidates)
+    ran, failed = run_candidates(
+        candidates, args.out, workers=args.workers, max_llm_calls=args.max_llm_calls, update=args.update
+    )
+    print(f"{len(candidates)} candidates: {ran} run, {failed} failed, {len(candidates) - ran} already done")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+LLM Client Registry for SOKRATES
+Keeps long-lived SDK clients so every agent call reuses pooled keep-alive connections
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from google import genai
+from openai import AsyncOpenAI, OpenAI
+
+
+LOCAL_BASE_URL = "http://localhost:1234/v1"
+LOCAL_API_KEY = "lm-studio"
+
+
+class ClientRegistry:
+    """
+    Thread-safe LRU registry of LLM clients keyed by provider, API key hash and endpoint.
+
+    Each SDK client owns an HTTP connection pool, so holding on to it means the
+    TLS handshake is paid once per key instead of once per agent call. A client is
+    closed only once it has gone unused for idle_timeout: one pushed out of the
+    LRU may still be serving a request, so it is kept aside until then.
+    """
+
+    def __init__(self, max_clients=32, idle_timeout=1800):
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self._clients = OrderedDict()  # key -> (client, last_used)
+        self._retired = []  # (client, last_used) evicted by the lru, closed once idle
+        self._factories = {}  # provider -> callable(api_key, base_url, is_async) for pluggable providers
+        self._lock = threading.Lock()
+
+    def register_factory(self, provider, factory):
+        """Teach the registry how to build clients for an additional provider"""
+        with self._lock:
+            self._factories[provider] = factory
+
+    @staticmethod
+    def _key(provider, api_key, base_url, loop_id):
+        # never keep raw keys around as dict keys
+        key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+        return (provider, key_hash, base_url or "", loop_id)
+
+    def get(self, provider, api_key=None, base_url=None, loop=None):
+        """
+        Return the pooled client for this provider/key, creating it if needed.
+
+        Args:
+            provider: "google" or "local"
+            api_key: API key for the provider
+            base_url: endpoint for OpenAI-compatible providers
+            loop: event loop for an async client (async connection pools are bound to one loop)
+
+        Returns:
+            genai.Client / OpenAI client, or their async counterparts when loop is given
+        """
+        key = self._key(provider, api_key, base_url, id(loop) if loop else None)
+        now = time.monotonic()
+
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._clients.get(key)
+            if entry:
+                self._clients[key] = (entry[0], now)
+                self._clients.move_to_end(key)
+                return entry[0]
+
+            client = self._build(provider, api_key, base_url, is_async=loop is not None)
+            self._clients[key] = (client, now)
+
+            # lru eviction once we hold too many distinct keys (closed later, see _evict_idle)
+            while len(self._clients) > self.max_clients:
+                _, entry = self._clients.popitem(last=False)
+                self._retired.append(entry)
+
+            return client
+
+    def _build(self, provider, api_key, base_url, is_async=False):
+        """Create a new SDK client for the provider"""
+        if provider in self._factories:
+            return self._factories[provider](api_key, base_url, is_async)
+        if provider == "google":
+            client = genai.Client(api_key=api_key)
+            return client.aio if is_async else client
+        if provider == "local":
+            client_class = AsyncOpenAI if is_async else OpenAI
+            # retries are handled by src.transport, so the SDK must not retry on its own
+            return client_class(base_url=base_url or LOCAL_BASE_URL, api_key=api_key or LOCAL_API_KEY, max_retries=0)
+        raise ValueError(f"Unknown LLM provider: {provider}")
+
+    def _evict_idle(self, now):
+        """Close clients that have not been used within idle_timeout (lock must be held)"""
+        expired = [key for key, (_, last_used) in self._clients.items() if now - last_used > self.idle_timeout]
+        for key in expired:
+            client, _ = self._clients.pop(key)
+            self._close(client)
+        retired = []
+        for client, last_used in self._retired:
+            if now - last_used > self.idle_timeout:
+                self._close(client)
+            else:
+                retired.append((client, last_used))
+        self._retired = retired
+
+    @staticmethod
+    def _close(client):
+        """Release the client's connection pool if the SDK supports it"""
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                result = close()
+                # async clients return a coroutine; their loop may be gone, so just discard it
+                if asyncio.iscoroutine(result):
+                    result.close()
+            except Exception:
+                pass
+
+    def warm_up(self, provider, api_key=None, base_url=None):
+        """
+        Create the client and open a connection with a cheap request.
+
+        Returns:
+            bool: True if the endpoint answered
+        """
+        try:
+            client = self.get(provider, api_key, base_url)
+            if provider == "google":
+                next(iter(client.models.list(config={"page_size": 1})), None)
+            else:
+                client.models.list()
+            return True
+        except Exception as e:
+            print(f"LLM warm-up failed for {provider}: {str(e)}")
+            return False
+
+    def clear(self):
+        """Close and forget every pooled client"""
+        with self._lock:
+            for client, _ in list(self._clients.values()) + self._retired:
+                self._close(client)
+            self._clients.clear()
+            self._retired = []
+
+    def __len__(self):
+        with self._lock:
+            return len(self._clients)
+
+
+# process-wide registry shared by all streamlit sessions
+_registry = ClientRegistry()
+
+
+def get_client(provider, api_key=None, base_url=None):
+    """Return a pooled client from the process-wide registry"""
+    return _registry.get(provider, api_key, base_url)
+
+
+def get_async_client(provider, api_key=None, base_url=None, loop=None):
+    """Return a pooled async client bound to the given (or running) event loop"""
+    return _registry.get(provider, api_key, base_url, loop=loop or asyncio.get_running_loop())
+
+
+def register_client_factory(provider, factory):
+    """Register how to build pooled clients for a custom provider (see src.providers)"""
+    _registry.register_factory(provider, factory)
+
+
+def warm_up_client(provider, api_key=None, base_url=None):
+    """Warm up a pooled client in the process-wide registry"""
+    return _registry.warm_up(provider, api_key, base_url)
@@ -0,0 +1,69 @@
+"""
+Configuration for SOKRATES
+Explicit settings object with the keys of .streamlit/secrets.toml, readable without a Streamlit runtime
+"""
+
+import os
+import threading
+import tomllib
+
+DEFAULT_CONFIG_PATH = os.path.join(".streamlit", "secrets.toml")
+
+
+class SokratesConfig:
+    """
+    Read-only settings (LLM_PROVIDER, GEMINI_API_KEY, RATE_LIMITS, ...).
+
+    The keys and tables are the ones documented for secrets.toml; the Streamlit
+    app builds its config from st.secrets, everything else reads the TOML file
+    directly (or passes a dict).
+    """
+
+    def __init__(self, values=None):
+        self._values = dict(values or {})
+
+    @classmethod
+    def from_toml(cls, path=DEFAULT_CONFIG_PATH):
+        """Loads a secrets.toml file (a missing file gives an empty config)"""
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "rb") as f:
+            return cls(tomllib.load(f))
+
+    def get(self, key, default=None):
+        return self._values.get(key, default)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def to_dict(self):
+        return dict(self._values)
+
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def get_config():
+    """
+    Returns the process-wide config: the one passed to set_config, otherwise the
+    file named by SOKRATES_CONFIG (default .streamlit/secrets.toml), loaded on first use.
+    """
+    global _config
+    with _config_lock:
+        if _config is None:
+            _config = SokratesConfig.from_toml(os.environ.get("SOKRATES_CONFIG", DEFAULT_CONFIG_PATH))
+        return _config
+
+
+def set_config(config):
+    """Replaces the process-wide config (a SokratesConfig or a plain dict)"""
+    global _config
+    if not isinstance(config, SokratesConfig):
+        config = SokratesConfig(config)
+    with _config_lock:
+        _config = config
+    return config
@@ -0,0 +1,237 @@
+"""
+Context Budgeter for SOKRATES
+Estimates prompt sizes locally and trims each agent's prompt sections to a token budget
+"""
+
+import math
+import re
+
+
+# default input budgets (estimated tokens) per agent
+AGENT_BUDGETS = {
+    'archivist': 12000,
+    'critic': 4000,
+    'director': 2500,
+    'sokrates': 10000,
+    'extractor': 12000,
+    'github_analysis': 8000,
+    'multi_source_analysis': 8000,
+}
+
+# matches the "--- FILE: ... ---" / "--- CONTENT FROM URL: ... ---" headers app.py joins documents with
+DOCUMENT_HEADER = re.compile(r'^\s*--- [A-Z][A-Z \-]*(?::.*)? ---\s*$', re.MULTILINE)
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """
+    Cheap local token estimate (about 4 characters per token for English text).
+
+    Errs on the high side for short, punctuation-heavy text by also counting
+    word and symbol pieces.
+    """
+    if not text:
+        return 0
+    pieces = len(re.findall(r'\w+|[^\w\s]', text))
+    return max(math.ceil(len(text) / CHARS_PER_TOKEN), math.ceil(pieces * 0.75))
+
+
+class PromptSection:
+    """
+    One named part of an agent prompt.
+
+    Args:
+        name: label used in the report (e.g. "user_context")
+        text: section content
+        weight: share of the budget relative to other trimmable sections
+        strategy: "head" keeps the beginning, "tail" keeps the end (transcripts),
+                  "documents" shares the allowance fairly across joined documents
+        trimmable: False for sections that must be sent whole (instructions, short summaries)
+    """
+
+    def __init__(self, name, text, weight=1.0, strategy="head", trimmable=True):
+        self.name = name
+        self.text = text or ""
+        self.weight = weight
+        self.strategy = strategy
+        self.trimmable = trimmable
+        self.tokens = estimate_tokens(self.text)
+
+
+class BudgetReport:
+    """What was kept and cut for one agent prompt"""
+
+    def __init__(self, agent, budget):
+        self.agent = agent
+        self.budget = budget
+        self.sections = []
+
+    def add(self, name, original_tokens, kept_tokens):
+        self.sections.append({
+            'section': name,
+            'original_tokens': original_tokens,
+            'kept_tokens': kept_tokens,
+            'cut_tokens': max(original_tokens - kept_tokens, 0)
+        })
+
+    @property
+    def total_cut(self):
+        return sum(section['cut_tokens'] for section in self.sections)
+
+    @property
+    def total_kept(self):
+        return sum(section['kept_tokens'] for section in self.sections)
+
+    def summary(self):
+        """One-line human readable summary"""
+        if not self.total_cut:
+            return f"{self.agent}: {self.total_kept} tokens, nothing cut"
+        cuts = ", ".join(
+            f"{section['section']} -{section['cut_tokens']}"
+            for section in self.sections if section['cut_tokens']
+        )
+        return f"{self.agent}: kept {self.total_kept}/{self.budget} tokens ({cuts})"
+
+    @classmethod
+    def from_dict(cls, data):
+        report = cls(data['agent'], data['budget'])
+        report.sections = [dict(section) for section in data.get('sections', [])]
+        return report
+
+    def to_dict(self):
+        return {
+            'agent': self.agent,
+            'budget': self.budget,
+            'total_kept': self.total_kept,
+            'total_cut': self.total_cut,
+            'sections': self.sections
+        }
+
+
+def get_agent_budget(agent, overrides=None):
+    """Budget for an agent, with optional overrides (e.g. CONTEXT_BUDGETS from secrets.toml)"""
+    if overrides and agent in overrides:
+        return int(overrides[agent])
+    return AGENT_BUDGETS.get(agent, 8000)
+
+
+def fit_to_budget(agent, sections, budget=None, overrides=None):
+    """
+    Trims prompt sections so their combined estimate fits the agent's budget.
+
+    Non-trimmable sections are kept whole. The remaining allowance is shared
+    between trimmable sections by weight (max-min fair: sections smaller than
+    their share keep everything and release the rest to the others).
+
+    Args:
+        agent: agent name, used to look up the budget
+        sections: list of PromptSection
+        budget: explicit budget (overrides the agent default)
+        overrides: dict of per-agent budgets
+
+    Returns:
+        tuple: (dict of section name -> fitted text, BudgetReport)
+    """
+    budget = budget if budget is not None else get_agent_budget(agent, overrides)
+    report = BudgetReport(agent, budget)
+
+    fixed = sum(section.tokens for section in sections if not section.trimmable)
+    allowances = _share_allowance(
+        [section for section in sections if section.trimmable],
+        max(budget - fixed, 0)
+    )
+
+    fitted = {}
+    for section in sections:
+        if not section.trimmable or allowances[section.name] >= section.tokens:
+            fitted[section.name] = section.text
+            report.add(section.name, section.tokens, section.tokens)
+            continue
+
+        text = _trim(section.text, allowances[section.name], section.strategy)
+        fitted[section.name] = text
+        report.add(section.name, section.tokens, estimate_tokens(text))
+
+    return fitted, report
+
+
+def _share_allowance(sections, available):
+    """Weighted max-min fair split of available tokens between sections"""
+    allowances = {}
+    active = list(sections)
+
+    while active:
+        total_weight = sum(section.weight for section in active) or 1
+        satisfied = [
+            section for section in active
+            if section.tokens <= available * section.weight / total_weight
+        ]
+        if not satisfied:
+            for section in active:
+                allowances[section.name] = int(available * section.weight / total_weight)
+            break
+        for section in satisfied:
+            allowances[section.name] = section.tokens
+            available -= section.tokens
+            active.remove(section)
+
+    return allowances
+
+
+def _trim(text, tokens, strategy):
+    """Cut text down to roughly `tokens` using the section's strategy"""
+    if tokens <= 0:
+        return f"[... {estimate_tokens(text)} tokens omitted to fit the context budget ...]"
+    if strategy == "tail":
+        return _trim_tail(text, tokens)
+    if strategy == "documents":
+        return _trim_documents(text, tokens)
+    return _trim_head(text, tokens)
+
+
+def _trim_head(text, tokens):
+    """Keep the beginning of the text, cutting at a line boundary"""
+    limit = tokens * CHARS_PER_TOKEN
+    kept = text[:limit]
+    newline = kept.rfind("\n")
+    if newline > limit // 2:
+        kept = kept[:newline]
+    omitted = estimate_tokens(text[len(kept):])
+    return f"{kept.rstrip()}\n[... {omitted} tokens omitted to fit the context budget ...]\n"
+
+
+def _trim_tail(text, tokens):
+    """Keep the end of the text (most recent turns), cutting at a line boundary"""
+    limit = tokens * CHARS_PER_TOKEN
+    kept = text[-limit:]
+    newline = kept.find("\n")
+    if -1 < newline < limit // 2:
+        kept = kept[newline + 1:]
+    omitted = estimate_tokens(text[:len(text) - len(kept)])
+    return f"[... {omitted} earlier tokens omitted to fit the context budget ...]\n{kept.lstrip()}"
+
+
+def _trim_documents(text, tokens):
+    """
+    Split joined documents on their headers and give each a fair share,
+    so one long CV cannot crowd out the others.
+    """
+    starts = [match.start() for match in DOCUMENT_HEADER.finditer(text)]
+    if len(starts) < 2:
+        return _trim_head(text, tokens)
+
+    bounds = ([0] if starts[0] > 0 else []) + starts + [len(text)]
+    documents = [
+        PromptSection(f"doc{i}", text[bounds[i]:bounds[i + 1]])
+        for i in range(len(bounds) - 1)
+    ]
+    allowances = _share_allowance(documents, tokens)
+
+    parts = []
+    for document in documents:
+        if allowances[document.name] >= document.tokens:
+            parts.append(document.text)
+        else:
+            parts.append(_trim(document.text, allowances[document.name], "head"))
+    return "".join(parts)
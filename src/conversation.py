@@ -0,0 +1,235 @@
+"""
+Conversation Store for SOKRATES
+Windowed chat histories with rolling summaries for the local (OpenAI-compatible) provider
+"""
+
+import threading
+import uuid
+from collections import OrderedDict
+
+
+SUMMARY_PROMPT = """
+You maintain the running memory of an interview.
+Merge the previous summary and the new exchanges into one concise summary (max 150 words).
+Keep facts the user stated, open threads and the interviewer's current direction.
+Return the summary only.
+"""
+
+
+class _Node:
+    """One message in a persistent (append-only, shared-tail) linked list"""
+
+    __slots__ = ('message', 'parent', 'depth')
+
+    def __init__(self, message, parent):
+        self.message = message
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent else 1
+
+
+class Conversation:
+    """
+    A single conversation: system prompt, rolling summary and message chain.
+
+    Appending links a new node onto the head instead of copying the history,
+    and nodes that have been folded into the summary are unlinked so memory
+    stays bounded.
+    """
+
+    def __init__(self, system_prompt=None):
+        self.system_prompt = system_prompt
+        self.summary = ""
+        self.summarized_depth = 0  # messages up to this depth live only in the summary
+        self.head = None
+
+    def append(self, role, content):
+        self.head = _Node({"role": role, "content": content}, self.head)
+
+    def __len__(self):
+        return self.head.depth if self.head else 0
+
+    def messages_after(self, depth):
+        """Messages newer than `depth`, oldest first"""
+        messages = []
+        node = self.head
+        while node and node.depth > depth:
+            messages.append(node.message)
+            node = node.parent
+        messages.reverse()
+        return messages
+
+    def fold(self, summary, depth):
+        """Replace everything up to `depth` with a summary and drop those nodes"""
+        self.summary = summary
+        self.summarized_depth = depth
+        node = self.head
+        while node and node.parent and node.parent.depth > depth:
+            node = node.parent
+        if node and node.depth > depth:
+            node.parent = None
+
+    def to_dict(self):
+        """Plain data for a checkpoint (only what has not been folded into the summary)"""
+        return {
+            'system_prompt': self.system_prompt,
+            'summary': self.summary,
+            'summarized_depth': self.summarized_depth,
+            'messages': self.messages_after(self.summarized_depth),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        conversation = cls(data.get('system_prompt'))
+        conversation.summary = data.get('summary', "")
+        conversation.summarized_depth = data.get('summarized_depth', 0)
+        for message in data.get('messages', []):
+            conversation.append(message['role'], message['content'])
+            if conversation.head.parent is None:
+                # the chain continues after the summarized messages
+                conversation.head.depth = conversation.summarized_depth + 1
+        return conversation
+
+
+class ConversationStore:
+    """
+    Thread-safe collection of conversations keyed by interaction ID.
+
+    Only the system prompt (plus rolling summary), unsummarized older messages
+    and the last `window_turns` turns are sent on each call. At most
+    `max_conversations` are kept; the least recently used is dropped first.
+    """
+
+    def __init__(self, window_turns=4, summary_batch_turns=2, max_conversations=16):
+        self.window_turns = window_turns
+        self.summary_batch_turns = summary_batch_turns
+        self.max_conversations = max_conversations
+        self._conversations = OrderedDict()  # interaction id -> Conversation, least recently used first
+        self._lock = threading.Lock()
+
+    def _add(self, interaction_id, conversation):
+        """Stores a conversation and drops the least recently used past max_conversations (lock must be held)"""
+        self._conversations[interaction_id] = conversation
+        self._conversations.move_to_end(interaction_id)
+        while len(self._conversations) > self.max_conversations:
+            self._conversations.popitem(last=False)
+
+    def _use(self, interaction_id):
+        """The conversation, marked as most recently used (lock must be held)"""
+        self._conversations.move_to_end(interaction_id)
+        return self._conversations[interaction_id]
+
+    def start(self, system_prompt=None, interaction_id=None):
+        """Create a conversation and return its interaction ID"""
+        interaction_id = interaction_id or str(uuid.uuid4())
+        with self._lock:
+            self._add(interaction_id, Conversation(system_prompt))
+        return interaction_id
+
+    def discard(self, interaction_id):
+        """Forgets a conversation that won't be continued (unknown IDs are ignored)"""
+        with self._lock:
+            self._conversations.pop(interaction_id, None)
+
+    def __contains__(self, interaction_id):
+        with self._lock:
+            return interaction_id in self._conversations
+
+    def __len__(self):
+        with self._lock:
+            return len(self._conversations)
+
+    def get(self, interaction_id):
+        with self._lock:
+            return self._conversations.get(interaction_id)
+
+    def export(self, interaction_id):
+        """One conversation as plain data (None if unknown), e.g. for a session checkpoint"""
+        with self._lock:
+            conversation = self._conversations.get(interaction_id)
+            return conversation.to_dict() if conversation else None
+
+    def restore(self, interaction_id, data):
+        """Recreates an exported conversation under its interaction ID"""
+        with self._lock:
+            self._add(interaction_id, Conversation.from_dict(data))
+
+    def build_messages(self, interaction_id, user_input):
+        """
+        Messages to send for the next call (the stored history is not modified).
+
+        Returns:
+            list: chat messages for the OpenAI-compatible API
+        """
+        with self._lock:
+            conversation = self._use(interaction_id)
+            messages = []
+
+            system = conversation.system_prompt or ""
+            if conversation.summary:
+                system = f"{system}\n\nSUMMARY OF EARLIER CONVERSATION:\n{conversation.summary}".strip()
+            if system:
+                messages.append({"role": "system", "content": system})
+
+            # summarized messages are gone; anything not yet summarized is still sent
+            messages.extend(conversation.messages_after(conversation.summarized_depth))
+            messages.append({"role": "user", "content": user_input})
+            return messages
+
+    def record_turn(self, interaction_id, user_input, response_text):
+        """Append a completed user/assistant exchange"""
+        with self._lock:
+            conversation = self._use(interaction_id)
+            conversation.append("user", user_input)
+            conversation.append("assistant", response_text)
+
+    def pending_summary(self, interaction_id):
+        """
+        Messages that have left the window but are not in the summary yet.
+
+        Returns:
+            tuple: (messages, depth they reach) - empty until a full batch is ready
+        """
+        with self._lock:
+            conversation = self._conversations.get(interaction_id)
+            if conversation is None:
+                return [], 0
+            window_start = len(conversation) - 2 * self.window_turns
+            if window_start - conversation.summarized_depth < 2 * self.summary_batch_turns:
+                return [], conversation.summarized_depth
+
+            messages = conversation.messages_after(conversation.summarized_depth)
+            return messages[:window_start - conversation.summarized_depth], window_start
+
+    def compact(self, interaction_id, summarize):
+        """
+        Fold messages that left the window into the rolling summary.
+
+        Args:
+            interaction_id: conversation to compact
+            summarize: callable(previous_summary, messages) -> new summary text
+
+        Returns:
+            bool: True if a summary was written
+        """
+        messages, depth = self.pending_summary(interaction_id)
+        if not messages:
+            return False
+
+        conversation = self.get(interaction_id)
+        if conversation is None:
+            return False
+        summary = summarize(conversation.summary, messages)
+        if not summary:
+            return False
+
+        with self._lock:
+            # another turn may have compacted meanwhile
+            if depth > conversation.summarized_depth:
+                conversation.fold(summary, depth)
+        return True
+
+
+def format_for_summary(previous_summary, messages):
+    """Builds the summarizer input from the previous summary and the evicted messages"""
+    exchanges = "\n".join(f"{m['role'].upper()}: {m['content']}" for m in messages)
+    return f"PREVIOUS SUMMARY:\n{previous_summary or '(none)'}\n\nNEW EXCHANGES:\n{exchanges}"
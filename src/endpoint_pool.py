@@ -0,0 +1,219 @@
+"""
+Local Endpoint Pool for SOKRATES
+Health-checked pool of OpenAI-compatible servers with least-outstanding balancing and sticky conversations
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from src.clients import get_client
+from src.transport import LLMTimeoutError, LLMUnavailableError, classify_error
+
+
+class Endpoint:
+    """One OpenAI-compatible server (e.g. a llama.cpp or LM Studio instance)"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.healthy = True  # optimistic until a probe or call says otherwise
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.unhealthy_until = 0.0
+        self.last_probe = None
+        self.last_error = None
+
+    def to_dict(self):
+        return {
+            'base_url': self.base_url,
+            'healthy': self.healthy,
+            'outstanding': self.outstanding,
+            'requests': self.requests,
+            'failures': self.failures,
+            'last_error': self.last_error or "",
+        }
+
+
+class EndpointPool:
+    """
+    Routes local LLM calls across several servers.
+
+    A conversation sticks to the endpoint that served it, so follow-up turns hit
+    that server's prompt (KV) cache. New conversations go to the healthy endpoint
+    with the fewest requests in flight. Endpoints that fail with connection
+    errors, timeouts or 5xx are taken out for `probe_interval` seconds, or until
+    a health probe sees them answer again.
+    """
+
+    def __init__(self, base_urls, probe_interval=15, probe_timeout=5, max_sticky=10000):
+        if not base_urls:
+            raise ValueError("The endpoint pool needs at least one base URL")
+        self.endpoints = [Endpoint(base_url) for base_url in base_urls]
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.max_sticky = max_sticky
+        self._sticky = OrderedDict()  # interaction_id -> Endpoint
+        self._next = 0  # round-robin offset for ties
+        self._lock = threading.Lock()
+        self._probe_thread = None
+
+    def _available(self, endpoint, now):
+        return endpoint.healthy or now >= endpoint.unhealthy_until
+
+    def acquire(self, interaction_id=None):
+        """
+        Picks an endpoint for one call and counts it as outstanding.
+
+        If every endpoint is down the call is tried anyway; the transport's circuit
+        breaker decides when to stop calling the provider altogether.
+        """
+        now = time.monotonic()
+        with self._lock:
+            endpoint = self._sticky.get(interaction_id) if interaction_id else None
+            if endpoint is not None and self._available(endpoint, now):
+                self._sticky.move_to_end(interaction_id)
+            else:
+                candidates = [e for e in self.endpoints if self._available(e, now)] or self.endpoints
+                # least outstanding requests; ties rotate so idle endpoints share the load
+                self._next = (self._next + 1) % len(self.endpoints)
+                endpoint = min(
+                    candidates,
+                    key=lambda e: (e.outstanding, (self.endpoints.index(e) - self._next) % len(self.endpoints))
+                )
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+            return endpoint
+
+    def release(self, endpoint, interaction_id=None, error=None):
+        """
+        Ends a call. On success the conversation is pinned to the endpoint;
+        provider-side failures take the endpoint out of rotation.
+        """
+        with self._lock:
+            endpoint.outstanding = max(endpoint.outstanding - 1, 0)
+            if error is None:
+                endpoint.healthy = True
+                if interaction_id:
+                    self._sticky[interaction_id] = endpoint
+                    self._sticky.move_to_end(interaction_id)
+                    while len(self._sticky) > self.max_sticky:
+                        self._sticky.popitem(last=False)
+                return
+
+            typed = classify_error(error, "local")
+            if isinstance(typed, (LLMUnavailableError, LLMTimeoutError)):
+                endpoint.failures += 1
+                endpoint.last_error = str(typed)
+                self._mark_down(endpoint)
+
+    def _mark_down(self, endpoint):
+        """Takes an endpoint out of rotation (lock must be held)"""
+        endpoint.healthy = False
+        endpoint.unhealthy_until = time.monotonic() + self.probe_interval
+        # its conversations move elsewhere and rebuild their cache there
+        for interaction_id in [i for i, e in self._sticky.items() if e is endpoint]:
+            del self._sticky[interaction_id]
+
+    @contextmanager
+    def lease(self, interaction_id=None):
+        """with pool.lease(interaction_id) as endpoint: ... (releases on exit)"""
+        endpoint = self.acquire(interaction_id)
+        try:
+            yield endpoint
+        except BaseException as e:
+            self.release(endpoint, interaction_id, e)
+            raise
+        self.release(endpoint, interaction_id)
+
+    # --- health checks ---
+
+    def probe(self, endpoint):
+        """Lists the server's models. Returns True if it answered."""
+        try:
+            client = get_client("local", base_url=endpoint.base_url)
+            client.with_options(timeout=self.probe_timeout).models.list()
+            ok, error = True, None
+        except Exception as e:
+            ok, error = False, f"{type(e).__name__}: {str(e)}"
+
+        with self._lock:
+            endpoint.last_probe = time.time()
+            if ok:
+                endpoint.healthy = True
+                endpoint.last_error = None
+            else:
+                endpoint.last_error = error
+                self._mark_down(endpoint)
+        return ok
+
+    def probe_all(self):
+        """Probes every endpoint in parallel. Returns the number of healthy endpoints."""
+        with ThreadPoolExecutor(max_workers=len(self.endpoints)) as pool:
+            return sum(pool.map(self.probe, self.endpoints))
+
+    def start_health_checks(self):
+        """Probes every `probe_interval` seconds on a daemon thread (idempotent)"""
+        with self._lock:
+            if self._probe_thread or not self.probe_interval:
+                return
+            self._probe_thread = threading.Thread(target=self._probe_loop, name="sokrates-endpoint-probe", daemon=True)
+        self._probe_thread.start()
+
+    def _probe_loop(self):
+        while True:
+            time.sleep(self.probe_interval)
+            self.probe_all()
+
+    def warm_up(self, model, prefixes=None):
+        """
+        Probes every endpoint and sends each one a one-token completion per prefix.
+
+        The first request makes the server load the model; a system prompt sent as
+        a prefix is left in the server's prompt cache for the first real call.
+
+        Returns:
+            int: number of endpoints that answered
+        """
+        prefixes = prefixes or [""]
+
+        def warm(endpoint):
+            if not self.probe(endpoint):
+                return False
+            client = get_client("local", base_url=endpoint.base_url)
+            try:
+                for prefix in prefixes:
+                    messages = [{"role": "system", "content": prefix}] if prefix else []
+                    messages.append({"role": "user", "content": "Reply with OK."})
+                    client.chat.completions.create(model=model, messages=messages, max_tokens=1, temperature=0)
+                return True
+            except Exception as e:
+                print(f"Local LLM warm-up failed for {endpoint.base_url}: {str(e)}")
+                return False
+
+        with ThreadPoolExecutor(max_workers=len(self.endpoints)) as pool:
+            return sum(pool.map(warm, self.endpoints))
+
+    def stats(self):
+        with self._lock:
+            return [endpoint.to_dict() for endpoint in self.endpoints]
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_endpoint_pool(base_urls, probe_interval=15, probe_timeout=5):
+    """
+    Process-wide pool for a list of endpoints (created on first use, health checks started).
+    """
+    key = tuple(base_urls)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = EndpointPool(list(base_urls), probe_interval=probe_interval, probe_timeout=probe_timeout)
+            _pools[key] = pool
+    pool.start_health_checks()
+    return pool
@@ -1,5 +1,7 @@
 import json
 
+from src.tracing import traced
+
 # profile type configurations
 PROFILE_THEMES = {
     "builder": {
@@ -1184,6 +1186,7 @@ def _generate_meta_section(data, theme):
     """
 
 
+@traced("render")
 def generate_anti_portfolio_html(data, user_name="Professional"):
     """
     Generates a rich, interactive HTML file for the Anti-Portfolio.
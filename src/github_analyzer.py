@@ -8,6 +8,8 @@ from datetime import datetime
 from collections import defaultdict
 import json
 
+from src.tracing import span, traced
+
 
 class GitHubAnalyzer:
     """Analyzes GitHub activity to extract learning velocity patterns"""
@@ -20,6 +22,7 @@ class GitHubAnalyzer:
         if github_token:
             self.headers['Authorization'] = f'token {github_token}'
 
+    @traced("http")
     def analyze_user(self, username):
         """
         Main entry point for GitHub analysis
@@ -108,7 +111,9 @@ class GitHubAnalyzer:
         """Fetch all public repositories for a user"""
         try:
             url = f'https://api.github.com/users/{username}/repos'
-            response = requests.get(url, headers=self.headers, params={'per_page': 100, 'sort': 'updated'})
+            with span("GET user repos", "http", url=url) as args:
+                response = requests.get(url, headers=self.headers, params={'per_page': 100, 'sort': 'updated'})
+                args['status'] = response.status_code
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -119,7 +124,9 @@ class GitHubAnalyzer:
         """Fetch commits for a specific repository"""
         try:
             url = f'https://api.github.com/repos/{username}/{repo_name}/commits'
-            response = requests.get(url, headers=self.headers, params={'per_page': max_commits})
+            with span("GET repo commits", "http", url=url) as args:
+                response = requests.get(url, headers=self.headers, params={'per_page': max_commits})
+                args['status'] = response.status_code
             response.raise_for_status()
             return response.json()
         except Exception as e:
@@ -187,16 +194,19 @@ class GitHubAnalyzer:
         return patterns
 
 
-def get_github_analysis_prompt(github_data):
+def get_github_analysis_prompt(github_data, data_text=None):
     """
     Generate AI prompt for analyzing GitHub patterns
     Returns prompt to send to LLM for pattern extraction
+    data_text replaces the JSON dump of the data (e.g. trimmed to a budget)
     """
+    if data_text is None:
+        data_text = json.dumps(github_data, indent=2)
     return f"""
 You are analyzing GitHub commit data to extract learning velocity patterns.
 
 Given this commit history:
-{json.dumps(github_data, indent=2)}
+{data_text}
 
 Extract and return JSON with:
 
@@ -0,0 +1,447 @@
+"""
+Job API for SOKRATES
+HTTP service that queues anti-portfolio generation and runs it on a worker pool (standard library only)
+
+Endpoints:
+    POST /jobs                    submit a candidate -> 202 {"job_id", ...}; 429 when the queue is full
+    GET  /jobs/<id>               status and progress
+    GET  /jobs/<id>/events        progress as server-sent events until the job ends
+    GET  /jobs/<id>/result.html   the anti-portfolio
+    GET  /jobs/<id>/result.json   patterns, transcript and directives
+    GET  /health                  queue and worker counts
+
+A candidate is a JSON object:
+
+    {"name": "Ada Lovelace", "github": "ada", "urls": ["https://..."], "notes": "free text",
+     "documents": [{"name": "cv.txt", "text": "..."}, {"name": "cv.pdf", "content_base64": "..."}],
+     "answers": ["first answer", "second answer", "third answer"]}
+
+Usage:
+    python -m src.job_server --port 8600 --workers 4 --queue-size 32 --max-llm-calls 8
+"""
+
+import argparse
+import base64
+import binascii
+import io
+import json
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.config import get_config
+from src.pipeline import SokratesPipeline
+from src.utils import extract_text_from_pdf
+
+# job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+MAX_BODY_BYTES = 20 * 1024 * 1024
+
+
+class QueueFullError(Exception):
+    """The job queue is at capacity (HTTP 429)"""
+
+
+class Job:
+    """One candidate's generation: status, progress events and, once done, the result"""
+
+    def __init__(self, candidate):
+        self.job_id = uuid.uuid4().hex
+        self.candidate = candidate
+        self.status = QUEUED
+        self.events = []  # progress, in order; an event's index is its SSE id
+        self.warnings = []
+        self.error = None
+        self.html = None
+        self.result = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._changed = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status in (SUCCEEDED, FAILED)
+
+    def add_event(self, step, detail):
+        with self._changed:
+            self.events.append({'step': step, 'detail': detail, 'time': round(time.time() - self.created_at, 3)})
+            self._changed.notify_all()
+
+    def set_status(self, status, error=None):
+        with self._changed:
+            self.status = status
+            self.error = error
+            if status == RUNNING:
+                self.started_at = time.time()
+            elif self.finished:
+                self.finished_at = time.time()
+            self._changed.notify_all()
+
+    def wait_for_events(self, after, timeout):
+        """
+        Blocks until there are events past index `after` or the job ends.
+
+        Returns:
+            tuple: (new events, whether the job has finished)
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: len(self.events) > after or self.finished, timeout)
+            return self.events[after:], self.finished
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'name': self.candidate.get('name'),
+            'status': self.status,
+            'error': self.error,
+            'warnings': self.warnings,
+            'progress': self.events[-1] if self.events else None,
+            'events': len(self.events),
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+
+def read_candidate(payload):
+    """
+    Validates a submitted candidate and decodes its documents. PDFs are kept as
+    bytes and only read by the worker that runs the job (see read_documents).
+
+    Returns:
+        dict: name, github, urls, notes, answers and documents as (name, text or PDF bytes) pairs
+
+    Raises:
+        ValueError: with a message for the client (HTTP 400)
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Expected a JSON object")
+    answers = payload.get('answers')
+    if not answers or not isinstance(answers, list) or not all(isinstance(a, str) for a in answers):
+        raise ValueError("'answers' must be a non-empty list of strings")
+    urls = payload.get('urls', [])
+    if not isinstance(urls, list) or not all(isinstance(u, str) for u in urls):
+        raise ValueError("'urls' must be a list of strings")
+    for field in ('name', 'github', 'notes'):
+        if not isinstance(payload.get(field), (str, type(None))):
+            raise ValueError(f"'{field}' must be a string or null")
+    if not isinstance(payload.get('documents', []), list):
+        raise ValueError("'documents' must be a list")
+
+    documents = []
+    for index, document in enumerate(payload.get('documents', [])):
+        if not isinstance(document, dict):
+            raise ValueError(f"documents[{index}] must be an object")
+        if not isinstance(document.get('name'), (str, type(None))):
+            raise ValueError(f"documents[{index}].name must be a string or null")
+        name = document.get('name') or f"document-{index + 1}"
+        if 'text' in document:
+            documents.append((name, str(document['text'])))
+        elif 'content_base64' in document:
+            if not isinstance(document['content_base64'], str):
+                raise ValueError(f"documents[{index}].content_base64 must be a string")
+            try:
+                content = base64.b64decode(document['content_base64'], validate=True)
+            except (binascii.Error, ValueError):
+                raise ValueError(f"documents[{index}].content_base64 is not valid base64")
+            if name.lower().endswith(".pdf"):
+                documents.append((name, content))
+            else:
+                documents.append((name, content.decode("utf-8", errors="replace")))
+        else:
+            raise ValueError(f"documents[{index}] needs 'text' or 'content_base64'")
+
+    return {
+        'name': payload.get('name') or "Professional",
+        'github': payload.get('github') or None,
+        'urls': urls,
+        'notes': payload.get('notes') or None,
+        'answers': answers,
+        'documents': documents,
+    }
+
+
+def read_documents(documents):
+    """The candidate's documents as (name, text) pairs, with the PDFs read"""
+    return [
+        (name, extract_text_from_pdf(io.BytesIO(content)) if isinstance(content, bytes) else content)
+        for name, content in documents
+    ]
+
+
+class JobQueue:
+    """
+    Bounded in-process queue of generation jobs drained by a pool of worker threads.
+
+    submit() raises QueueFullError instead of blocking once `max_queued` jobs are
+    waiting, so callers get backpressure (429) rather than unbounded latency.
+    LLM calls in flight are capped at `max_llm_calls` across all workers.
+    Finished jobs are kept (oldest dropped first) up to `keep_finished`.
+    """
+
+    def __init__(self, workers=2, max_queued=16, max_llm_calls=4, keep_finished=1000, config=None):
+        self.config = config or get_config()
+        self.max_queued = max_queued
+        self.keep_finished = keep_finished
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = OrderedDict()  # job_id -> Job
+        self._lock = threading.Lock()
+        self._llm_slots = threading.BoundedSemaphore(max_llm_calls)
+        self._workers = [
+            threading.Thread(target=self._work, name=f"sokrates-job-{index}", daemon=True)
+            for index in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, candidate):
+        """
+        Queues a candidate (see read_candidate).
+
+        Raises:
+            QueueFullError: if max_queued jobs are already waiting
+        """
+        job = Job(candidate)
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise QueueFullError(f"{self.max_queued} jobs are already waiting")
+            self._jobs[job.job_id] = job
+            self._evict()
+        return job
+
+    def full(self):
+        """True while submit would raise QueueFullError"""
+        return self._queue.full()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _evict(self):
+        """Drops the oldest finished jobs past keep_finished (lock must be held)"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(len(finished) - self.keep_finished, 0)]:
+            del self._jobs[job_id]
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            'queued': self._queue.qsize(),
+            'max_queued': self.max_queued,
+            'running': statuses.count(RUNNING),
+            'succeeded': statuses.count(SUCCEEDED),
+            'failed': statuses.count(FAILED),
+            'workers': len(self._workers),
+        }
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self.run(job)
+            finally:
+                self._queue.task_done()
+
+    def run(self, job):
+        """Runs one job to completion on the calling thread"""
+        job.set_status(RUNNING)
+        candidate = job.candidate
+        # a new session per job (its own conversation history and background tasks)
+        pipeline = SokratesPipeline(self.config, llm_slots=self._llm_slots)
+        try:
+            has_input, job.warnings = pipeline.fetch_and_ingest(
+                candidate['github'],
+                # pdfs are read here rather than on the request thread, after the queue took the job
+                documents=read_documents(candidate['documents']),
+                urls=candidate['urls'],
+                notes=candidate['notes'],
+                user_name=candidate['name']
+            )
+            if not has_input:
+                raise ValueError("No input (documents, URLs, GitHub or notes)")
+            job.add_event("onboarding", "sources ingested")
+            job.html = pipeline.run_scripted(candidate['answers'], on_progress=job.add_event)
+        except Exception as e:
+            pipeline.cancel()
+            job.set_status(FAILED, f"{type(e).__name__}: {str(e)}")
+            return
+
+        session = pipeline.session
+        job.result = {
+            'job_id': job.job_id,
+            'name': session.user_name,
+            'patterns': session.patterns,
+            'transcript': session.messages,
+            'directives': session.directives,
+            'warnings': job.warnings,
+        }
+        job.set_status(SUCCEEDED)
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """Routes the job API onto the server's JobQueue (self.server.jobs)"""
+
+    server_version = "SokratesJobs/1.0"
+    # SSE keep-alive comment interval (seconds)
+    heartbeat = 15
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, message, headers=None):
+        self._send_json(status, {'error': message}, headers)
+
+    def _job(self, job_id):
+        job = self.server.jobs.get(job_id)
+        if job is None:
+            self._error(404, f"Unknown job {job_id}")
+        return job
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            return self._error(404, "Not found")
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            # the body can't be skipped without a valid length
+            self.close_connection = True
+            return self._error(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            return self._error(413, f"Request body above {MAX_BODY_BYTES} bytes")
+        # answered before the body is read and decoded, so a full queue costs the server nothing
+        if self.server.jobs.full():
+            self.close_connection = True
+            return self._error(429, f"{self.server.jobs.max_queued} jobs are already waiting", {"Retry-After": "30"})
+        try:
+            candidate = read_candidate(json.loads(self.rfile.read(length) or b"null"))
+        except ValueError as e:
+            return self._error(400, str(e))
+        except Exception as e:
+            # any other malformed payload is still the client's error
+            return self._error(400, f"Invalid candidate: {type(e).__name__}: {str(e)}")
+
+        try:
+            job = self.server.jobs.submit(candidate)
+        except QueueFullError as e:
+            return self._error(429, str(e), {"Retry-After": "30"})
+        self._send_json(202, dict(job.to_dict(), links={
+            'status': f"/jobs/{job.job_id}",
+            'events': f"/jobs/{job.job_id}/events",
+            'html': f"/jobs/{job.job_id}/result.html",
+            'json': f"/jobs/{job.job_id}/result.json",
+        }), {"Location": f"/jobs/{job.job_id}"})
+
+    def do_GET(self):
+        parts = [part for part in self.path.split("?")[0].split("/") if part]
+        if parts == ["health"]:
+            return self._send_json(200, self.server.jobs.stats())
+        if len(parts) < 2 or parts[0] != "jobs":
+            return self._error(404, "Not found")
+        job = self._job(parts[1])
+        if job is None:
+            return
+
+        if len(parts) == 2:
+            return self._send_json(200, job.to_dict())
+        if parts[2:] == ["events"]:
+            return self._stream_events(job)
+        if parts[2:] in (["result.html"], ["result.json"]):
+            if job.status == FAILED:
+                return self._error(409, f"Job failed: {job.error}")
+            if job.status != SUCCEEDED:
+                return self._error(409, f"Job is {job.status}", {"Retry-After": "5"})
+            if parts[2] == "result.json":
+                return self._send_json(200, job.result)
+            body = job.html.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Content-Disposition", 'attachment; filename="anti_portfolio.html"')
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self._error(404, "Not found")
+
+    def _stream_events(self, job):
+        """Server-sent events: one "progress" event per step, then "done" with the final status"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        # a reconnecting client continues after the last event it saw
+        try:
+            sent = int(self.headers.get("Last-Event-ID", -1)) + 1
+        except ValueError:
+            sent = 0
+        try:
+            while True:
+                events, finished = job.wait_for_events(sent, self.heartbeat)
+                for event in events:
+                    self.wfile.write(f"id: {sent}\nevent: progress\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+                    sent += 1
+                if finished and not job.wait_for_events(sent, 0)[0]:
+                    self.wfile.write(f"event: done\ndata: {json.dumps(job.to_dict())}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    return
+                if not events:
+                    self.wfile.write(b": keep-alive\n\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client went away; the job keeps running
+
+
+def make_server(host="127.0.0.1", port=8600, workers=2, max_queued=16, max_llm_calls=4, config=None):
+    """HTTP server with its own JobQueue (server.jobs); call serve_forever() to run it"""
+    server = ThreadingHTTPServer((host, port), JobRequestHandler)
+    server.daemon_threads = True
+    server.jobs = JobQueue(workers=workers, max_queued=max_queued, max_llm_calls=max_llm_calls, config=config)
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve SOKRATES anti-portfolio generation as an HTTP job API.")
+    parser.add_argument("--host", default="127.0.0.1", help="bind address (default 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8600, help="port (default 8600)")
+    parser.add_argument("--workers", type=int, default=2, help="jobs run in parallel (default 2)")
+    parser.add_argument("--queue-size", type=int, default=16, help="waiting jobs before 429 (default 16)")
+    parser.add_argument("--max-llm-calls", type=int, default=4, help="LLM calls in flight across jobs (default 4)")
+    args = parser.parse_args()
+    if min(args.workers, args.queue_size, args.max_llm_calls) < 1:
+        parser.error("--workers, --queue-size and --max-llm-calls must be at least 1")
+
+    server = make_server(args.host, args.port, args.workers, args.queue_size, args.max_llm_calls)
+    print(f"SOKRATES job API on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
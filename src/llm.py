@@ -1,67 +1,206 @@
-import streamlit as st
-from google import genai
-from google.genai.types import GenerateContentConfig
-import uuid
-import re
-from openai import OpenAI
+import asyncio
+import json
+import threading
+from src.background_loop import get_background_loop
+from src.cache import ResponseCache, make_cache_key
+from src.cassette import REPLAY, CassetteProvider, get_cassette
+from src.clients import LOCAL_BASE_URL
+from src.config import get_config
+from src.context_budget import estimate_tokens
+from src.endpoint_pool import get_endpoint_pool
+from src.providers import (
+    BATCH_SUCCEEDED,
+    BatchJob,
+    LLMRequest,
+    finish_text,
+    get_provider
+)
+from src.response_text import clean_response
+from src.routing import get_model_tiers, get_route
+from src.structured_output import StructuredOutputError
+from src.telemetry import get_telemetry
+from src.transport import (
+    LLMError,
+    LLMConfigurationError,
+    LLMResponseError,
+    LLMTimeoutError,
+    get_transport
+)
 
-def clean_response(text):
-    """
-    Removes <think> tags and other internal monologue artifacts from the response.
-    Also handles the '>>>' delimiter for strict output control.
+# per-call timeout (seconds) for the async API
+DEFAULT_TIMEOUT = 120
+
+# agents whose calls are pure functions of (model, system_instruction, input)
+DEFAULT_CACHED_AGENTS = ("archivist", "critic", "github_analysis", "multi_source_analysis")
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+_telemetry_configured = False
+_default_settings = None
+_default_settings_lock = threading.Lock()
+
+def warm_up_llm(api_key=None, prefixes=None, config=None):
     """
-    if not text:
-        return ""
-        
-    # 1. Remove <think>...</think> blocks (including newlines)
-    cleaned = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL)
-    
-    # 2. check for explicit output delimiter '>>>'
-    if ">>>" in cleaned:
-        parts = cleaned.split(">>>")
-        # return the last part (the actual output)
-        cleaned = parts[-1]
-        
-    # 3. remove leading/trailing quotes and common prefixes
-    cleaned = cleaned.strip().strip('"').strip("'")
+    Opens the connection for the configured provider ahead of the first agent call.
     
-    # remove "Question:" prefix if present (case insensitive)
-    if cleaned.lower().startswith("question:"):
-        cleaned = cleaned[9:].strip()
-        
-    # remove markdown italics/bold wrappers if they wrap the whole string
-    if cleaned.startswith("*") and cleaned.endswith("*"):
-        cleaned = cleaned.strip("*")
-    if cleaned.startswith("_") and cleaned.endswith("_"):
-        cleaned = cleaned.strip("_")
+    Args:
+        api_key (str, optional): API key to warm up (defaults to secrets.toml).
+        prefixes (list, optional): System prompts to prime local servers' prompt caches with.
+        config (SokratesConfig, optional): Settings (defaults to the process-wide config).
         
-    return cleaned.strip()
+    Returns:
+        bool: True if the provider answered
+    """
+    config = config or get_config()
+    # replayed calls never reach the provider
+    if config.get("CASSETTE_MODE") == REPLAY:
+        return False
+    try:
+        provider = get_provider(config.get("LLM_PROVIDER", "google"))
+    except LLMConfigurationError as e:
+        print(f"LLM warm-up skipped: {str(e)}")
+        return False
+    
+    if provider.api_key_secret:
+        api_key = api_key or config.get(provider.api_key_secret)
+    endpoint_pool = get_llm_endpoint_pool(config) if provider.pooled_endpoints else None
+    return provider.warm_up(api_key, endpoint_pool=endpoint_pool, prefixes=prefixes)
 
-def clean_json_string(json_str):
+def get_llm_endpoint_pool(config=None):
     """
-    Attempts to clean and repair a JSON string.
+    Returns the process-wide pool of local endpoints.
+    
+    Settings (all optional): LOCAL_ENDPOINTS (list of base URLs), LOCAL_HEALTH_INTERVAL (seconds
+    between health probes, 0 disables them).
     """
-    if not json_str:
-        return ""
-        
-    # remove markdown code blocks
-    json_str = re.sub(r'```json', '', json_str)
-    json_str = re.sub(r'```', '', json_str)
-    
-    # attempt to fix common missing bracket errors
-    # case: "core_patterns": [ ... }, "anti_patterns" (missing closing ])
-    # we look for }, "key" where the previous structure implies a list
-    # this is a heuristic fix for the specific error observed
-    if '}, "anti_patterns"' in json_str and '}], "anti_patterns"' not in json_str:
-        json_str = json_str.replace('}, "anti_patterns"', '}], "anti_patterns"')
-        
-    return json_str.strip()
+    config = config or get_config()
+    return get_endpoint_pool(
+        list(config.get("LOCAL_ENDPOINTS", [LOCAL_BASE_URL])),
+        probe_interval=config.get("LOCAL_HEALTH_INTERVAL", 15)
+    )
+
+def _get_transport(provider, settings):
+    """
+    Returns the process-wide transport (rate limiter, retries, circuit breaker) for this provider/key.
+    
+    Settings (all optional): RATE_LIMITS.<provider>, LLM_RETRY, LLM_CIRCUIT_BREAKER.
+    """
+    config = settings["config"]
+    limits = config.get("RATE_LIMITS", {}).get(provider.name, provider.default_rate_limits)
+    return get_transport(
+        provider.name,
+        settings["api_key"],
+        limits=dict(limits),
+        retry=dict(config.get("LLM_RETRY", {})),
+        breaker=dict(config.get("LLM_CIRCUIT_BREAKER", {}))
+    )
+
+def get_llm_telemetry(config=None):
+    """
+    Returns the process-wide LLM telemetry, configured from the config on first use.
+    
+    Settings (all optional): LLM_PRICING (model -> [input, output] USD per 1M tokens),
+    METRICS_DUMP_PATH (Prometheus text file rewritten after every call).
+    """
+    global _telemetry_configured
+    telemetry = get_telemetry()
+    if not _telemetry_configured:
+        config = config or get_config()
+        telemetry.set_pricing(dict(config.get("LLM_PRICING", {})))
+        telemetry.dump_path = config.get("METRICS_DUMP_PATH") or telemetry.dump_path
+        _telemetry_configured = True
+    return telemetry
+
+def _start_call(settings, provider, request):
+    """Starts the telemetry timer for one agent call"""
+    estimated_input = estimate_tokens(request.user_input) + estimate_tokens(request.system_instruction)
+    return get_llm_telemetry(settings["config"]).start_call(
+        request.agent, provider.name, provider.model_for(request.model_name), estimated_input,
+        trace=settings.get("trace")
+    )
+
+def _apply_route(settings, request):
+    """
+    Fills in the agent's route: the model (unless the caller chose one) and generation limits.
+    
+    Settings (all optional): AGENT_ROUTES.<agent>, MODEL_TIERS.<provider> (see src.routing).
+    """
+    route = get_route(request.agent, settings.get("routes"))
+    if not request.model_name:
+        tiers = settings.get("model_tiers") or get_provider(settings["provider"]).model_tiers
+        request.model_name = route.model_for(tiers)
+    # explicit per-request limits win over the route
+    request.generation = dict(route.generation(), **request.generation)
+    return request
+
+def get_response_cache(config=None):
+    """
+    Returns the process-wide response cache, configured from the config on first use.
+    
+    Settings (all optional): RESPONSE_CACHE_PATH, RESPONSE_CACHE_TTL,
+    RESPONSE_CACHE_MEMORY_ENTRIES, RESPONSE_CACHE_MAX_BYTES.
+    """
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            config = config or get_config()
+            _response_cache = ResponseCache(
+                path=config.get("RESPONSE_CACHE_PATH", ".sokrates_cache/responses.sqlite3"),
+                ttl=config.get("RESPONSE_CACHE_TTL", 7 * 24 * 3600),
+                max_memory_entries=config.get("RESPONSE_CACHE_MEMORY_ENTRIES", 256),
+                max_disk_bytes=config.get("RESPONSE_CACHE_MAX_BYTES", 200 * 1024 * 1024)
+            )
+        return _response_cache
+
+def _response_cache_key(settings, provider, request):
+    """
+    Returns the cache key for this call, or None if the call must not be cached.
+    
+    Only agents listed in RESPONSE_CACHE_AGENTS opt in, and stateful continuations
+    (previous_interaction_id) are never cached. Nothing is cached while a cassette
+    records or replays, so every call reaches it.
+    """
+    if not request.agent or request.previous_interaction_id or settings.get("cassette") is not None:
+        return None
+    if request.agent not in settings["config"].get("RESPONSE_CACHE_AGENTS", DEFAULT_CACHED_AGENTS):
+        return None
+    return make_cache_key(
+        provider.name, request.model_name, request.system_instruction, request.user_input,
+        request.response_schema, request.generation
+    )
+
+def get_llm_cassette(config=None):
+    """
+    Returns the process-wide cassette, or None if cassettes are off.
+    
+    Settings: CASSETTE_MODE ("record" or "replay"), CASSETTE_PATH (default
+    .sokrates_cassettes/cassette.jsonl), CASSETTE_LATENCY ("recorded" or seconds per call, default 0).
+    """
+    config = config or get_config()
+    mode = config.get("CASSETTE_MODE")
+    if not mode:
+        return None
+    return get_cassette(
+        config.get("CASSETTE_PATH", ".sokrates_cassettes/cassette.jsonl"),
+        mode,
+        config.get("CASSETTE_LATENCY", 0)
+    )
+
+def _get_provider(settings):
+    """The session's provider, behind the cassette when one is recording or replaying"""
+    provider = get_provider(settings["provider"])
+    if settings.get("cassette") is not None:
+        return CassetteProvider(provider, settings["cassette"])
+    return provider
 
 def get_interaction_response(
     user_input, 
     system_instruction=None, 
-    model_name="gemini-2.5-flash", 
-    previous_interaction_id=None
+    model_name=None, 
+    previous_interaction_id=None,
+    agent=None,
+    response_schema=None,
+    settings=None
 ):
     """
     Wrapper for LLM API interactions.
@@ -69,108 +208,618 @@ def get_interaction_response(
     Args:
         user_input (str): The text input from the user.
         system_instruction (str, optional): System instructions (only used for new interactions).
-        model_name (str): Model to use.
+        model_name (str, optional): Model to use (defaults to the agent's route).
         previous_interaction_id (str, optional): ID to continue a conversation.
+        agent (str, optional): Calling agent (e.g. "archivist"); labels telemetry and enables
+            caching for opted-in agents.
+        response_schema (dict, optional): JSON schema the reply must follow (constrained decoding);
+            the validated reply is returned as JSON text. See get_structured_response.
+        settings (dict, optional): Snapshot from build_llm_settings (defaults to
+            the process-wide default_llm_settings()).
         
     Returns:
-        tuple: (response_text, interaction_id)
+        tuple: (response_text, interaction_id) - interaction_id is None for cached responses
+        
+    Raises:
+        LLMError: typed failure (configuration, rate limit, timeout, provider down, bad response;
+            StructuredOutputError if the reply does not match response_schema)
     """
+    settings = settings or default_llm_settings()
+    provider = _get_provider(settings)
+    request = _apply_route(settings, LLMRequest(
+        user_input, system_instruction, model_name, previous_interaction_id, response_schema, agent
+    ))
+    timer = _start_call(settings, provider, request)
     
-    # check for provider configuration (default to google if not set)
-    provider = st.secrets.get("LLM_PROVIDER", "google")
+    cache_key = _response_cache_key(settings, provider, request)
+    if cache_key:
+        cached = get_response_cache(settings["config"]).get(cache_key)
+        if cached is not None:
+            timer.finish(cached=True)
+            return cached, None
     
-    if provider == "local":
-        return _get_local_response(user_input, system_instruction, previous_interaction_id)
+    try:
+        response_text, interaction_id = provider.complete(
+            settings, request, _get_transport(provider, settings), timer
+        )
+    except LLMError as e:
+        timer.finish(error=type(e).__name__)
+        raise
+    timer.finish(output_tokens=estimate_tokens(response_text))
     
-    # --- cloud provider implementation ---
-    # priority: user-provided key > secrets.toml
-    api_key = None
-    if "user_api_key" in st.session_state and st.session_state.user_api_key:
-        api_key = st.session_state.user_api_key
-    elif "GEMINI_API_KEY" in st.secrets:
-        api_key = st.secrets["GEMINI_API_KEY"]
+    if cache_key:
+        get_response_cache(settings["config"]).set(cache_key, response_text)
     
-    if not api_key:
-        st.error("Please enter your Gemini API key in the sidebar")
-        return "Error: API Key missing. Please enter your API key in the sidebar.", None
+    return response_text, interaction_id
 
-    client = genai.Client(api_key=api_key)
+def get_structured_response(
+    user_input,
+    response_schema,
+    system_instruction=None,
+    model_name=None,
+    agent=None,
+    max_attempts=2,
+    settings=None
+):
+    """
+    Gets a reply constrained to a JSON schema and returns it decoded.
     
-    config = {
-        "model": model_name,
-        "input": user_input,
-    }
+    Gemini receives the schema as its response format and OpenAI-compatible local
+    servers as a json_schema response format, so the model cannot produce anything
+    else. A reply that still fails validation is regenerated up to max_attempts times.
     
-    # if continuing a conversation, use the ID
-    if previous_interaction_id:
-        config["previous_interaction_id"] = previous_interaction_id
-    # if starting a new one, we can add system instructions
-    elif system_instruction:
-        # note: for the interactions API, system instructions are often best passed 
-        # as the initial context or prepended to the first input if the specific 
-        # model/endpoint doesn't support a separate 'system_instruction' param 
-        # in the create() call directly. 
-        # however, the Client usually handles config. Let's check if we can pass it in config.
-        # the docs show simple input. We will prepend it to be safe and explicit.
-        config["input"] = f"SYSTEM INSTRUCTION:\n{system_instruction}\n\nUSER INPUT:\n{user_input}"
-
-    try:
-        interaction = client.interactions.create(**config)
+    Args:
+        user_input (str): The text input.
+        response_schema (dict): JSON schema (e.g. EXTRACTOR_SCHEMA).
+        system_instruction (str, optional): System instructions.
+        model_name (str, optional): Model to use (defaults to the agent's route).
+        agent (str, optional): Calling agent (e.g. "extractor").
+        max_attempts (int): Generations before giving up on an invalid reply.
+        settings (dict, optional): Settings snapshot (defaults to default_llm_settings()).
         
-        # get text from the last output
-        response_text = interaction.outputs[-1].text
-        return clean_response(response_text), interaction.id
+    Returns:
+        tuple: (data dict, interaction_id)
         
-    except Exception as e:
-        return f"Error generating response: {str(e)}", None
+    Raises:
+        LLMError: typed failure; StructuredOutputError (with .raw_text) if every reply was invalid
+    """
+    for attempt in range(1, max_attempts + 1):
+        try:
+            response_text, interaction_id = get_interaction_response(
+                user_input,
+                system_instruction=system_instruction,
+                model_name=model_name,
+                agent=agent,
+                response_schema=response_schema,
+                settings=settings
+            )
+            return json.loads(response_text), interaction_id
+        except StructuredOutputError:
+            if attempt == max_attempts:
+                raise
+
+# --- streaming ---
 
-def _get_local_response(user_input, system_instruction, previous_interaction_id):
+class StreamingResponseFilter:
     """
-    Handles interaction with a local LLM (e.g., LM Studio) mimicking the Interaction API state.
+    Incremental version of clean_response for token streams.
+    
+    Strips <think>...</think> blocks and honours the '>>>' delimiter even when
+    the markers are split across chunk boundaries. Text that could still turn
+    out to be part of a marker (or a trailing quote) is held back until the
+    next chunk decides it. Once finished, .text equals clean_response(raw).
     """
-    # initialize local storage if needed
-    if "local_interactions" not in st.session_state:
-        st.session_state.local_interactions = {}
+
+    THINK_OPEN = "<think>"
+    THINK_CLOSE = "</think>"
+    DELIMITER = ">>>"
+    TRAILING_JUNK = " \t\r\n\"'*_"
+
+    def __init__(self, wait_for_delimiter=False):
+        # when True nothing is emitted until '>>>' appears (prompts that require it)
+        self.wait_for_delimiter = wait_for_delimiter
+        self.text = ""
+        self.replaced = False  # True if a later '>>>' invalidated already emitted text
+        self._raw = []
+        self._pending = ""
+        self._visible = ""
+        self._in_think = False
+        self._seen_delimiter = False
+        self._emitted = ""
+
+    def feed(self, chunk):
+        """
+        Adds a raw chunk and returns the newly displayable text (may be empty).
+        """
+        if not chunk:
+            return ""
+        self._raw.append(chunk)
+        self._pending += chunk
+        self._consume()
         
-    # determine interaction ID
-    interaction_id = previous_interaction_id
-    if not interaction_id:
-        interaction_id = str(uuid.uuid4())
-        st.session_state.local_interactions[interaction_id] = []
-        # add system instruction if new
-        if system_instruction:
-            st.session_state.local_interactions[interaction_id].append({
-                "role": "system", 
-                "content": system_instruction
-            })
+        if self.wait_for_delimiter and not self._seen_delimiter:
+            return ""
+        return self._emit(self._display_prefix(self._visible))
+
+    def finish(self):
+        """
+        Flushes held-back text. Returns the remaining displayable text.
+        """
+        self.text = clean_response("".join(self._raw))
+        return self._emit(self.text, final=True)
+
+    @property
+    def raw(self):
+        """Everything fed so far, before cleaning"""
+        return "".join(self._raw)
+
+    def _consume(self):
+        """Moves pending raw text into the visible buffer, resolving complete markers"""
+        while self._pending:
+            if self._in_think:
+                end = self._pending.find(self.THINK_CLOSE)
+                if end == -1:
+                    # keep only what could be the start of the closing tag
+                    self._pending = self._pending[-(len(self.THINK_CLOSE) - 1):]
+                    return
+                self._pending = self._pending[end + len(self.THINK_CLOSE):]
+                self._in_think = False
+                continue
+
+            think = self._pending.find(self.THINK_OPEN)
+            delim = self._pending.find(self.DELIMITER)
+            if think != -1 and (delim == -1 or think < delim):
+                self._visible += self._pending[:think]
+                self._pending = self._pending[think + len(self.THINK_OPEN):]
+                self._in_think = True
+                continue
+            if delim != -1:
+                # only the text after the last delimiter is output
+                self._visible = ""
+                self._seen_delimiter = True
+                self._pending = self._pending[delim + len(self.DELIMITER):]
+                continue
+
+            hold = _partial_marker_length(self._pending, (self.THINK_OPEN, self.DELIMITER))
+            self._visible += self._pending[:len(self._pending) - hold]
+            self._pending = self._pending[len(self._pending) - hold:]
+            return
+
+    def _display_prefix(self, visible):
+        """Applies clean_response's leading/trailing rules to a partial response"""
+        text = visible.lstrip().lstrip('"').lstrip("'")
+        
+        # wait until we know whether the response starts with "Question:"
+        if len(text) < 9 and "question:".startswith(text.lower()):
+            return ""
+        if text.lower().startswith("question:"):
+            text = text[9:].lstrip()
             
-    # retrieve history
-    messages = list(st.session_state.local_interactions[interaction_id])
+        # trailing quotes/markdown may be stripped at the end, so hold them back
+        return text.rstrip(self.TRAILING_JUNK)
+
+    def _emit(self, display, final=False):
+        """Returns the part of display that has not been emitted yet"""
+        if not display.startswith(self._emitted):
+            # a later delimiter restarted the output; caller should re-render .text
+            self.replaced = True
+            if final:
+                return ""
+            self._emitted = ""
+        delta = display[len(self._emitted):]
+        self._emitted = display
+        return delta
+
+def _partial_marker_length(text, markers):
+    """Length of the longest suffix of text that is a proper prefix of one of the markers"""
+    longest = 0
+    for marker in markers:
+        for size in range(min(len(marker) - 1, len(text)), 0, -1):
+            if text.endswith(marker[:size]):
+                longest = max(longest, size)
+                break
+    return longest
+
+class InteractionStream:
+    """
+    Iterable of cleaned response chunks, suitable for st.write_stream.
     
-    # add user input
-    messages.append({"role": "user", "content": user_input})
+    After iteration finishes, .text holds the full cleaned response and
+    .interaction_id the ID to continue the conversation with.
+    """
+
+    def __init__(self, chunks, response_filter, timer):
+        self._chunks = chunks
+        self.filter = response_filter
+        self.timer = timer
+        self.interaction_id = None
+        self.text = ""
+
+    def __iter__(self):
+        error = "cancelled"  # stays set if the consumer stops iterating early
+        try:
+            for chunk in self._chunks(self):
+                self.timer.first_token()
+                delta = self.filter.feed(chunk)
+                if delta:
+                    yield delta
+            tail = self.filter.finish()
+            self.text = self.filter.text
+            error = None
+            if tail:
+                yield tail
+        except LLMError as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.timer.finish(output_tokens=estimate_tokens(self.filter.raw), error=error)
+
+    @property
+    def replaced(self):
+        """True if the streamed text differs from the final .text and should be re-rendered"""
+        return self.filter.replaced
+
+    @property
+    def raw_text(self):
+        """The uncleaned reply, including anything before '>>>'"""
+        return self.filter.raw
+
+def stream_interaction_response(
+    user_input,
+    system_instruction=None,
+    model_name=None,
+    previous_interaction_id=None,
+    wait_for_delimiter=False,
+    agent=None,
+    settings=None
+):
+    """
+    Streaming variant of get_interaction_response.
     
-    # call local LLM
-    try:
-        client = OpenAI(base_url="http://localhost:1234/v1", api_key="lm-studio")
+    Args:
+        user_input (str): The text input from the user.
+        system_instruction (str, optional): System instructions (only used for new interactions).
+        model_name (str, optional): Model to use (defaults to the agent's route).
+        previous_interaction_id (str, optional): ID to continue a conversation.
+        wait_for_delimiter (bool): Hold output until '>>>' (for prompts that require it).
+        agent (str, optional): Calling agent (e.g. "sokrates"); labels telemetry.
+        settings (dict, optional): Settings snapshot (defaults to default_llm_settings()).
         
-        completion = client.chat.completions.create(
-            model="local-model", # uses loaded model
-            messages=messages,
-            temperature=0.7
+    Returns:
+        InteractionStream: iterate it (or pass it to st.write_stream), then read
+        .text and .interaction_id. Iteration raises LLMError on failure.
+    """
+    settings = settings or default_llm_settings()
+    provider = _get_provider(settings)
+    request = _apply_route(
+        settings, LLMRequest(user_input, system_instruction, model_name, previous_interaction_id, agent=agent)
+    )
+    response_filter = StreamingResponseFilter(wait_for_delimiter=wait_for_delimiter)
+    
+    def chunks(stream):
+        yield from provider.stream(settings, request, _get_transport(provider, settings), stream)
+    
+    return InteractionStream(chunks, response_filter, _start_call(settings, provider, request))
+
+# --- async api ---
+
+def build_llm_settings(config=None, api_key=None, history=None, trace=None):
+    """
+    Snapshot of the provider settings for one session (a user, a candidate, a job).
+    
+    The result is plain data and can be handed to worker threads and coroutines on
+    the background loop.
+    
+    Args:
+        config (SokratesConfig, optional): Settings (defaults to the process-wide config).
+        api_key (str, optional): The session's own API key (defaults to the config's).
+        history (optional): The session's conversation history store, for providers that keep
+            history client-side (defaults to a new, empty one).
+        trace (Trace, optional): The session's trace; every call adds a span to it.
+    
+    Returns:
+        dict: provider name, config, api_key, the history store, the endpoint pool (pooled
+        providers, except when replaying a cassette), batch_dir, agent routes, the provider's model tiers, the cassette
+        (record/replay mode) and the trace
+    """
+    config = config or get_config()
+    provider = get_provider(config.get("LLM_PROVIDER", "google"))
+    if provider.api_key_secret and not api_key:
+        api_key = config.get(provider.api_key_secret)
+    if provider.keeps_history and history is None:
+        history = provider.new_history(
+            window_turns=config.get("LOCAL_HISTORY_TURNS", 4),
+            summary_batch_turns=config.get("LOCAL_SUMMARY_BATCH_TURNS", 2),
+            max_conversations=config.get("LOCAL_HISTORY_CONVERSATIONS", 16)
         )
+    cassette = get_llm_cassette(config)
+    # replayed calls never reach an endpoint, so don't start the pool (and its health probes)
+    live = cassette is None or cassette.mode != REPLAY
+    return {
+        "provider": provider.name,
+        "config": config,
+        "api_key": api_key if provider.api_key_secret else None,
+        "history": history if provider.keeps_history else None,
+        "endpoint_pool": get_llm_endpoint_pool(config) if provider.pooled_endpoints and live else None,
+        "batch_dir": config.get("BATCH_DIR", ".sokrates_batches"),
+        "cassette": cassette,
+        "routes": {agent: dict(route) for agent, route in config.get("AGENT_ROUTES", {}).items()},
+        "model_tiers": get_model_tiers(
+            provider.model_tiers, dict(config.get("MODEL_TIERS", {}).get(provider.name, {}))
+        ),
+        "trace": trace,
+    }
+
+def default_llm_settings():
+    """
+    Process-wide settings for calls made without a session (scripts, one-off calls).
+    All of them share one conversation history store.
+    """
+    global _default_settings
+    with _default_settings_lock:
+        if _default_settings is None:
+            _default_settings = build_llm_settings()
+        return _default_settings
+
+async def aget_interaction_response(
+    user_input,
+    system_instruction=None,
+    model_name=None,
+    previous_interaction_id=None,
+    timeout=DEFAULT_TIMEOUT,
+    settings=None,
+    agent=None,
+    response_schema=None
+):
+    """
+    Async variant of get_interaction_response built on the SDKs' async clients.
+    
+    Cancelling the awaiting task cancels the underlying HTTP request.
+    
+    Args:
+        user_input (str): The text input from the user.
+        system_instruction (str, optional): System instructions (only used for new interactions).
+        model_name (str, optional): Model to use (defaults to the agent's route).
+        previous_interaction_id (str, optional): ID to continue a conversation.
+        timeout (float, optional): Seconds before the call is abandoned.
+        settings (dict, optional): Settings snapshot (see build_llm_settings).
+        agent (str, optional): Calling agent; labels telemetry and enables caching for opted-in agents.
+        response_schema (dict, optional): JSON schema the reply must follow.
         
-        response_text = completion.choices[0].message.content
-        cleaned_text = clean_response(response_text)
-        
-        # append assistant response to history
-        messages.append({"role": "assistant", "content": cleaned_text})
+    Returns:
+        tuple: (response_text, interaction_id)
         
-        # update state
-        st.session_state.local_interactions[interaction_id] = messages
+    Raises:
+        LLMError: typed failure (LLMTimeoutError once `timeout` is exceeded)
+    """
+    settings = settings or default_llm_settings()
+    provider = _get_provider(settings)
+    request = _apply_route(settings, LLMRequest(
+        user_input, system_instruction, model_name, previous_interaction_id, response_schema, agent
+    ))
+    timer = _start_call(settings, provider, request)
+    
+    cache_key = _response_cache_key(settings, provider, request)
+    if cache_key:
+        cached = get_response_cache(settings["config"]).get(cache_key)
+        if cached is not None:
+            timer.finish(cached=True)
+            return cached, None
+    
+    try:
+        response_text, interaction_id = await asyncio.wait_for(
+            provider.acomplete(settings, request, _get_transport(provider, settings), timer),
+            timeout
+        )
+    except asyncio.TimeoutError as e:
+        timer.finish(error=LLMTimeoutError.__name__)
+        raise LLMTimeoutError(f"No response within {timeout}s", provider.name) from e
+    except LLMError as e:
+        timer.finish(error=type(e).__name__)
+        raise
+    except asyncio.CancelledError:
+        timer.finish(error="cancelled")
+        raise
+    timer.finish(output_tokens=estimate_tokens(response_text))
+    
+    if cache_key:
+        get_response_cache(settings["config"]).set(cache_key, response_text)
+    
+    return response_text, interaction_id
+
+class AsyncInteractionStream:
+    """
+    Async iterable of cleaned response chunks.
+    
+    After iteration finishes, .text holds the full cleaned response and
+    .interaction_id the ID to continue the conversation with.
+    """
+
+    def __init__(self, chunks, response_filter, timer, timeout=DEFAULT_TIMEOUT):
+        self._chunks = chunks
+        self.filter = response_filter
+        self.timer = timer
+        self.timeout = timeout
+        self.interaction_id = None
+        self.text = ""
+
+    async def __aiter__(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout if self.timeout else None
+        chunks = self._chunks(self)
+        error = "cancelled"  # stays set if the consumer stops iterating early
         
-        return cleaned_text, interaction_id
+        try:
+            while True:
+                remaining = max(deadline - loop.time(), 0) if deadline else None
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), remaining)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError as e:
+                    self.interaction_id = None
+                    raise LLMTimeoutError(f"Stream did not finish within {self.timeout}s") from e
+                
+                self.timer.first_token()
+                delta = self.filter.feed(chunk)
+                if delta:
+                    yield delta
+            
+            tail = self.filter.finish()
+            self.text = self.filter.text
+            error = None
+            if tail:
+                yield tail
+        except LLMError as e:
+            error = type(e).__name__
+            raise
+        finally:
+            await chunks.aclose()
+            self.timer.finish(output_tokens=estimate_tokens(self.filter.raw), error=error)
+
+    @property
+    def replaced(self):
+        """True if the streamed text differs from the final .text and should be re-rendered"""
+        return self.filter.replaced
+
+    @property
+    def raw_text(self):
+        """The uncleaned reply, including anything before '>>>'"""
+        return self.filter.raw
+
+def astream_interaction_response(
+    user_input,
+    system_instruction=None,
+    model_name=None,
+    previous_interaction_id=None,
+    wait_for_delimiter=False,
+    timeout=DEFAULT_TIMEOUT,
+    settings=None,
+    agent=None
+):
+    """
+    Async streaming variant of get_interaction_response.
+    
+    Returns:
+        AsyncInteractionStream: iterate it with `async for`, then read .text and .interaction_id
+    """
+    settings = settings or default_llm_settings()
+    provider = _get_provider(settings)
+    request = _apply_route(
+        settings, LLMRequest(user_input, system_instruction, model_name, previous_interaction_id, agent=agent)
+    )
+    response_filter = StreamingResponseFilter(wait_for_delimiter=wait_for_delimiter)
+    
+    def chunks(stream):
+        return provider.astream(settings, request, _get_transport(provider, settings), stream)
+    
+    return AsyncInteractionStream(chunks, response_filter, _start_call(settings, provider, request), timeout)
+
+def submit_interaction_response(
+    user_input,
+    system_instruction=None,
+    model_name=None,
+    previous_interaction_id=None,
+    timeout=DEFAULT_TIMEOUT,
+    agent=None,
+    settings=None,
+    response_schema=None
+):
+    """
+    Starts an LLM call on the shared background loop without blocking the script thread.
+    
+    Independent agent calls can be submitted together and collected later. Worker
+    threads (see src.step_runner) can call this too if they pass a settings snapshot
+    taken on the script thread.
+    
+    Args:
+        settings (dict, optional): Settings snapshot (see build_llm_settings).
+        response_schema (dict, optional): JSON schema the reply must follow.
+    
+    Returns:
+        concurrent.futures.Future: .result() gives (response_text, interaction_id) or raises LLMError,
+        .cancel() aborts the call
+    """
+    settings = settings or default_llm_settings()
+    return get_background_loop().submit(
+        aget_interaction_response(
+            user_input,
+            system_instruction=system_instruction,
+            model_name=model_name,
+            previous_interaction_id=previous_interaction_id,
+            timeout=timeout,
+            settings=settings,
+            agent=agent,
+            response_schema=response_schema
+        )
+    )
+
+# --- batch api ---
+
+def submit_batch(requests, display_name=None, settings=None):
+    """
+    Submits non-interactive agent calls (Archivist, Critic, Extractor, analyses) as one batch job.
+    
+    Gemini runs them in batch mode (discounted, high throughput, results within
+    24h); the local provider writes a JSONL file that `python -m src.batch_worker`
+    runs against the local server.
+    
+    Args:
+        requests (list): LLMRequest objects (no previous_interaction_id); set custom_id to match results.
+        display_name (str, optional): Job name.
+        settings (dict, optional): Settings snapshot (see build_llm_settings).
         
-    except Exception as e:
-        return f"Error connecting to Local LLM: {str(e)}", None
+    Returns:
+        BatchJob: store job.to_dict() to collect the results later (possibly from another process)
+    """
+    settings = settings or default_llm_settings()
+    provider = get_provider(settings["provider"])
+    if not provider.supports_batch:
+        raise LLMConfigurationError(f"The {provider.name} provider does not support batch jobs.", provider.name)
+    if any(request.previous_interaction_id for request in requests):
+        raise LLMConfigurationError("Batch requests cannot continue an interaction.", provider.name)
+    requests = [_apply_route(settings, request) for request in requests]
+    return provider.submit_batch(settings, requests, _get_transport(provider, settings), display_name)
+
+def get_batch_status(job, settings=None):
+    """
+    Returns:
+        str: "pending", "running", "succeeded", "failed" or "cancelled"
+    """
+    if isinstance(job, dict):
+        job = BatchJob.from_dict(job)
+    settings = settings or default_llm_settings()
+    provider = get_provider(job.provider)
+    return provider.batch_status(settings, job, _get_transport(provider, settings))
 
+def get_batch_results(job, settings=None):
+    """
+    Collects a finished batch. Replies are cleaned (or schema-validated) like interactive ones.
+    
+    Returns:
+        dict: custom_id -> response text, or the LLMError for that request
+        
+    Raises:
+        LLMError: if the job has not succeeded
+    """
+    if isinstance(job, dict):
+        job = BatchJob.from_dict(job)
+    settings = settings or default_llm_settings()
+    provider = get_provider(job.provider)
+    transport = _get_transport(provider, settings)
+    
+    status = provider.batch_status(settings, job, transport)
+    if status != BATCH_SUCCEEDED:
+        raise LLMResponseError(f"Batch {job.job_id} is {status}.", provider.name, retryable=status in ("pending", "running"))
+    
+    results = {}
+    for custom_id, raw in provider.batch_results(settings, job, transport).items():
+        if isinstance(raw, LLMError):
+            results[custom_id] = raw
+            continue
+        try:
+            schema = job.requests.get(custom_id, {}).get('response_schema')
+            results[custom_id] = finish_text(raw, schema, provider.name)
+        except LLMError as e:
+            results[custom_id] = e
+    return results
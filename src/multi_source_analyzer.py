@@ -8,6 +8,8 @@ from datetime import datetime
 from collections import defaultdict
 import json
 
+from src.tracing import traced
+
 
 class MultiSourceAnalyzer:
     """
@@ -36,6 +38,20 @@ class MultiSourceAnalyzer:
         Returns:
             dict: Comprehensive analysis of learning patterns
         """
+        self.extract(text)
+        return self._compile_analysis()
+
+    def extract(self, text):
+        """
+        Runs the extraction passes over one source without compiling them
+
+        Args:
+            text: Raw text of the source
+
+        Returns:
+            dict: Everything this analyzer has extracted so far, as plain data
+                  (one source for a new analyzer; see merge)
+        """
         # extract timeline events
         self._extract_timeline(text)
 
@@ -54,8 +70,34 @@ class MultiSourceAnalyzer:
         # identify learning signals
         self._identify_learning_signals(text)
 
-        return self._compile_analysis()
+        return {
+            key: {skill: list(mentions) for skill, mentions in value.items()} if key == 'skill_mentions' else list(value)
+            for key, value in self.data.items()
+        }
+
+    @classmethod
+    def merge(cls, extractions):
+        """
+        Compiles the extract() results of several sources into one analysis,
+        so a changed source is re-extracted alone
 
+        Args:
+            extractions: extract() results, in source order
+
+        Returns:
+            dict: Comprehensive analysis of learning patterns (as analyze_text)
+        """
+        analyzer = cls()
+        for extraction in extractions:
+            for key, value in extraction.items():
+                if key == 'skill_mentions':
+                    for skill, mentions in value.items():
+                        analyzer.data['skill_mentions'][skill].extend(mentions)
+                else:
+                    analyzer.data[key].extend(value)
+        return analyzer._compile_analysis()
+
+    @traced("extract")
     def _extract_timeline(self, text):
         """Extract dated events and create timeline"""
         # date patterns: 2020-2023, Jan 2020, 2020-Present, etc.
@@ -81,6 +123,7 @@ class MultiSourceAnalyzer:
                         'line': line.strip()
                     })
 
+    @traced("extract")
     def _extract_skills(self, text):
         """Extract technical and soft skills with context"""
         # common skill categories and keywords
@@ -160,6 +203,7 @@ class MultiSourceAnalyzer:
                         'position': match.start()
                     })
 
+    @traced("extract")
     def _extract_projects(self, text):
         """Extract project descriptions and complexity indicators"""
         # keywords that often indicate project descriptions
@@ -217,6 +261,7 @@ class MultiSourceAnalyzer:
             'indicators': found_indicators
         }
 
+    @traced("extract")
     def _extract_education(self, text):
         """Extract education and learning timeline"""
         # education keywords
@@ -236,6 +281,7 @@ class MultiSourceAnalyzer:
                     'full_match': match.group(0)
                 })
 
+    @traced("extract")
     def _detect_transitions(self, text):
         """Detect career transitions and pivots"""
         # role progression keywords
@@ -261,6 +307,7 @@ class MultiSourceAnalyzer:
                             'year': date_match.group(0) if date_match else None
                         })
 
+    @traced("extract")
     def _identify_learning_signals(self, text):
         """Identify implicit learning and growth signals"""
         learning_signal_patterns = {
@@ -301,6 +348,7 @@ class MultiSourceAnalyzer:
                         'context': context.strip()
                     })
 
+    @traced("extract")
     def _compile_analysis(self):
         """Compile all extracted data into structured analysis"""
         # calculate timeline span
@@ -468,18 +516,21 @@ class MultiSourceAnalyzer:
         return dict(grouped)
 
 
-def get_multi_source_analysis_prompt(analysis_data):
+def get_multi_source_analysis_prompt(analysis_data, data_text=None):
     """
     Generate AI prompt for analyzing multi-source data
     Returns prompt to send to LLM for pattern extraction
+    data_text replaces the JSON dump of the data (e.g. trimmed to a budget)
     """
+    if data_text is None:
+        data_text = json.dumps(analysis_data, indent=2)
     return f"""
 You are analyzing professional background data to extract learning velocity patterns.
 
 Data has been extracted from: CV, LinkedIn, Portfolio, or other professional sources.
 
 Given this analysis:
-{json.dumps(analysis_data, indent=2)}
+{data_text}
 
 Extract and return JSON with:
 
@@ -0,0 +1,1088 @@
+"""
+Pipeline for SOKRATES
+Streamlit-free engine: session state, prompt building for each agent and the steps from onboarding to the portfolio
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from src.cache import RenderCache, make_render_key
+from src.config import get_config
+from src.context_budget import BudgetReport, PromptSection, fit_to_budget
+from src.generator import generate_anti_portfolio_html
+from src.github_analyzer import GitHubAnalyzer, get_github_analysis_prompt
+from src.llm import (
+    build_llm_settings,
+    get_structured_response,
+    stream_interaction_response,
+    submit_interaction_response
+)
+from src.multi_source_analyzer import MultiSourceAnalyzer, get_multi_source_analysis_prompt
+from src.prompts import (
+    EXTRACTOR_SCHEMA,
+    FUSED_TURN_PROMPT,
+    SYSTEM_PROMPT_ARCHIVIST,
+    SYSTEM_PROMPT_CRITIC,
+    SYSTEM_PROMPT_DIRECTOR,
+    SYSTEM_PROMPT_EXTRACTOR,
+    SYSTEM_PROMPT_SOKRATES
+)
+from src.response_text import extract_directive
+from src.session_tasks import get_session_tasks
+from src.step_runner import StageMemo, StepRunner, stage_key
+from src.tracing import Trace, activate, span
+from src.utils import extract_text_from_url
+
+
+# session steps, in order
+ONBOARDING = "onboarding"
+PROCESSING = "processing"
+INTERVIEWING = "interviewing"
+GENERATING = "generating"
+COMPLETE = "complete"
+
+# the interview is three answers long (accelerated mode)
+INTERVIEW_TURNS = 3
+
+PHASE_CONTEXTS = {
+    1: "PHASE 1: ORIGINS. We need to know WHY they do what they do.",
+    2: "PHASE 2: PROCESS. We need to know HOW they work (chaos vs structure).",
+    3: "PHASE 3: POTENTIAL. Test their limits with a hypothetical scenario.",
+}
+
+GITHUB_ANALYSIS_INSTRUCTION = "You are a data analyst. Extract learning patterns from GitHub data and return valid JSON only."
+MULTI_SOURCE_ANALYSIS_INSTRUCTION = "You are a data analyst. Extract learning patterns from professional background data and return valid JSON only."
+
+# bumped when the snapshot layout changes; older checkpoints are then ignored
+SNAPSHOT_VERSION = 2
+
+# fallback texts when a (local) model returns nothing
+EMPTY_INTRO = "I have analyzed your background. Shall we begin?"
+EMPTY_TURN = "..."
+
+
+def tracing_enabled(config):
+    """Whether sessions record a trace: TRACING (written to TRACE_DIR) or TRACE_PANEL (the app's debug panel)"""
+    return bool(config.get("TRACING", False) or config.get("TRACE_PANEL", False))
+
+
+def phase_context(turn):
+    """Director phase for an interview turn"""
+    return PHASE_CONTEXTS.get(turn, PHASE_CONTEXTS[3])
+
+
+def fetch_github(username):
+    """GitHub analysis that never raises; returns (data, error message)"""
+    try:
+        return GitHubAnalyzer().analyze_user(username), None
+    except Exception as e:
+        return None, str(e)
+
+
+def github_context(github_data):
+    """Summary of a GitHub analysis for the combined user context"""
+    context = "\n--- GITHUB ANALYSIS ---\n"
+    context += f"Repositories: {len(github_data['project_complexity'])}\n"
+    context += f"Languages: {', '.join([lang['language'] for lang in github_data['language_evolution'][:5]])}\n"
+    context += "Learning Pattern Signals Detected\n"
+    return context
+
+
+def source_texts(github_data=None, documents=(), url_texts=(), notes=None):
+    """
+    The user context's parts, one per source, in a fixed order.
+
+    Args:
+        github_data: GitHubAnalyzer result (optional)
+        documents: (file name, text) pairs
+        url_texts: texts fetched from URLs
+        notes: free text from the user
+    """
+    texts = []
+    if github_data:
+        texts.append(github_context(github_data))
+    for name, text in documents:
+        texts.append(f"\n--- FILE: {name} ---\n{text}\n")
+    texts.extend(text for text in url_texts if text)
+    if notes:
+        texts.append(f"\n--- USER NOTES ---\n{notes}\n")
+    return texts
+
+
+def combine_sources(github_data=None, documents=(), url_texts=(), notes=None):
+    """Builds the user context from every source, in a fixed order (see source_texts)"""
+    return "".join(source_texts(github_data, documents, url_texts, notes))
+
+
+def source_digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def archivist_input(multi_source_data, user_context, budget_overrides=None):
+    """
+    Returns:
+        tuple: (Archivist input, BudgetReport)
+    """
+    # extract key metrics (for context building, not displayed)
+    skills_found = multi_source_data['skills']['total_unique_skills']
+    projects_found = multi_source_data['projects']['total']
+    timeline_years = multi_source_data['timeline']['span']['total_years']
+
+    structured_data = f"""STRUCTURED DATA EXTRACTED:
+- Timeline: {timeline_years} years of professional activity
+- Skills: {skills_found} unique skills across {len(multi_source_data['skills']['by_category'])} categories
+- Projects: {projects_found} projects identified
+- Education: {len(multi_source_data['education']['formal'])} formal degrees, {len(multi_source_data['education']['certifications'])} certifications
+- Learning Signals: {multi_source_data['learning_signals']['total']} growth indicators found
+- Career Progression: {multi_source_data['career_progression']['progression_detected']}"""
+
+    # keep the raw documents within the archivist's budget (shared fairly across files)
+    fitted, report = fit_to_budget("archivist", [
+        PromptSection("user_context", user_context, strategy="documents"),
+        PromptSection("structured_data", structured_data, trimmable=False)
+    ], overrides=budget_overrides)
+
+    # enhanced context with structured data
+    enhanced_context = f"""
+USER CONTENT:
+{fitted['user_context']}
+
+{structured_data}
+
+Now extract the key FACTS from the content above.
+        """
+    return enhanced_context, report
+
+
+def critic_input(facts, multi_source_data, budget_overrides=None):
+    """
+    Returns:
+        tuple: (Silent Critic input, BudgetReport)
+    """
+    fitted, report = fit_to_budget("critic", [PromptSection("facts", facts)], overrides=budget_overrides)
+
+    # enhanced tensions analysis with structured data
+    tensions_context = f"""
+FACTS:
+{fitted['facts']}
+
+DATA PATTERNS DETECTED:
+- Skill diversity: {multi_source_data['learning_velocity_indicators'].get('skill_diversity', {}).get('breadth_score', 'N/A')}% breadth
+- Average project complexity: {multi_source_data['projects'].get('complexity_distribution', {}).get('average', 'N/A')}
+- Learning signals: {multi_source_data['learning_signals']['by_type']}
+- Career progression: {multi_source_data['career_progression']['progression_detected']}
+
+Identify tensions and unanswered questions.
+        """
+    return tensions_context, report
+
+
+def sokrates_opening_input(user_context, facts, tensions, budget_overrides=None):
+    """
+    Returns:
+        tuple: (input of the first Sokrates call, BudgetReport)
+    """
+    # facts and tensions outrank the raw documents they were distilled from
+    fitted, report = fit_to_budget("sokrates", [
+        PromptSection("user_context", user_context, strategy="documents"),
+        PromptSection("facts", facts, weight=2),
+        PromptSection("tensions", tensions, weight=2)
+    ], overrides=budget_overrides)
+    initial_context = f"""
+    USER CONTEXT:
+    {fitted['user_context']}
+
+    ARCHIVIST REPORT (FACTS):
+    {fitted['facts']}
+
+    SILENT CRITIC REPORT (TENSIONS):
+    {fitted['tensions']}
+
+    Start the interview now.
+    """
+    return initial_context, report
+
+
+def director_input(turn, tensions, messages, answer, budget_overrides=None):
+    """
+    Args:
+        messages: the interview so far ({"role", "content"} dicts, including the new answer)
+
+    Returns:
+        tuple: (Director input, BudgetReport)
+    """
+    # the director decides what to ask based on the history
+    transcript = "\n".join([f"{m['role'].upper()}: {m['content']}" for m in messages[-4:]]) # last few turns
+
+    fitted, report = fit_to_budget("director", [
+        PromptSection("tensions", tensions),
+        PromptSection("transcript", transcript, strategy="tail"),
+        PromptSection("user_answer", answer, trimmable=False)
+    ], overrides=budget_overrides)
+
+    director_text = f"""
+                    CURRENT PHASE: {phase_context(turn)} (Turn {turn}/3)
+                    TENSIONS: {fitted['tensions']}
+
+                    RECENT HISTORY:
+                    {fitted['transcript']}
+
+                    USER JUST SAID: "{answer}"
+
+                    Decide the next question directive.
+                    """
+    return director_text, report
+
+
+def sokrates_turn_input(directive, answer):
+    """Input of a Sokrates turn that phrases the Director's directive"""
+    return f"""
+                    DIRECTIVE FROM DIRECTOR:
+                    {directive}
+
+                    USER ANSWER: {answer}
+                    """
+
+
+def fused_turn_input(turn, tensions, answer, budget_overrides=None):
+    """
+    Input of a fused turn, where Sokrates also picks the directive (FUSED_TURNS).
+
+    Returns:
+        tuple: (Sokrates input, BudgetReport)
+    """
+    fitted, report = fit_to_budget("director", [
+        PromptSection("tensions", tensions),
+        PromptSection("user_answer", answer, trimmable=False)
+    ], overrides=budget_overrides)
+    fused_text = FUSED_TURN_PROMPT.format(
+        phase_context=phase_context(turn),
+        turn=turn,
+        tensions=fitted['tensions'],
+        answer=answer
+    )
+    return fused_text, report
+
+
+def github_analysis_input(github_data, budget_overrides=None):
+    """
+    Returns:
+        tuple: (GitHub analysis input, BudgetReport)
+    """
+    # the commit history is cut to the budget; the instructions are always sent whole
+    fitted, report = fit_to_budget("github_analysis", [
+        PromptSection("instructions", get_github_analysis_prompt(github_data, data_text=""), trimmable=False),
+        PromptSection("github_data", json.dumps(github_data, indent=2))
+    ], overrides=budget_overrides)
+    return get_github_analysis_prompt(github_data, data_text=fitted['github_data']), report
+
+
+def multi_source_analysis_input(multi_source_data, budget_overrides=None):
+    """
+    Returns:
+        tuple: (multi-source analysis input, BudgetReport)
+    """
+    fitted, report = fit_to_budget("multi_source_analysis", [
+        PromptSection(
+            "instructions", get_multi_source_analysis_prompt(multi_source_data, data_text=""), trimmable=False
+        ),
+        PromptSection("multi_source_data", json.dumps(multi_source_data, indent=2))
+    ], overrides=budget_overrides)
+    return get_multi_source_analysis_prompt(multi_source_data, data_text=fitted['multi_source_data']), report
+
+
+def analysis_requests(github_data=None, multi_source_data=None, budget_overrides=None):
+    """(agent, (prompt, BudgetReport), system instruction) of the analyses that only need pre-interview data"""
+    requests = []
+    if github_data:
+        requests.append((
+            "github_analysis", github_analysis_input(github_data, budget_overrides), GITHUB_ANALYSIS_INSTRUCTION
+        ))
+    if multi_source_data:
+        requests.append((
+            "multi_source_analysis", multi_source_analysis_input(multi_source_data, budget_overrides),
+            MULTI_SOURCE_ANALYSIS_INSTRUCTION
+        ))
+    return requests
+
+
+def transcript_text(messages):
+    """The interview as plain text"""
+    return "\n".join([f"{m['role'].upper()}: {m['content']}" for m in messages if m['role'] != 'system'])
+
+
+def extractor_input(messages, github_analysis=None, multi_source_analysis=None, budget_overrides=None):
+    """
+    Returns:
+        tuple: (Extractor input, BudgetReport)
+    """
+    github_analysis_text = ""
+    if github_analysis:
+        github_analysis_text = f"\n\nGITHUB LEARNING VELOCITY ANALYSIS:\n{github_analysis}\n"
+    multi_source_analysis_text = ""
+    if multi_source_analysis:
+        multi_source_analysis_text = f"\n\nPROFESSIONAL BACKGROUND ANALYSIS:\n{multi_source_analysis}\n"
+
+    # the interview is the primary evidence; the analyses share what is left
+    fitted, report = fit_to_budget("extractor", [
+        PromptSection("transcript", transcript_text(messages), weight=2, strategy="tail"),
+        PromptSection("github_analysis", github_analysis_text),
+        PromptSection("multi_source_analysis", multi_source_analysis_text)
+    ], overrides=budget_overrides)
+
+    full_context = f"""Here is the interview transcript:
+
+{fitted['transcript']}
+{fitted['github_analysis']}
+{fitted['multi_source_analysis']}
+
+INSTRUCTIONS:
+- Extract cognitive patterns from the interview
+- If GitHub analysis is present, integrate those learning velocity insights
+- If professional background analysis is present, integrate those career trajectory insights
+- Combine ALL available evidence for the most accurate predictions
+- Predict future growth trajectory based on ALL available evidence
+- Be specific with time estimates for learning new skills
+- Identify the high-leverage gap that would unlock next-level growth
+- Cross-reference insights from different data sources to validate patterns
+"""
+    return full_context, report
+
+
+# --- engine ---
+
+class SokratesSession:
+    """
+    Everything one analysis accumulates, from onboarding to the finished patterns.
+
+    Plain data apart from `history` (the local provider's conversation store), so a
+    host keeps it wherever it keeps per-user state (st.session_state in the app), and
+    to_dict/from_dict turn it into a checkpoint snapshot and back.
+    """
+
+    # what a snapshot holds; the API key is left out and has to be entered again, and
+    # user_context is rebuilt from the sources
+    SNAPSHOT_FIELDS = (
+        'session_key', 'step', 'user_name', 'sources', 'github_username', 'github_data',
+        'multi_source_data', 'analysis_facts', 'analysis_tensions', 'messages', 'directives',
+        'sokrates_interaction_id', 'turn_count', 'github_analysis', 'multi_source_analysis',
+        'patterns', 'context_reports', 'stage_timings', 'extractions', 'stage_keys'
+    )
+
+    def __init__(self, session_key=None, user_name="Professional", user_api_key=None):
+        self.session_key = session_key or uuid.uuid4().hex  # keys this session's background tasks
+        self.step = ONBOARDING
+        self.user_name = user_name
+        self.user_api_key = user_api_key
+        self.user_context = ""
+        self.sources = []  # the user context, one text per source
+        self.github_username = None
+        self.github_data = None
+        self.multi_source_data = None
+        self.analysis_facts = ""
+        self.analysis_tensions = ""
+        self.messages = []
+        self.directives = []  # audit trail of director decisions, one per turn
+        self.sokrates_interaction_id = None
+        self.turn_count = 0
+        self.github_analysis = None
+        self.multi_source_analysis = None
+        self.patterns = {}
+        self.context_reports = {}
+        self.stage_timings = {}  # stage -> {"seconds", "memoized"} from its last run
+        # per-source and per-stage artifacts that let a re-analysis redo only what changed
+        self.extractions = {}  # source text digest -> MultiSourceAnalyzer.extract() result
+        self.stage_keys = {}  # stage -> input hash of the result stored on the session
+        self.history = None
+        self.trace = None  # src.tracing.Trace while tracing is on (a resumed session starts a new one)
+
+    def to_dict(self):
+        """Snapshot of the session, including the Sokrates conversation if the provider keeps history locally"""
+        snapshot = {field: getattr(self, field) for field in self.SNAPSHOT_FIELDS}
+        snapshot['version'] = SNAPSHOT_VERSION
+        if self.history is not None and self.sokrates_interaction_id:
+            snapshot['conversation'] = self.history.export(self.sokrates_interaction_id)
+        return snapshot
+
+    @classmethod
+    def from_dict(cls, snapshot):
+        """
+        Session from a to_dict snapshot (the conversation is restored by SokratesPipeline.resume).
+
+        Raises:
+            ValueError: for a snapshot written by a different version
+        """
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {snapshot.get('version')}")
+        session = cls()
+        for field in cls.SNAPSHOT_FIELDS:
+            if field in snapshot:
+                setattr(session, field, snapshot[field])
+        session.user_context = "".join(session.sources)
+        return session
+
+
+# waits for LLM slots on behalf of background analyses (a blocking slot can't be held on the event loop)
+_slot_pool = None
+
+
+def _get_slot_pool():
+    global _slot_pool
+    if _slot_pool is None:
+        _slot_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="sokrates-slot")
+    return _slot_pool
+
+
+# rendered anti-portfolios, shared by every session of this process
+_render_cache = None
+_render_cache_lock = threading.Lock()
+
+
+# stage results by input hash, shared by every session of this process
+_stage_memo = None
+_stage_memo_lock = threading.Lock()
+
+
+def get_stage_memo(config=None):
+    """
+    Returns the process-wide stage memo, or None if STAGE_MEMO_ENTRIES = 0.
+
+    Settings (optional): STAGE_MEMO_ENTRIES (default 512).
+    """
+    global _stage_memo
+    with _stage_memo_lock:
+        config = config or get_config()
+        max_entries = config.get("STAGE_MEMO_ENTRIES", 512)
+        if not max_entries:
+            return None
+        if _stage_memo is None:
+            _stage_memo = StageMemo(max_entries=max_entries)
+        return _stage_memo
+
+
+def get_render_cache(config=None):
+    """
+    Returns the process-wide cache of rendered pages, configured on first use.
+
+    Settings (optional): RENDER_CACHE_MAX_BYTES.
+    """
+    global _render_cache
+    with _render_cache_lock:
+        if _render_cache is None:
+            config = config or get_config()
+            _render_cache = RenderCache(max_bytes=config.get("RENDER_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+        return _render_cache
+
+
+class SokratesPipeline:
+    """
+    The SOKRATES engine for one session, without Streamlit.
+
+    Hosts (the Streamlit app, the command line, workers) call the steps in order
+    and render what they return; all state lives in `session` and all settings
+    come from `config`.
+
+    Example:
+        pipeline = SokratesPipeline(SokratesConfig.from_toml("secrets.toml"))
+        pipeline.ingest(notes="...")
+        for name, report in pipeline.analyze():
+            pass
+        pipeline.finish_opening(pipeline.consume(pipeline.open_interview()))
+        for answer in answers:
+            stream = pipeline.answer(answer)
+            if stream is None or "[ANALYSIS COMPLETE]" in pipeline.finish_turn(pipeline.consume(stream)):
+                break
+        for stage in pipeline.generate():
+            pass
+        html = pipeline.render_html()
+
+    Args:
+        config: SokratesConfig (defaults to the process-wide config)
+        session: SokratesSession to continue (defaults to a new one)
+        llm_slots: optional context manager held around every LLM call the pipeline
+            waits for, e.g. a multiprocessing semaphore shared by worker processes
+        checkpoints: optional CheckpointStore; the session is saved at every step
+            transition and interview turn, and resume() picks it up by session token
+
+    With TRACING (or TRACE_PANEL) on, the session records a trace: a span per step,
+    stage, source fetch, extraction pass, LLM call and render, written to TRACE_DIR
+    as Chrome trace JSON at every step transition.
+    """
+
+    def __init__(self, config=None, session=None, llm_slots=None, checkpoints=None):
+        self.config = config or get_config()
+        self.session = session or SokratesSession()
+        self.llm_slots = llm_slots
+        self.checkpoints = checkpoints
+        self._pending_turn = None
+        if self.session.trace is None and tracing_enabled(self.config):
+            self.session.trace = Trace(self.session.session_key)
+        if self.session.trace is not None:
+            self.session.trace.step(self.session.step)
+
+    @classmethod
+    def resume(cls, token, checkpoints, config=None, llm_slots=None):
+        """
+        Continues a checkpointed session (after a restart, or on another replica).
+
+        Returns:
+            SokratesPipeline, or None if the store has no usable snapshot for the token
+        """
+        snapshot = checkpoints.load(token)
+        if snapshot is None:
+            return None
+        try:
+            session = SokratesSession.from_dict(snapshot)
+        except ValueError:
+            return None
+        pipeline = cls(config, session, llm_slots=llm_slots, checkpoints=checkpoints)
+        conversation = snapshot.get('conversation')
+        if conversation and session.sokrates_interaction_id:
+            history = pipeline.llm_settings()["history"]
+            if history is not None:
+                history.restore(session.sokrates_interaction_id, conversation)
+        return pipeline
+
+    def checkpoint(self):
+        """Saves the session to the checkpoint store (if any)"""
+        if self.checkpoints is not None:
+            self.checkpoints.save(self.session.session_key, self.session.step, self.session.to_dict())
+
+    def _advance(self, step):
+        self.session.step = step
+        if self.session.trace is not None:
+            self.session.trace.step(step)
+            self.export_trace()
+        self.checkpoint()
+
+    def _span(self, name, **args):
+        """Span on the session trace; also makes it the current trace for the helpers this thread calls"""
+        if self.session.trace is not None:
+            activate(self.session.trace)
+        return span(name, "pipeline", **args)
+
+    def export_trace(self):
+        """
+        Writes the session trace to TRACE_DIR (default .sokrates_traces) if TRACING is on.
+
+        Returns:
+            str: the file written, or None
+        """
+        trace = self.session.trace
+        if trace is None or not self.config.get("TRACING", False):
+            return None
+        name = f"{self.session.session_key}-{int(trace.started_at)}.json"
+        return trace.export(os.path.join(self.config.get("TRACE_DIR", ".sokrates_traces"), name))
+
+    @property
+    def budget_overrides(self):
+        return self.config.get("CONTEXT_BUDGETS", {})
+
+    def llm_settings(self):
+        """Settings snapshot for this session (safe to hand to worker threads)"""
+        settings = build_llm_settings(
+            self.config, api_key=self.session.user_api_key, history=self.session.history, trace=self.session.trace
+        )
+        self.session.history = settings["history"]
+        return settings
+
+    def _slot(self):
+        return self.llm_slots if self.llm_slots is not None else nullcontext()
+
+    def _call(self, settings, agent, user_input, system_instruction):
+        """Blocking agent call, safe on worker threads; returns (response_text, interaction_id)"""
+        with self._slot():
+            future = submit_interaction_response(
+                user_input, system_instruction, timeout=None, agent=agent, settings=settings
+            )
+            response_text, interaction_id = future.result()
+        self._forget(settings, interaction_id)
+        return response_text, interaction_id
+
+    @staticmethod
+    def _forget(settings, interaction_id):
+        """Drops a one-shot agent call's conversation from the session's history (only Sokrates' is continued)"""
+        if settings["history"] is not None and interaction_id:
+            settings["history"].discard(interaction_id)
+
+    def _keep_report(self, agent, built):
+        """Keeps the report of what was cut from an agent's prompt and returns the prompt"""
+        text, report = built
+        self.session.context_reports[agent] = report.to_dict()
+        return text
+
+    def _salt(self, settings):
+        """What besides its inputs decides an agent stage's result: the model settings"""
+        return {key: settings.get(key) for key in ("provider", "routes", "model_tiers")}
+
+    def _prior(self):
+        """Stage results already on the session, with the input hashes they were made from"""
+        session = self.session
+        results = {
+            "multi_source_data": session.multi_source_data,
+            "archivist": {"facts": session.analysis_facts, "report": session.context_reports.get("archivist")},
+            "critic": {"tensions": session.analysis_tensions, "report": session.context_reports.get("critic")},
+            "github_analysis": session.github_analysis,
+            "multi_source_analysis": session.multi_source_analysis,
+            "patterns": {"patterns": session.patterns, "report": session.context_reports.get("extractor")},
+        }
+        return {name: (key, results[name]) for name, key in session.stage_keys.items() if name in results}
+
+    def _runner(self, settings):
+        """
+        StepRunner for one step: stages reuse the session's earlier results and the
+        stage memo when their inputs are unchanged, unless a cassette records or
+        replays (so every call reaches it). The model settings salt the keys.
+        """
+        if settings.get("cassette") is not None:
+            return StepRunner()
+        return StepRunner(memo=get_stage_memo(self.config), salt=self._salt(settings), prior=self._prior())
+
+    def _keep_result(self, runner, name):
+        """Records the input hash of a stage result just stored on the session"""
+        if name in runner.keys:
+            self.session.stage_keys[name] = runner.keys[name]
+
+    def _record_timings(self, runner):
+        for name, seconds in runner.timings.items():
+            self.session.stage_timings[name] = {'seconds': round(seconds, 3), 'memoized': name in runner.memoized}
+
+    def consume(self, stream):
+        """Reads a stream to the end while holding an LLM slot (for hosts that don't display it)"""
+        with self._slot():
+            for _ in stream:
+                pass
+        return stream
+
+    # --- onboarding ---
+
+    def ingest(self, github_data=None, documents=(), url_texts=(), notes=None, user_name=None):
+        """
+        Combines the gathered sources into the user context.
+
+        Returns:
+            bool: True if there was any input (the session moves on to processing)
+        """
+        if user_name:
+            self.session.user_name = user_name
+        self.session.github_data = github_data or None
+        sources = source_texts(github_data, documents, url_texts, notes)
+        if not sources:
+            return False
+        self.session.sources = sources
+        self.session.user_context = "".join(sources)
+        self._advance(PROCESSING)
+        return True
+
+    def fetch_and_ingest(self, github_username=None, documents=(), urls=(), notes=None, user_name=None, github_data=None):
+        """
+        Fetches the GitHub profile and URLs, then ingests them with the documents
+        (hosts without a UI; the app fetches concurrently and reports each source).
+
+        Args:
+            github_data: a GitHub snapshot of github_username to use instead of fetching it
+
+        Returns:
+            tuple: (True if there was any input, list of warnings)
+        """
+        warnings = []
+        with self._span("fetch_and_ingest"):
+            if github_username and not github_data:
+                github_data, github_error = fetch_github(github_username)
+                if github_error:
+                    warnings.append(f"GitHub analysis skipped: {github_error}")
+                elif not github_data:
+                    warnings.append(f"Could not analyze GitHub user @{github_username}")
+            self.session.github_username = github_username if github_data else None
+            has_input = self.ingest(
+                github_data,
+                documents=documents,
+                url_texts=[extract_text_from_url(url) for url in urls],
+                notes=notes,
+                user_name=user_name
+            )
+        return has_input, warnings
+
+    def reanalyze(self, github_username=None, documents=(), urls=(), notes=None, user_name=None,
+                  keep_interview=False, refresh_github=False):
+        """
+        Takes an earlier (usually resumed) session through processing again with the
+        candidate's current sources, e.g. an updated CV or a new portfolio URL. Only
+        new or changed sources are extracted again, and only the agent calls whose
+        inputs changed run again; everything else comes from the session.
+
+        Args:
+            keep_interview: keep the earlier transcript; run_scripted(None) then goes
+                from processing straight to generating. Otherwise a new interview follows.
+            refresh_github: fetch the GitHub profile again instead of reusing the
+                session's snapshot of the same user
+
+        Returns:
+            tuple: (True if there was any input, list of warnings)
+        """
+        session = self.session
+        self.cancel()
+        if not keep_interview:
+            session.messages = []
+            session.directives = []
+            session.sokrates_interaction_id = None
+            session.turn_count = 0
+        github_data = None
+        if github_username and github_username == session.github_username and not refresh_github:
+            github_data = session.github_data
+        return self.fetch_and_ingest(github_username, documents, urls, notes, user_name, github_data=github_data)
+
+    # --- processing ---
+
+    def analyze(self):
+        """
+        Multi-source extraction (per source, then merged), Archivist and Silent Critic,
+        each as soon as its inputs are ready. Sources and stages unchanged since an
+        earlier run of this session are reused.
+
+        Yields:
+            tuple: (name, BudgetReport or None) as "multi_source_data", "archivist" and "critic" finish
+
+        Raises:
+            LLMError: from the first failing agent
+        """
+        settings = self.llm_settings()
+        overrides = self.budget_overrides
+
+        # these run on worker threads; results are stored on the consuming thread below.
+        # every input is an argument, so the memo key covers it
+        def run_archivist(multi_source_data, user_context, overrides):
+            text, report = archivist_input(multi_source_data, user_context, overrides)
+            facts, _ = self._call(settings, "archivist", text, SYSTEM_PROMPT_ARCHIVIST)
+            return {"facts": facts, "report": report.to_dict()}
+
+        def run_critic(multi_source_data, archivist, overrides):
+            text, report = critic_input(archivist["facts"], multi_source_data, overrides)
+            tensions, _ = self._call(settings, "critic", text, SYSTEM_PROMPT_CRITIC)
+            return {"tensions": tensions, "report": report.to_dict()}
+
+        def merge_extractions(order, **extractions):
+            return MultiSourceAnalyzer.merge([extractions[name] for name in order])
+
+        session = self.session
+        session.stage_timings = {
+            name: timing for name, timing in session.stage_timings.items() if not name.startswith("extract:")
+        }
+        runner = self._runner(settings)
+        # one extraction stage per source the session hasn't extracted yet
+        digests, stored = {}, {}
+        for text in session.sources or [session.user_context]:
+            digest = source_digest(text)
+            name = f"extract:{digest[:16]}"
+            if name in digests:
+                continue
+            digests[name] = digest
+            if digest in session.extractions:
+                stored[name] = session.extractions[digest]
+            else:
+                runner.add(name, lambda text: MultiSourceAnalyzer().extract(text), memoize=True, text=text)
+        runner.add(
+            "multi_source_data", merge_extractions, after=[name for name in digests if name not in stored],
+            memoize=True, order=list(digests), **stored
+        )
+        runner.add(
+            "archivist", run_archivist, after=("multi_source_data",), memoize=True,
+            user_context=session.user_context, overrides=overrides
+        )
+        runner.add("critic", run_critic, after=("multi_source_data", "archivist"), memoize=True, overrides=overrides)
+
+        with self._span("analyze", sources=len(digests)):
+            try:
+                for name, result in runner.run():
+                    report = None
+                    if name in digests:
+                        session.extractions[digests[name]] = result
+                        continue
+                    if name == "multi_source_data":
+                        session.multi_source_data = result
+                    elif name == "archivist":
+                        session.analysis_facts = result["facts"]
+                        report = BudgetReport.from_dict(result["report"])
+                    else:
+                        session.analysis_tensions = result["tensions"]
+                        report = BudgetReport.from_dict(result["report"])
+                    if report is not None:
+                        session.context_reports[name] = result["report"]
+                    self._keep_result(runner, name)
+                    yield name, report
+            finally:
+                self._record_timings(runner)
+        # sources that were replaced or removed
+        session.extractions = {
+            digest: extraction for digest, extraction in session.extractions.items() if digest in digests.values()
+        }
+
+    def open_interview(self):
+        """The first Sokrates message as a stream; consume it, then call finish_opening"""
+        session = self.session
+        text = self._keep_report("sokrates", sokrates_opening_input(
+            session.user_context, session.analysis_facts, session.analysis_tensions, self.budget_overrides
+        ))
+        return stream_interaction_response(
+            user_input=text,
+            system_instruction=SYSTEM_PROMPT_SOKRATES,
+            wait_for_delimiter=True,
+            agent="sokrates",
+            settings=self.llm_settings()
+        )
+
+    def finish_opening(self, stream):
+        """Records the first message and starts the interview. Returns the message."""
+        intro = stream.text if stream.text and stream.text.strip() else EMPTY_INTRO
+        # the interaction id carries the conversation
+        self.session.sokrates_interaction_id = stream.interaction_id
+        self.session.messages.append({"role": "assistant", "content": intro})
+        # the generating step's analyses don't depend on the interview: run them while it happens
+        self.start_analyses()
+        self._advance(INTERVIEWING)
+        return intro
+
+    # --- interview ---
+
+    def answer(self, text):
+        """
+        Records the user's answer and starts Sokrates' reply (after the Director's
+        directive, unless FUSED_TURNS is on). On LLMError call rollback_turn.
+
+        Returns:
+            InteractionStream to consume before finish_turn, or None when this answer
+            ended the interview (the session moved on to generating)
+        """
+        session = self.session
+        session.messages.append({"role": "user", "content": text})
+        session.turn_count += 1
+        turn = session.turn_count
+
+        # hard stop at turn 3 (accelerated mode)
+        if turn >= INTERVIEW_TURNS:
+            self._advance(GENERATING)
+            return None
+
+        settings = self.llm_settings()
+        # fused mode: one sokrates call picks the directive and asks the question
+        fused = self.config.get("FUSED_TURNS", False)
+        directive = None
+        if fused:
+            sokrates_text = self._keep_report("director", fused_turn_input(
+                turn, session.analysis_tensions, text, self.budget_overrides
+            ))
+            sokrates_agent = "sokrates_fused"
+        else:
+            # the director decides what to ask, sokrates phrases the question
+            director_text = self._keep_report("director", director_input(
+                turn, session.analysis_tensions, session.messages, text, self.budget_overrides
+            ))
+            directive, _ = self._call(settings, "director", director_text, SYSTEM_PROMPT_DIRECTOR)
+            sokrates_text = sokrates_turn_input(directive, text)
+            sokrates_agent = "sokrates"
+
+        self._pending_turn = {"turn": turn, "mode": "fused" if fused else "director", "directive": directive}
+        # anything before '>>>' (incl. a fused directive) stays hidden
+        return stream_interaction_response(
+            user_input=sokrates_text,
+            previous_interaction_id=session.sokrates_interaction_id,
+            wait_for_delimiter=True,
+            agent=sokrates_agent,
+            settings=settings
+        )
+
+    def rollback_turn(self):
+        """Undoes a failed answer() so the same answer can be sent again"""
+        self.session.messages.pop()
+        self.session.turn_count -= 1
+        self._pending_turn = None
+
+    def finish_turn(self, stream):
+        """Records Sokrates' reply to the last answer. Returns the reply."""
+        pending = self._pending_turn
+        self._pending_turn = None
+        self.session.directives.append({
+            "turn": pending["turn"],
+            "mode": pending["mode"],
+            "directive": (
+                extract_directive(stream.raw_text) if pending["mode"] == "fused"
+                else {"instruction": pending["directive"]}
+            )
+        })
+
+        response = stream.text if stream.text and stream.text.strip() else EMPTY_TURN
+        if stream.interaction_id:
+            self.session.sokrates_interaction_id = stream.interaction_id
+        if "[ANALYSIS COMPLETE]" in response:
+            self._advance(GENERATING)
+        else:
+            self.session.messages.append({"role": "assistant", "content": response})
+            self.checkpoint()
+        return response
+
+    # --- generating ---
+
+    def _analysis_requests(self):
+        """(agent, prompt, system instruction) of the session's analyses, keeping each prompt's budget report"""
+        session = self.session
+        return [
+            (agent, self._keep_report(agent, built), system_instruction)
+            for agent, built, system_instruction in analysis_requests(
+                session.github_data, session.multi_source_data, self.budget_overrides
+            )
+        ]
+
+    def _submit_analysis(self, settings, agent, prompt, system_instruction):
+        if self.llm_slots is None:
+            return submit_interaction_response(prompt, system_instruction, agent=agent, settings=settings)
+        return _get_slot_pool().submit(self._call, settings, agent, prompt, system_instruction)
+
+    def start_analyses(self):
+        """Starts the GitHub and multi-source analyses in the background (unless the session has them for these inputs)"""
+        settings = self.llm_settings()
+        tasks = get_session_tasks()
+        for agent, prompt, system_instruction in self._analysis_requests():
+            inputs = {"agent": agent, "prompt": prompt, "system_instruction": system_instruction}
+            if getattr(self.session, agent) and self.session.stage_keys.get(agent) == stage_key(agent, inputs, self._salt(settings)):
+                continue
+            tasks.submit(self.session.session_key, agent, self._submit_analysis(settings, agent, prompt, system_instruction))
+
+    def generate(self):
+        """
+        The generating step as one stage graph: the GitHub and multi-source analyses
+        (started with the interview), the Extractor once both are in, then the page.
+        Stages whose inputs haven't changed since an earlier run come from the session
+        or the stage memo.
+
+        Yields:
+            str: each stage ("github_analysis", "multi_source_analysis", "patterns", "html") once its result is stored
+
+        Raises:
+            LLMError: StructuredOutputError (with .raw_text) if every Extractor reply was invalid
+        """
+        session = self.session
+        settings = self.llm_settings()
+        overrides = self.budget_overrides
+        tasks = get_session_tasks()
+        requests = self._analysis_requests()
+        # a reused stage leaves its background call unused
+        started = {agent: tasks.pop(session.session_key, agent) for agent, _, _ in requests}
+
+        def run_analysis(agent, prompt, system_instruction):
+            future = started.get(agent)
+            # resubmitted if it is gone (failed and retried, or the server restarted)
+            if future is None or future.cancelled():
+                future = self._submit_analysis(settings, agent, prompt, system_instruction)
+            response_text, interaction_id = future.result()
+            self._forget(settings, interaction_id)
+            return response_text
+
+        def run_extractor(messages, overrides, github_analysis=None, multi_source_analysis=None):
+            text, report = extractor_input(messages, github_analysis, multi_source_analysis, overrides)
+            # start fresh interaction for analysis (disconnecting from sokrates persona)
+            with self._slot():
+                data, interaction_id = get_structured_response(
+                    user_input=text,
+                    response_schema=EXTRACTOR_SCHEMA,
+                    system_instruction=SYSTEM_PROMPT_EXTRACTOR,
+                    agent="extractor",
+                    settings=settings
+                )
+            self._forget(settings, interaction_id)
+            return {"patterns": data, "report": report.to_dict()}
+
+        runner = self._runner(settings)
+        analyses = [agent for agent, _, _ in requests]
+        for agent, prompt, system_instruction in requests:
+            runner.add(agent, run_analysis, memoize=True, agent=agent, prompt=prompt, system_instruction=system_instruction)
+        runner.add("patterns", run_extractor, after=analyses, memoize=True, messages=session.messages, overrides=overrides)
+        runner.add(
+            "html", lambda patterns, user_name: self._render(patterns["patterns"], user_name),
+            after=("patterns",), user_name=session.user_name
+        )
+
+        with self._span("generate"):
+            try:
+                for name, result in runner.run():
+                    if name == "patterns":
+                        session.patterns = result["patterns"]
+                        session.context_reports["extractor"] = result["report"]
+                    elif name in analyses:
+                        setattr(session, name, result)
+                    self._keep_result(runner, name)
+                    if name in analyses and name not in runner.memoized:
+                        # the analyses are the costly part of generating; keep them for a resume
+                        self.checkpoint()
+                    yield name
+            finally:
+                self._record_timings(runner)
+                for future in started.values():
+                    if future is not None:
+                        future.cancel()
+        self._advance(COMPLETE)
+
+    def run_scripted(self, answers, on_progress=None):
+        """
+        Processing, the interview with scripted answers and generation in one go, for
+        hosts without a user at the keyboard (command line, job API). Call ingest first.
+
+        Args:
+            answers: the candidate's interview answers, in order; None keeps the
+                session's transcript (after reanalyze(..., keep_interview=True))
+            on_progress: optional callable(step, detail) after each finished piece of work
+
+        Returns:
+            str: the anti-portfolio page
+
+        Raises:
+            ValueError: without answers; LLMError from any agent
+        """
+        progress = on_progress or (lambda step, detail: None)
+        if not answers and (answers is not None or not self.session.messages):
+            raise ValueError("No scripted interview answers")
+
+        for name, _ in self.analyze():
+            progress(PROCESSING, name)
+
+        if answers is not None:
+            self.finish_opening(self.consume(self.open_interview()))
+            progress(INTERVIEWING, "opening question")
+            for answer in answers:
+                stream = self.answer(answer)
+                if stream is not None:
+                    self.finish_turn(self.consume(stream))
+                progress(INTERVIEWING, f"answer {self.session.turn_count}")
+                if self.session.step != INTERVIEWING:
+                    break
+        # fewer answers than turns also ends the interview
+        if self.session.step != GENERATING:
+            self._advance(GENERATING)
+
+        for stage in self.generate():
+            progress(GENERATING, stage)
+        return self.render_html()
+
+    def _render(self, patterns, user_name):
+        with self._span("render_html"):
+            return get_render_cache(self.config).get_or_render(
+                make_render_key(patterns, user_name), lambda: generate_anti_portfolio_html(patterns, user_name)
+            )
+
+    def render_html(self):
+        """The anti-portfolio page (rendered once per patterns and name, then served from the render cache)"""
+        return self._render(self.session.patterns, self.session.user_name)
+
+    def cancel(self):
+        """Stops the session's background work (e.g. before starting over)"""
+        get_session_tasks().cancel(self.session.session_key)
+
+    def discard(self):
+        """Cancels the session and deletes its checkpoint, so it can't be resumed"""
+        self.cancel()
+        if self.checkpoints is not None:
+            self.checkpoints.delete(self.session.session_key)
@@ -126,6 +126,26 @@ CRITICAL OUTPUT RULES:
   >>> What pattern in your own thinking makes you uncomfortable?
 """
 
+# fused turn mode (FUSED_TURNS): the sokrates interaction does the director's job in the same call.
+# everything before '>>>' is hidden from the user; the directive line is kept for auditing.
+FUSED_TURN_PROMPT = """
+CURRENT PHASE: {phase_context} (Turn {turn}/3)
+TENSIONS: {tensions}
+
+USER ANSWER: {answer}
+
+This turn you are also the DIRECTOR. First decide the next move, then ask the question.
+- Check the conversation so far and do NOT repeat a topic that was just discussed.
+- If the answer was short/dismissive -> PIVOT to their internal state: fears, drivers, conflicts
+- If the answer was detailed -> go DEEPER into their psychology
+- If they mentioned a project -> ask about the HUMAN COST or what they learned about themselves
+- Select ONE aspect of their HUMANITY to explore. Focus on THE PERSON, not their projects.
+
+OUTPUT FORMAT (exactly two parts):
+DIRECTIVE: {{"move": "pivot" | "deeper" | "human_cost", "focus": "<aspect to explore>", "instruction": "<one sentence for yourself>"}}
+>>> <your single question>
+"""
+
 SYSTEM_PROMPT_EXTRACTOR = """
 You are the PATTERN EXTRACTOR.
 Analyze the conversation history. Do not force the user into a template.
@@ -166,6 +186,73 @@ Return a JSON object with these keys:
 JSON FORMAT ONLY. Do not use markdown code blocks. Ensure all brackets are closed.
 """
 
+# JSON schema for the keys SYSTEM_PROMPT_EXTRACTOR asks for (keep the two in sync).
+# sent as the response schema so the model cannot return anything else.
+_PATTERN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "description": {"type": "string"}
+    },
+    "required": ["title", "description"],
+    "additionalProperties": False
+}
+
+EXTRACTOR_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "profile_type": {"type": "string", "enum": ["builder", "creator", "strategist", "explorer", "specialist"]},
+        "cognitive_style": {"type": "string"},
+        "tagline": {"type": "string"},
+        "core_patterns": {"type": "array", "items": _PATTERN_SCHEMA, "minItems": 3, "maxItems": 3},
+        "anti_patterns": {"type": "array", "items": _PATTERN_SCHEMA, "minItems": 2, "maxItems": 2},
+        "skills_matrix": {
+            "type": "object",
+            "additionalProperties": {"type": "integer", "minimum": 1, "maximum": 100}
+        },
+        "growth_focus": {"type": "string"},
+        "the_bet": {"type": "string"},
+        "visual_metaphor": {"type": "string"},
+        "learning_velocity": {
+            "type": "object",
+            "properties": {
+                "timeToCompetency": {"type": "string"},
+                "accelerationPattern": {"type": "string", "enum": ["slow-start-then-rapid", "steady-linear", "fast-plateau"]},
+                "transferLearning": {"type": "string", "enum": ["high", "medium", "low"]}
+            },
+            "required": ["timeToCompetency", "accelerationPattern", "transferLearning"],
+            "additionalProperties": False
+        },
+        "growth_trajectory": {
+            "type": "object",
+            "properties": {
+                "currentPhase": {"type": "string"},
+                "naturalDirection": {"type": "string"},
+                "highLeverageGap": {"type": "string"},
+                "readinessIndicators": {"type": "array", "items": {"type": "string"}, "minItems": 3, "maxItems": 4}
+            },
+            "required": ["currentPhase", "naturalDirection", "highLeverageGap", "readinessIndicators"],
+            "additionalProperties": False
+        },
+        "hiring_insight": {
+            "type": "object",
+            "properties": {
+                "bestFitRole": {"type": "string"},
+                "potentialRisks": {"type": "string"},
+                "investmentThesis": {"type": "string"}
+            },
+            "required": ["bestFitRole", "potentialRisks", "investmentThesis"],
+            "additionalProperties": False
+        }
+    },
+    "required": [
+        "profile_type", "cognitive_style", "tagline", "core_patterns", "anti_patterns",
+        "skills_matrix", "growth_focus", "the_bet", "visual_metaphor",
+        "learning_velocity", "growth_trajectory", "hiring_insight"
+    ],
+    "additionalProperties": False
+}
+
 SYSTEM_PROMPT_TRAJECTORY_PREDICTOR = """
 You are the TRAJECTORY PREDICTOR.
 Given interview data and optional GitHub analysis, predict future growth and learning velocity.
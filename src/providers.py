@@ -0,0 +1,895 @@
+"""
+LLM Providers for SOKRATES
+Provider interface, registry and the built-in Gemini, local (OpenAI-compatible) and offline stub backends
+"""
+
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from google.genai.types import GenerateContentConfig, ThinkingConfig
+
+from src.clients import LOCAL_BASE_URL, get_async_client, get_client, warm_up_client
+from src.context_budget import estimate_tokens
+from src.endpoint_pool import get_endpoint_pool
+from src.conversation import ConversationStore, SUMMARY_PROMPT, format_for_summary
+from src.response_text import clean_response
+from src.structured_output import example_instance, parse_structured_response
+from src.transport import LLMConfigurationError, LLMResponseError, classify_error
+
+
+# model name sent to (and reported for) OpenAI-compatible local servers
+LOCAL_MODEL_NAME = "local-model"
+
+# gemini rejects inline batch requests above this size; split larger backlogs into several jobs
+GEMINI_INLINE_BATCH_LIMIT = 20 * 1024 * 1024
+
+# normalized batch states
+BATCH_PENDING = "pending"
+BATCH_RUNNING = "running"
+BATCH_SUCCEEDED = "succeeded"
+BATCH_FAILED = "failed"
+BATCH_CANCELLED = "cancelled"
+
+
+class LLMRequest:
+    """
+    One agent call, independent of the provider.
+
+    Args:
+        user_input: the text input
+        system_instruction: system instructions (only used for new interactions)
+        model_name: requested model (None: the agent's route picks one, see src.routing)
+        previous_interaction_id: ID to continue a conversation
+        response_schema: JSON schema the reply must follow
+        agent: calling agent (routing, telemetry, caching)
+        custom_id: caller's ID for the request inside a batch
+        generation: max_output_tokens / temperature / stop_sequences / thinking_level (all optional)
+    """
+
+    def __init__(
+        self,
+        user_input,
+        system_instruction=None,
+        model_name=None,
+        previous_interaction_id=None,
+        response_schema=None,
+        agent=None,
+        custom_id=None,
+        generation=None
+    ):
+        self.user_input = user_input
+        self.system_instruction = system_instruction
+        self.model_name = model_name
+        self.previous_interaction_id = previous_interaction_id
+        self.response_schema = response_schema
+        self.agent = agent
+        self.custom_id = custom_id or str(uuid.uuid4())
+        self.generation = generation or {}
+
+
+class BatchJob:
+    """
+    A submitted batch. Serializable with to_dict()/from_dict() so an overnight
+    job can be polled and collected from another process.
+    """
+
+    def __init__(self, provider, job_id, model, requests, created_at=None, details=None):
+        self.provider = provider
+        self.job_id = job_id
+        self.model = model
+        # custom_id -> {"agent", "response_schema"}, needed to finish each result
+        self.requests = requests
+        self.created_at = created_at or time.time()
+        self.details = details or {}
+
+    def to_dict(self):
+        return {
+            'provider': self.provider,
+            'job_id': self.job_id,
+            'model': self.model,
+            'requests': self.requests,
+            'created_at': self.created_at,
+            'details': self.details
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['provider'], data['job_id'], data['model'], data['requests'],
+            data.get('created_at'), data.get('details')
+        )
+
+
+def finish_text(text, response_schema, provider):
+    """
+    Cleans a plain reply, or validates a structured one and returns it as compact JSON.
+    """
+    if not response_schema:
+        return clean_response(text)
+    # clean_response would split on '>>>' and strip quotes inside the JSON
+    return json.dumps(parse_structured_response(text, response_schema, provider))
+
+
+def _usage_tokens(response):
+    """(input, output) token counts reported by either SDK (0 if unknown)"""
+    usage = getattr(response, "usage", None) or getattr(response, "usage_metadata", None)
+    input_tokens = (
+        getattr(usage, "total_input_tokens", None) or getattr(usage, "prompt_tokens", None)
+        or getattr(usage, "prompt_token_count", None) or 0
+    )
+    output_tokens = (
+        getattr(usage, "total_output_tokens", None) or getattr(usage, "completion_tokens", None)
+        or getattr(usage, "candidates_token_count", None) or 0
+    )
+    return input_tokens, output_tokens
+
+
+def record_usage(transport, timer, response):
+    """Charges actual output tokens to the rate limiter and reports usage to telemetry"""
+    input_tokens, output_tokens = _usage_tokens(response)
+    transport.limiter.record_output(output_tokens)
+    timer.set_usage(input_tokens, output_tokens)
+
+
+class LLMProvider:
+    """
+    Backend interface.
+
+    Subclasses implement the call paths they support and are registered with
+    register_provider(); LLM_PROVIDER in secrets.toml selects one by name. Nothing
+    here touches Streamlit: per-session state arrives in `settings` (see
+    src.llm.build_llm_settings) and the transport and telemetry timer are
+    passed in by the caller.
+
+    Attributes:
+        name: registry key
+        api_key_secret: secrets.toml key holding the default API key (None if not needed)
+        keeps_history: the provider keeps chat history client-side (settings["history"])
+        supports_batch: implements submit_batch / batch_status / batch_results
+        default_rate_limits: requests_per_minute / tokens_per_minute unless RATE_LIMITS overrides them
+        model_tiers: tier ("small", "default", "large") -> model, unless MODEL_TIERS overrides them
+        pooled_endpoints: calls are spread over settings["endpoint_pool"] (see src.endpoint_pool)
+    """
+
+    name = None
+    api_key_secret = None
+    keeps_history = False
+    supports_batch = False
+    default_rate_limits = {}
+    model_tiers = {}
+    pooled_endpoints = False
+
+    def model_for(self, model_name):
+        """Model actually used for a requested model name"""
+        return model_name
+
+    def new_history(self, window_turns=4, summary_batch_turns=2, max_conversations=16):
+        """Per-session history store for providers that keep history client-side"""
+        return ConversationStore(
+            window_turns=window_turns, summary_batch_turns=summary_batch_turns, max_conversations=max_conversations
+        )
+
+    def warm_up(self, api_key=None, endpoint_pool=None, prefixes=None):
+        """
+        Open the connection ahead of the first call. Returns True if the backend answered.
+
+        Pooled providers warm every endpoint and may send `prefixes` (system prompts)
+        to prime the servers' prompt caches.
+        """
+        return False
+
+    def complete(self, settings, request, transport, timer):
+        """
+        Blocking call.
+
+        Returns:
+            tuple: (response_text, interaction_id) - text already finished with finish_text()
+        """
+        raise NotImplementedError
+
+    async def acomplete(self, settings, request, transport, timer):
+        """Async variant of complete()"""
+        raise NotImplementedError
+
+    def stream(self, settings, request, transport, stream):
+        """
+        Generator of raw text chunks. Sets stream.interaction_id when known and
+        reports usage to stream.timer.
+        """
+        raise NotImplementedError
+
+    def astream(self, settings, request, transport, stream):
+        """Async generator variant of stream()"""
+        raise NotImplementedError
+
+    def submit_batch(self, settings, requests, transport, display_name=None):
+        """
+        Submit non-interactive requests (no previous_interaction_id) as one batch.
+
+        Returns:
+            BatchJob
+        """
+        raise LLMConfigurationError(f"The {self.name} provider does not support batch jobs.", self.name)
+
+    def batch_status(self, settings, job, transport):
+        """One of the BATCH_* states"""
+        raise LLMConfigurationError(f"The {self.name} provider does not support batch jobs.", self.name)
+
+    def batch_results(self, settings, job, transport):
+        """
+        Raw results of a finished batch.
+
+        Returns:
+            dict: custom_id -> reply text or LLMError
+        """
+        raise LLMConfigurationError(f"The {self.name} provider does not support batch jobs.", self.name)
+
+
+_providers = {}
+
+
+def register_provider(provider):
+    """
+    Make a provider instance selectable by its name (LLM_PROVIDER in secrets.toml).
+
+    Returns:
+        LLMProvider: the provider, so this can wrap an instantiation
+    """
+    if not provider.name:
+        raise ValueError("LLM providers need a name")
+    _providers[provider.name] = provider
+    return provider
+
+
+def get_provider(name):
+    """
+    Returns the registered provider.
+
+    Raises:
+        LLMConfigurationError: if no provider has that name
+    """
+    provider = _providers.get(name)
+    if provider is None:
+        raise LLMConfigurationError(
+            f"Unknown LLM provider '{name}'. Registered providers: {', '.join(sorted(_providers))}",
+            name
+        )
+    return provider
+
+
+def registered_providers():
+    return sorted(_providers)
+
+
+def _require_api_key(api_key):
+    """Raises a typed error instead of letting an unauthenticated call through"""
+    if not api_key:
+        raise LLMConfigurationError("API Key missing. Please enter your Gemini API key in the sidebar.", "google")
+    return api_key
+
+
+class GoogleProvider(LLMProvider):
+    """Gemini through the Interactions API (server-side conversation state) and batch mode"""
+
+    name = "google"
+    api_key_secret = "GEMINI_API_KEY"
+    supports_batch = True
+    default_rate_limits = {"requests_per_minute": 60, "tokens_per_minute": 1000000}
+    model_tiers = {"small": "gemini-2.5-flash-lite", "default": "gemini-2.5-flash", "large": "gemini-2.5-pro"}
+
+    def warm_up(self, api_key=None, endpoint_pool=None, prefixes=None):
+        if not api_key:
+            return False
+        return warm_up_client("google", api_key)
+
+    @staticmethod
+    def _config(request):
+        """
+        Builds the interactions.create() arguments shared by the blocking and streaming paths.
+        """
+        config = {
+            "model": request.model_name,
+            "input": request.user_input,
+        }
+
+        # if continuing a conversation, use the ID
+        if request.previous_interaction_id:
+            config["previous_interaction_id"] = request.previous_interaction_id
+        # if starting a new one, we can add system instructions
+        elif request.system_instruction:
+            # note: for the interactions API, system instructions are often best passed
+            # as the initial context or prepended to the first input if the specific
+            # model/endpoint doesn't support a separate 'system_instruction' param
+            # in the create() call directly.
+            # however, the Client usually handles config. Let's check if we can pass it in config.
+            # the docs show simple input. We will prepend it to be safe and explicit.
+            config["input"] = f"SYSTEM INSTRUCTION:\n{request.system_instruction}\n\nUSER INPUT:\n{request.user_input}"
+
+        # structured output: gemini constrains decoding to the json schema
+        if request.response_schema:
+            config["response_format"] = request.response_schema
+            config["response_mime_type"] = "application/json"
+
+        # routed generation limits; thinking_level is only accepted by thinking models
+        if request.generation:
+            config["generation_config"] = dict(request.generation)
+
+        return config
+
+    @staticmethod
+    def _text(interaction):
+        """Text of the last output of an interaction (raises LLMResponseError if there is none)"""
+        outputs = getattr(interaction, "outputs", None)
+        if not outputs or getattr(outputs[-1], "text", None) is None:
+            raise LLMResponseError("The model returned no text output.", "google")
+        return outputs[-1].text
+
+    def complete(self, settings, request, transport, timer):
+        api_key = _require_api_key(settings["api_key"])
+
+        # pooled client: reuses the keep-alive connection across agent calls
+        client = get_client("google", api_key)
+        config = self._config(request)
+
+        interaction = transport.call(
+            lambda: client.interactions.create(**config), estimate_tokens(config["input"]), timer
+        )
+        record_usage(transport, timer, interaction)
+
+        # get text from the last output
+        return finish_text(self._text(interaction), request.response_schema, "google"), interaction.id
+
+    async def acomplete(self, settings, request, transport, timer):
+        api_key = _require_api_key(settings["api_key"])
+
+        client = get_async_client("google", api_key)
+        config = self._config(request)
+
+        interaction = await transport.acall(
+            lambda: client.interactions.create(**config), estimate_tokens(config["input"]), timer
+        )
+        record_usage(transport, timer, interaction)
+
+        return finish_text(self._text(interaction), request.response_schema, "google"), interaction.id
+
+    def stream(self, settings, request, transport, stream):
+        api_key = _require_api_key(settings["api_key"])
+        client = get_client("google", api_key)
+        config = self._config(request)
+
+        # retries only cover opening the stream; a failure mid-stream is raised as-is
+        events = transport.call(
+            lambda: client.interactions.create(**config, stream=True),
+            estimate_tokens(config["input"]),
+            stream.timer
+        )
+        try:
+            for event in events:
+                # interaction id arrives on the created/completed events, usage on the completed one
+                interaction = getattr(event, "interaction", None)
+                if interaction is not None and getattr(interaction, "id", None):
+                    stream.interaction_id = interaction.id
+                if getattr(interaction, "usage", None):
+                    record_usage(transport, stream.timer, interaction)
+
+                delta = getattr(event, "delta", None)
+                text = getattr(delta, "text", None)
+                if text:
+                    yield text
+        except Exception as e:
+            raise classify_error(e, "google") from e
+
+    async def astream(self, settings, request, transport, stream):
+        api_key = _require_api_key(settings["api_key"])
+        client = get_async_client("google", api_key)
+        config = self._config(request)
+
+        events = await transport.acall(
+            lambda: client.interactions.create(**config, stream=True),
+            estimate_tokens(config["input"]),
+            stream.timer
+        )
+        try:
+            async for event in events:
+                interaction = getattr(event, "interaction", None)
+                if interaction is not None and getattr(interaction, "id", None):
+                    stream.interaction_id = interaction.id
+                if getattr(interaction, "usage", None):
+                    record_usage(transport, stream.timer, interaction)
+
+                delta = getattr(event, "delta", None)
+                text = getattr(delta, "text", None)
+                if text:
+                    yield text
+        except Exception as e:
+            raise classify_error(e, "google") from e
+
+    # --- batch mode ---
+
+    def submit_batch(self, settings, requests, transport, display_name=None):
+        """
+        Submits the requests as one Gemini batch job (inline requests, discounted batch pricing).
+        All requests must use the same model.
+        """
+        api_key = _require_api_key(settings["api_key"])
+        models = {self.model_for(request.model_name) for request in requests}
+        if len(models) != 1:
+            raise LLMConfigurationError("A Gemini batch job runs a single model; split the requests by model.", "google")
+        model = models.pop()
+
+        inlined = []
+        for request in requests:
+            config = {}
+            if request.system_instruction:
+                config["system_instruction"] = request.system_instruction
+            if request.response_schema:
+                config["response_mime_type"] = "application/json"
+                config["response_json_schema"] = request.response_schema
+            generation = dict(request.generation)
+            if "thinking_level" in generation:
+                config["thinking_config"] = ThinkingConfig(thinking_level=generation.pop("thinking_level"))
+            config.update(generation)
+            inlined.append({
+                "contents": [{"role": "user", "parts": [{"text": request.user_input}]}],
+                "config": GenerateContentConfig(**config) if config else None,
+                "metadata": {"custom_id": request.custom_id},
+            })
+
+        size = sum(len(request.user_input) + len(request.system_instruction or "") for request in requests)
+        if size > GEMINI_INLINE_BATCH_LIMIT:
+            raise LLMConfigurationError(
+                f"Batch is about {size // (1024 * 1024)}MB; Gemini accepts up to 20MB of inline requests per job.",
+                "google"
+            )
+
+        client = get_client("google", api_key)
+        job = transport.call(lambda: client.batches.create(
+            model=model,
+            src=inlined,
+            config={"display_name": display_name or f"sokrates-{int(time.time())}"}
+        ))
+        return BatchJob(
+            self.name,
+            job.name,
+            model,
+            {request.custom_id: {'agent': request.agent, 'response_schema': request.response_schema} for request in requests},
+            details={'custom_ids': [request.custom_id for request in requests]}
+        )
+
+    def batch_status(self, settings, job, transport):
+        client = get_client("google", _require_api_key(settings["api_key"]))
+        remote = transport.call(lambda: client.batches.get(name=job.job_id))
+        state = getattr(remote.state, "name", str(remote.state))
+        if state in ("JOB_STATE_SUCCEEDED", "JOB_STATE_PARTIALLY_SUCCEEDED"):
+            return BATCH_SUCCEEDED
+        if state in ("JOB_STATE_FAILED", "JOB_STATE_EXPIRED"):
+            return BATCH_FAILED
+        if state in ("JOB_STATE_CANCELLED", "JOB_STATE_CANCELLING"):
+            return BATCH_CANCELLED
+        if state in ("JOB_STATE_RUNNING", "JOB_STATE_UPDATING"):
+            return BATCH_RUNNING
+        return BATCH_PENDING
+
+    def batch_results(self, settings, job, transport):
+        client = get_client("google", _require_api_key(settings["api_key"]))
+        remote = transport.call(lambda: client.batches.get(name=job.job_id))
+        responses = getattr(remote.dest, "inlined_responses", None) or []
+
+        results = {}
+        for index, item in enumerate(responses):
+            metadata = item.metadata or {}
+            # responses keep request order; metadata is the safer match when present
+            custom_id = metadata.get("custom_id") or job.details['custom_ids'][index]
+            if item.error:
+                results[custom_id] = LLMResponseError(f"Batch request failed: {item.error}", "google")
+                continue
+            text = getattr(item.response, "text", None)
+            if text is None:
+                results[custom_id] = LLMResponseError("The model returned no text output.", "google")
+            else:
+                results[custom_id] = text
+        return results
+
+
+class LocalProvider(LLMProvider):
+    """
+    OpenAI-compatible local server (e.g. LM Studio) mimicking the Interaction API state.
+
+    Calls go through an endpoint pool (LOCAL_ENDPOINTS); every turn of a conversation
+    is sent to the server that already holds its prompt prefix in cache. Batches are written as OpenAI batch JSONL files that src.batch_worker runs
+    against the local server.
+    """
+
+    name = "local"
+    keeps_history = True
+    supports_batch = True
+    # LM Studio answers "local-model" with whatever model is loaded; set MODEL_TIERS.local
+    # to the identifiers of loaded models to route agents to different ones
+    model_tiers = {"small": LOCAL_MODEL_NAME, "default": LOCAL_MODEL_NAME, "large": LOCAL_MODEL_NAME}
+    pooled_endpoints = True
+
+    def model_for(self, model_name):
+        return model_name or LOCAL_MODEL_NAME
+
+    def warm_up(self, api_key=None, endpoint_pool=None, prefixes=None):
+        pool = endpoint_pool or get_endpoint_pool([LOCAL_BASE_URL])
+        return pool.warm_up(LOCAL_MODEL_NAME, prefixes) > 0
+
+    @staticmethod
+    def _pool(settings):
+        """The session's endpoint pool (a single default endpoint if none was configured)"""
+        return settings.get("endpoint_pool") or get_endpoint_pool([LOCAL_BASE_URL])
+
+    @staticmethod
+    def _create(pool, interaction_id, args):
+        """One chat completion on the endpoint the pool picks"""
+        with pool.lease(interaction_id) as endpoint:
+            return get_client("local", base_url=endpoint.base_url).chat.completions.create(**args)
+
+    @staticmethod
+    async def _acreate(pool, interaction_id, args):
+        with pool.lease(interaction_id) as endpoint:
+            return await get_async_client("local", base_url=endpoint.base_url).chat.completions.create(**args)
+
+    @staticmethod
+    def _open_stream(pool, interaction_id, args, is_async=False):
+        """
+        Opens a streaming completion. The endpoint stays leased until the stream
+        is consumed, so the caller must release it.
+
+        Returns:
+            tuple: (endpoint, stream or awaitable stream)
+        """
+        endpoint = pool.acquire(interaction_id)
+        try:
+            if is_async:
+                return endpoint, get_async_client("local", base_url=endpoint.base_url).chat.completions.create(**args)
+            return endpoint, get_client("local", base_url=endpoint.base_url).chat.completions.create(**args)
+        except Exception as e:
+            pool.release(endpoint, interaction_id, e)
+            raise
+
+    @staticmethod
+    def _response_format(response_schema):
+        """OpenAI-compatible json_schema response format (grammar-constrained decoding on LM Studio / llama.cpp)"""
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": "response", "strict": True, "schema": response_schema}
+        }
+
+    def _completion_args(self, messages, request, stream=False):
+        generation = request.generation
+        args = {
+            "model": self.model_for(request.model_name),
+            "messages": messages,
+            "temperature": generation.get("temperature", 0.7),
+        }
+        # max_tokens also caps <think> output of reasoning models
+        if generation.get("max_output_tokens"):
+            args["max_tokens"] = generation["max_output_tokens"]
+        if generation.get("stop_sequences"):
+            args["stop"] = generation["stop_sequences"]
+        if generation.get("thinking_level"):
+            args["reasoning_effort"] = generation["thinking_level"]
+        if request.response_schema:
+            args["response_format"] = self._response_format(request.response_schema)
+        if stream:
+            args["stream"] = True
+        return args
+
+    @staticmethod
+    def _text(completion):
+        """Text of an OpenAI-compatible chat completion (raises LLMResponseError if there is none)"""
+        if not completion.choices or completion.choices[0].message.content is None:
+            raise LLMResponseError("The local model returned no text output.", "local")
+        return completion.choices[0].message.content
+
+    @staticmethod
+    def _prepare_messages(store, request):
+        """
+        Resolves the local interaction ID and returns (interaction_id, messages) for the next call.
+        Only the system prompt, rolling summary and recent window are sent.
+        """
+        # determine interaction ID (system instruction is only set for new conversations);
+        # a conversation the store has since dropped starts over under the same ID
+        interaction_id = request.previous_interaction_id
+        if not interaction_id or interaction_id not in store:
+            interaction_id = store.start(request.system_instruction, interaction_id)
+
+        return interaction_id, store.build_messages(interaction_id, request.user_input)
+
+    def _store_turn(self, store, pool, interaction_id, user_input, cleaned_text):
+        """
+        Records the exchange and folds turns that left the window into the rolling summary.
+        """
+        store.record_turn(interaction_id, user_input, cleaned_text)
+        store.compact(interaction_id, lambda summary, messages: self._summarize(pool, summary, messages))
+
+    async def _astore_turn(self, store, pool, interaction_id, user_input, cleaned_text):
+        """
+        Async variant of _store_turn (summarization runs off the event loop).
+        """
+        store.record_turn(interaction_id, user_input, cleaned_text)
+        await asyncio.to_thread(
+            store.compact, interaction_id, lambda summary, messages: self._summarize(pool, summary, messages)
+        )
+
+    def _summarize(self, pool, previous_summary, messages):
+        """
+        Asks the local model to merge evicted turns into the rolling summary.
+        Returns an empty string on failure, so the turns stay in the window.
+        """
+        try:
+            completion = self._create(pool, None, {
+                "model": LOCAL_MODEL_NAME,
+                "messages": [
+                    {"role": "system", "content": SUMMARY_PROMPT},
+                    {"role": "user", "content": format_for_summary(previous_summary, messages)}
+                ],
+                "temperature": 0.2
+            })
+            return clean_response(completion.choices[0].message.content)
+        except Exception as e:
+            print(f"Local history summary failed: {str(e)}")
+            return ""
+
+    def complete(self, settings, request, transport, timer):
+        store = settings["history"]
+        pool = self._pool(settings)
+        interaction_id, messages = self._prepare_messages(store, request)
+
+        # call local LLM (each retry may pick another endpoint)
+        args = self._completion_args(messages, request)
+        completion = transport.call(
+            lambda: self._create(pool, interaction_id, args),
+            estimate_tokens(request.user_input),
+            timer
+        )
+        record_usage(transport, timer, completion)
+
+        cleaned_text = finish_text(self._text(completion), request.response_schema, "local")
+        self._store_turn(store, pool, interaction_id, request.user_input, cleaned_text)
+
+        return cleaned_text, interaction_id
+
+    async def acomplete(self, settings, request, transport, timer):
+        store = settings["history"]
+        pool = self._pool(settings)
+        interaction_id, messages = self._prepare_messages(store, request)
+
+        args = self._completion_args(messages, request)
+        completion = await transport.acall(
+            lambda: self._acreate(pool, interaction_id, args),
+            estimate_tokens(request.user_input),
+            timer
+        )
+        record_usage(transport, timer, completion)
+
+        cleaned_text = finish_text(self._text(completion), request.response_schema, "local")
+        await self._astore_turn(store, pool, interaction_id, request.user_input, cleaned_text)
+
+        return cleaned_text, interaction_id
+
+    def stream(self, settings, request, transport, stream):
+        """Streams a completion and stores the turn once it finishes"""
+        store = settings["history"]
+        pool = self._pool(settings)
+        interaction_id, messages = self._prepare_messages(store, request)
+        raw_chunks = []
+
+        args = self._completion_args(messages, request, stream=True)
+        endpoint, completion = transport.call(
+            lambda: self._open_stream(pool, interaction_id, args),
+            estimate_tokens(request.user_input),
+            stream.timer
+        )
+        error = None
+        try:
+            for chunk in completion:
+                # servers that honour stream_options send usage on a final chunk without choices
+                if getattr(chunk, "usage", None):
+                    record_usage(transport, stream.timer, chunk)
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    raw_chunks.append(text)
+                    yield text
+        except Exception as e:
+            error = e
+            raise classify_error(e, "local") from e
+        finally:
+            pool.release(endpoint, interaction_id, error)
+
+        self._store_turn(store, pool, interaction_id, request.user_input, clean_response("".join(raw_chunks)))
+        stream.interaction_id = interaction_id
+
+    async def astream(self, settings, request, transport, stream):
+        store = settings["history"]
+        pool = self._pool(settings)
+        interaction_id, messages = self._prepare_messages(store, request)
+        raw_chunks = []
+
+        args = self._completion_args(messages, request, stream=True)
+        leased = []
+
+        async def open_stream():
+            endpoint, pending = self._open_stream(pool, interaction_id, args, is_async=True)
+            try:
+                completion = await pending
+            except BaseException as e:
+                pool.release(endpoint, interaction_id, e)
+                raise
+            leased.append(endpoint)
+            return completion
+
+        completion = await transport.acall(open_stream, estimate_tokens(request.user_input), stream.timer)
+        error = None
+        try:
+            async for chunk in completion:
+                if getattr(chunk, "usage", None):
+                    record_usage(transport, stream.timer, chunk)
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    raw_chunks.append(text)
+                    yield text
+        except Exception as e:
+            error = e
+            raise classify_error(e, "local") from e
+        finally:
+            pool.release(leased[0], interaction_id, error)
+
+        await self._astore_turn(store, pool, interaction_id, request.user_input, clean_response("".join(raw_chunks)))
+        stream.interaction_id = interaction_id
+
+    # --- batch files ---
+
+    def submit_batch(self, settings, requests, transport, display_name=None):
+        """
+        Writes an OpenAI batch-format JSONL file for src.batch_worker.
+
+        Each request is self-contained (system prompt + input), nothing is added
+        to the session's chat history.
+        """
+        batch_dir = settings.get("batch_dir") or ".sokrates_batches"
+        os.makedirs(batch_dir, exist_ok=True)
+        job_id = display_name or f"batch-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        input_path = os.path.join(batch_dir, f"{job_id}.input.jsonl")
+
+        with open(input_path, "w") as f:
+            for request in requests:
+                messages = []
+                if request.system_instruction:
+                    messages.append({"role": "system", "content": request.system_instruction})
+                messages.append({"role": "user", "content": request.user_input})
+                f.write(json.dumps({
+                    "custom_id": request.custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": self._completion_args(messages, request)
+                }) + "\n")
+
+        models = sorted({self.model_for(request.model_name) for request in requests})
+        return BatchJob(
+            self.name,
+            job_id,
+            ", ".join(models),
+            {request.custom_id: {'agent': request.agent, 'response_schema': request.response_schema} for request in requests},
+            details={
+                'input_path': input_path,
+                'output_path': os.path.join(batch_dir, f"{job_id}.output.jsonl"),
+                'base_url': self._pool(settings).endpoints[0].base_url
+            }
+        )
+
+    @staticmethod
+    def _read_output(job):
+        path = job.details['output_path']
+        if not os.path.exists(path):
+            return {}
+        results = {}
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn line from an interrupted worker
+                results[record['custom_id']] = record
+        return results
+
+    def batch_status(self, settings, job, transport):
+        if not os.path.exists(job.details['output_path']):
+            return BATCH_PENDING
+        done = len(self._read_output(job))
+        return BATCH_SUCCEEDED if done >= len(job.requests) else BATCH_RUNNING
+
+    def batch_results(self, settings, job, transport):
+        results = {}
+        for custom_id, record in self._read_output(job).items():
+            response = record.get('response') or {}
+            if record.get('error') or response.get('status_code') != 200:
+                message = (record.get('error') or {}).get('message') or f"HTTP {response.get('status_code')}"
+                results[custom_id] = LLMResponseError(f"Batch request failed: {message}", "local")
+                continue
+            choices = response.get('body', {}).get('choices') or []
+            content = choices[0].get('message', {}).get('content') if choices else None
+            if content is None:
+                results[custom_id] = LLMResponseError("The local model returned no text output.", "local")
+            else:
+                results[custom_id] = content
+        return results
+
+
+class StubProvider(LLMProvider):
+    """
+    Offline stand-in model for tests and for load-testing the services around the
+    agents (LLM_PROVIDER = "stub"): no network, no API key, deterministic replies.
+
+    Plain calls answer with the agent's name and a question after '>>>'; structured
+    calls get the smallest reply that satisfies their schema. STUB_LATENCY (seconds
+    per call) simulates a slow model.
+    """
+
+    name = "stub"
+    keeps_history = True
+
+    @staticmethod
+    def _reply(request):
+        if request.response_schema:
+            return json.dumps(example_instance(request.response_schema))
+        return f"[stub {request.agent or 'model'}] >>> What did you learn from that?"
+
+    @staticmethod
+    def _latency(settings):
+        return float(settings["config"].get("STUB_LATENCY", 0) or 0)
+
+    @staticmethod
+    def _interaction_id(settings, request):
+        """Continues the conversation in the session's history like the local provider"""
+        store = settings["history"]
+        interaction_id = request.previous_interaction_id
+        if not interaction_id or interaction_id not in store:
+            interaction_id = store.start(request.system_instruction, interaction_id)
+        return interaction_id
+
+    def complete(self, settings, request, transport, timer):
+        interaction_id = self._interaction_id(settings, request)
+        time.sleep(self._latency(settings))
+        cleaned_text = finish_text(self._reply(request), request.response_schema, self.name)
+        settings["history"].record_turn(interaction_id, request.user_input, cleaned_text)
+        return cleaned_text, interaction_id
+
+    async def acomplete(self, settings, request, transport, timer):
+        interaction_id = self._interaction_id(settings, request)
+        await asyncio.sleep(self._latency(settings))
+        cleaned_text = finish_text(self._reply(request), request.response_schema, self.name)
+        settings["history"].record_turn(interaction_id, request.user_input, cleaned_text)
+        return cleaned_text, interaction_id
+
+    def stream(self, settings, request, transport, stream):
+        interaction_id = self._interaction_id(settings, request)
+        time.sleep(self._latency(settings))
+        text = self._reply(request)
+        for word in text.split(" "):
+            yield word + " "
+        settings["history"].record_turn(interaction_id, request.user_input, clean_response(text))
+        stream.interaction_id = interaction_id
+
+    async def astream(self, settings, request, transport, stream):
+        interaction_id = self._interaction_id(settings, request)
+        await asyncio.sleep(self._latency(settings))
+        text = self._reply(request)
+        for word in text.split(" "):
+            yield word + " "
+        settings["history"].record_turn(interaction_id, request.user_input, clean_response(text))
+        stream.interaction_id = interaction_id
+
+
+register_provider(GoogleProvider())
+register_provider(LocalProvider())
+register_provider(StubProvider())
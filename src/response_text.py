@@ -0,0 +1,65 @@
+"""
+Response Cleaning for SOKRATES
+Strips reasoning artifacts from model replies and reads the directive of a fused turn
+"""
+
+import json
+import re
+
+
+def clean_response(text):
+    """
+    Removes <think> tags and other internal monologue artifacts from the response.
+    Also handles the '>>>' delimiter for strict output control.
+    """
+    if not text:
+        return ""
+        
+    # 1. Remove <think>...</think> blocks (including newlines)
+    cleaned = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL)
+    
+    # 2. check for explicit output delimiter '>>>'
+    if ">>>" in cleaned:
+        parts = cleaned.split(">>>")
+        # return the last part (the actual output)
+        cleaned = parts[-1]
+        
+    # 3. remove leading/trailing quotes and common prefixes
+    cleaned = cleaned.strip().strip('"').strip("'")
+    
+    # remove "Question:" prefix if present (case insensitive)
+    if cleaned.lower().startswith("question:"):
+        cleaned = cleaned[9:].strip()
+        
+    # remove markdown italics/bold wrappers if they wrap the whole string
+    if cleaned.startswith("*") and cleaned.endswith("*"):
+        cleaned = cleaned.strip("*")
+    if cleaned.startswith("_") and cleaned.endswith("_"):
+        cleaned = cleaned.strip("_")
+        
+    return cleaned.strip()
+
+
+def extract_directive(raw_text):
+    """
+    Pulls the directive out of a fused Director+Sokrates reply (the part before '>>>').
+
+    Returns:
+        dict: the parsed DIRECTIVE object ({"instruction": text} if it is not valid JSON),
+        or None if the reply carried no directive
+    """
+    if not raw_text or ">>>" not in raw_text:
+        return None
+    before = re.sub(r'<think>.*?</think>', '', raw_text.rsplit(">>>", 1)[0], flags=re.DOTALL).strip()
+    if not before:
+        return None
+
+    match = re.search(r'DIRECTIVE:\s*(\{.*\})', before, re.DOTALL)
+    if match:
+        try:
+            directive = json.loads(match.group(1))
+            if isinstance(directive, dict):
+                return directive
+        except ValueError:
+            pass
+    return {"instruction": re.sub(r'^DIRECTIVE:\s*', '', before)}
@@ -0,0 +1,85 @@
+"""
+Agent Routing for SOKRATES
+Per-agent model tier and generation limits, overridable from secrets.toml
+"""
+
+
+# built-in generation settings per agent; unset fields fall back to the provider's defaults.
+# empty, so every agent runs on the default model without caps unless secrets.toml sets
+# [AGENT_ROUTES.default] or [AGENT_ROUTES.<agent>] (see README, Agent Routing)
+DEFAULT_ROUTES = {}
+
+ROUTE_FIELDS = ('tier', 'model', 'max_output_tokens', 'temperature', 'stop_sequences', 'thinking_level')
+
+THINKING_LEVELS = ('minimal', 'low', 'medium', 'high')
+
+
+class AgentRoute:
+    """
+    Where and how one agent's calls run.
+
+    Args:
+        agent: agent name (None for unrouted calls)
+        tier: model tier ("small", "default", "large"), mapped to a model per provider
+        model: explicit model name (wins over tier)
+        max_output_tokens: output cap (includes thinking tokens on reasoning models)
+        temperature: sampling temperature
+        stop_sequences: strings that end generation (e.g. stop Sokrates after one question)
+        thinking_level: reasoning effort ("minimal", "low", "medium", "high")
+    """
+
+    def __init__(
+        self,
+        agent=None,
+        tier="default",
+        model=None,
+        max_output_tokens=None,
+        temperature=None,
+        stop_sequences=None,
+        thinking_level=None
+    ):
+        if thinking_level is not None and thinking_level not in THINKING_LEVELS:
+            raise ValueError(f"thinking_level must be one of {', '.join(THINKING_LEVELS)}")
+        self.agent = agent
+        self.tier = tier
+        self.model = model
+        self.max_output_tokens = int(max_output_tokens) if max_output_tokens else None
+        self.temperature = float(temperature) if temperature is not None else None
+        self.stop_sequences = list(stop_sequences) if stop_sequences else None
+        self.thinking_level = thinking_level
+
+    def model_for(self, tiers):
+        """Model name for this route given a provider's tier -> model mapping"""
+        if self.model:
+            return self.model
+        return tiers.get(self.tier) or tiers.get("default")
+
+    def generation(self):
+        """The generation settings that are set, for providers and cache keys"""
+        return {
+            field: getattr(self, field)
+            for field in ('max_output_tokens', 'temperature', 'stop_sequences', 'thinking_level')
+            if getattr(self, field) is not None
+        }
+
+
+def get_route(agent, overrides=None):
+    """
+    Route for an agent: DEFAULT_ROUTES merged with overrides (e.g. AGENT_ROUTES from secrets.toml).
+
+    Later entries win: the built-in route, then the override named "default"
+    (every agent), then the agent's own override.
+    """
+    overrides = overrides or {}
+    settings = {}
+    settings.update(DEFAULT_ROUTES.get(agent, {}))
+    settings.update(overrides.get("default", {}))
+    settings.update(overrides.get(agent, {}) if agent else {})
+    return AgentRoute(agent, **{field: settings[field] for field in ROUTE_FIELDS if field in settings})
+
+
+def get_model_tiers(defaults, overrides=None):
+    """A provider's tier -> model mapping with overrides (e.g. MODEL_TIERS.<provider> from secrets.toml)"""
+    tiers = dict(defaults)
+    tiers.update(overrides or {})
+    return tiers
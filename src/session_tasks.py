@@ -0,0 +1,68 @@
+"""
+Session Background Tasks for SOKRATES
+Process-wide registry of background work (futures) keyed by session
+"""
+
+import threading
+import time
+
+
+class SessionTasks:
+    """
+    Futures started for a session, e.g. analyses precomputed while the interview runs.
+
+    They live here rather than in st.session_state so the session state stays plain,
+    serializable data. Sessions that have not touched their tasks for `ttl` seconds
+    are dropped and their unfinished futures cancelled.
+    """
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self._tasks = {}  # session_key -> {name: future}
+        self._touched = {}  # session_key -> last access
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        """Drop expired sessions (lock must be held)"""
+        for session_key in [k for k, touched in self._touched.items() if now - touched > self.ttl]:
+            for future in self._tasks.pop(session_key, {}).values():
+                future.cancel()
+            del self._touched[session_key]
+
+    def submit(self, session_key, name, future):
+        """Stores a started future (replacing and cancelling an older one with the same name)"""
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            previous = self._tasks.setdefault(session_key, {}).get(name)
+            if previous is not None and previous is not future:
+                previous.cancel()
+            self._tasks[session_key][name] = future
+            self._touched[session_key] = now
+        return future
+
+    def pop(self, session_key, name):
+        """Takes a session's future out of the registry (None if there is none)"""
+        with self._lock:
+            self._touched[session_key] = time.monotonic()
+            return self._tasks.get(session_key, {}).pop(name, None)
+
+    def cancel(self, session_key):
+        """Cancels and forgets everything started for a session"""
+        with self._lock:
+            for future in self._tasks.pop(session_key, {}).values():
+                future.cancel()
+            self._touched.pop(session_key, None)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(tasks) for tasks in self._tasks.values())
+
+
+# process-wide registry shared by all streamlit sessions
+_session_tasks = SessionTasks()
+
+
+def get_session_tasks():
+    """Return the process-wide session task registry"""
+    return _session_tasks
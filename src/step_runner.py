@@ -0,0 +1,225 @@
+"""
+Step Runner for SOKRATES
+Runs the stages of a pipeline step as a small DAG: concurrently, as soon as their inputs are ready, memoized by input hash
+"""
+
+import contextvars
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from src.tracing import current_trace
+
+
+def _canonical(value):
+    """JSON-able stand-in for stage inputs that aren't plain data (reports and the like)"""
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    return repr(value)
+
+
+def stage_key(name, inputs, salt=None):
+    """SHA-256 of a stage's name, its inputs (fixed arguments and dependency results) and the salt"""
+    payload = json.dumps({"stage": name, "inputs": inputs, "salt": salt}, sort_keys=True, default=_canonical)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class StageMemo:
+    """
+    Thread-safe LRU of stage results keyed by stage_key, shared across runs and sessions.
+
+    Results are shared as-is, so stages must not mutate their inputs or results.
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def get(self, key):
+        """Returns (True, result) on a hit, (False, None) otherwise"""
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                self._stats['hits'] += 1
+                return True, self._results[key]
+            self._stats['misses'] += 1
+            return False, None
+
+    def set(self, key, result):
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._results))
+
+
+class StepRunner:
+    """
+    Small dependency-driven thread pool for one pipeline step.
+
+    Tasks (stages) are plain functions that receive their dependencies' results as
+    keyword arguments; a stage's inputs are its fixed arguments plus those results,
+    its output is stored under its name. They run on worker threads, at most
+    max_workers at a time, so they must not touch st.* (LLM calls go through the
+    async API with a settings snapshot, see src.llm.submit_interaction_response).
+    run() is consumed on the calling thread and yields each result as it finishes,
+    which is where progress is reported.
+
+    With a StageMemo, tasks added with memoize=True are skipped when the memo
+    holds a result for the same inputs (and salt, e.g. the model settings), so
+    after one input changes only the stages downstream of it run again. `prior`
+    does the same from results kept elsewhere (a session from an earlier run):
+    {name: (key, result)}; `keys` holds each memoized task's key after run().
+
+    Tasks run in a copy of the caller's context, so with a session trace active
+    (src.tracing) each task gets a stage:<name> span, and the spans it records
+    itself (LLM calls, extraction passes) land on its worker's row.
+
+    Example:
+        runner = StepRunner()
+        runner.add("analysis", analyzer.analyze_text, text=context)
+        runner.add("facts", ask_archivist, after=("analysis",))
+        for name, result in runner.run():
+            st.write(f"{name} done")
+    """
+
+    def __init__(self, max_workers=4, memo=None, salt=None, prior=None):
+        self.max_workers = max_workers
+        self.memo = memo
+        self.salt = salt
+        self.prior = prior or {}
+        self.keys = {}  # name -> stage_key of its inputs (memoized tasks)
+        self.results = {}
+        self.timings = {}  # name -> seconds the task ran (0 when memoized)
+        self.memoized = set()  # names whose result came from the memo
+        self._tasks = {}  # name -> (fn, after, kwargs)
+        self._memoize = set()
+        self._order = []
+
+    def add(self, name, fn, after=(), memoize=False, **kwargs):
+        """
+        Registers a task.
+
+        Args:
+            name: result key (also the keyword its dependents receive it as)
+            fn: callable(**kwargs, **dependency results)
+            after: names of tasks whose results fn needs
+            memoize: reuse a memoized result for the same inputs (fn must depend on nothing else)
+            kwargs: fixed arguments for fn
+        """
+        if name in self._tasks:
+            raise ValueError(f"Duplicate task: {name}")
+        self._tasks[name] = (fn, tuple(after), kwargs)
+        if memoize:
+            self._memoize.add(name)
+        self._order.append(name)
+        return self
+
+    def _check(self):
+        """Rejects unknown dependencies and cycles before anything starts"""
+        for name, (_, after, _) in self._tasks.items():
+            for dependency in after:
+                if dependency not in self._tasks:
+                    raise ValueError(f"Task '{name}' depends on unknown task '{dependency}'")
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependency cycle through task '{name}'")
+            visiting.add(name)
+            for dependency in self._tasks[name][1]:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+
+        for name in self._order:
+            visit(name)
+
+    def _timed(self, name, fn, kwargs, key):
+        start = time.perf_counter()
+        error = None
+        try:
+            result = fn(**kwargs)
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            end = time.perf_counter()
+            self.timings[name] = end - start
+            trace = current_trace()
+            if trace is not None:
+                trace.add(f"stage:{name}", "stage", start, end, memoized=False, error=error)
+        if key is not None and self.memo is not None:
+            self.memo.set(key, result)
+        return result
+
+    def run(self):
+        """
+        Runs every task and yields (name, result) on the calling thread in completion order.
+
+        The first failing task's exception is raised from the generator; tasks
+        that have not started yet are cancelled.
+        """
+        self._check()
+        pending = list(self._order)
+        running = {}  # future -> name
+
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="sokrates-step")
+        try:
+            while pending or running:
+                # start everything whose inputs are ready
+                ready = [n for n in pending if all(d in self.results for d in self._tasks[n][1])]
+                for name in ready:
+                    fn, after, kwargs = self._tasks[name]
+                    arguments = dict(kwargs, **{dependency: self.results[dependency] for dependency in after})
+                    pending.remove(name)
+                    key = None
+                    if name in self._memoize and (self.memo is not None or name in self.prior):
+                        key = self.keys[name] = stage_key(name, arguments, self.salt)
+                        if name in self.prior and self.prior[name][0] == key:
+                            hit, result = True, self.prior[name][1]
+                        elif self.memo is not None:
+                            hit, result = self.memo.get(key)
+                        else:
+                            hit, result = False, None
+                        if hit:
+                            trace = current_trace()
+                            if trace is not None:
+                                now = time.perf_counter()
+                                trace.add(f"stage:{name}", "stage", now, now, memoized=True)
+                            self.results[name] = result
+                            self.timings[name] = 0.0
+                            self.memoized.add(name)
+                            yield name, result
+                            continue
+                    context = contextvars.copy_context()
+                    running[pool.submit(context.run, self._timed, name, fn, arguments, key)] = name
+
+                if not running:
+                    # memoized results may have made more tasks ready
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    self.results[name] = future.result()
+                    yield name, self.results[name]
+        finally:
+            # on failure (or st.stop() in the consumer) don't block on tasks still in flight
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,142 @@
+"""
+Structured Output for SOKRATES
+Parses and validates schema-constrained JSON responses
+"""
+
+import json
+import re
+
+from src.transport import LLMResponseError
+
+
+class StructuredOutputError(LLMResponseError):
+    """The model's reply is not valid JSON for the requested schema (.raw_text keeps the reply)"""
+
+    def __init__(self, message, provider=None, raw_text=""):
+        super().__init__(message, provider, retryable=True)
+        self.raw_text = raw_text
+
+
+def parse_json_response(text):
+    """
+    Parses a JSON object from a model reply.
+
+    Constrained decoding returns bare JSON; servers that ignore the response
+    format may still wrap it in prose or code fences, so those are stripped.
+
+    Raises:
+        ValueError: if no JSON object can be decoded
+    """
+    text = re.sub(r'<think>.*?</think>', '', text or "", flags=re.DOTALL).strip()
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    text = re.sub(r'```(?:json)?', '', text)
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        raise ValueError("No JSON object found in response")
+    return json.loads(text[start:end + 1])
+
+
+def validate(data, schema, path="$"):
+    """
+    Checks data against the JSON schema subset used by SOKRATES schemas
+    (type, properties, required, additionalProperties, items, enum, min/max).
+
+    Returns:
+        list: human readable errors (empty if valid)
+    """
+    errors = []
+    expected = schema.get("type")
+
+    if expected == "object":
+        if not isinstance(data, dict):
+            return [f"{path}: expected object"]
+        properties = schema.get("properties", {})
+        for key in schema.get("required", []):
+            if key not in data:
+                errors.append(f"{path}.{key}: missing")
+        extra = schema.get("additionalProperties", True)
+        for key, value in data.items():
+            if key in properties:
+                errors.extend(validate(value, properties[key], f"{path}.{key}"))
+            elif isinstance(extra, dict):
+                errors.extend(validate(value, extra, f"{path}.{key}"))
+            elif extra is False:
+                errors.append(f"{path}.{key}: unexpected key")
+
+    elif expected == "array":
+        if not isinstance(data, list):
+            return [f"{path}: expected array"]
+        if len(data) < schema.get("minItems", 0):
+            errors.append(f"{path}: expected at least {schema['minItems']} items")
+        if "maxItems" in schema and len(data) > schema["maxItems"]:
+            errors.append(f"{path}: expected at most {schema['maxItems']} items")
+        for i, item in enumerate(data):
+            errors.extend(validate(item, schema.get("items", {}), f"{path}[{i}]"))
+
+    elif expected == "string":
+        if not isinstance(data, str):
+            errors.append(f"{path}: expected string")
+
+    elif expected in ("integer", "number"):
+        numeric = isinstance(data, (int, float)) and not isinstance(data, bool)
+        if not numeric or (expected == "integer" and isinstance(data, float) and not data.is_integer()):
+            return [f"{path}: expected {expected}"]
+        if "minimum" in schema and data < schema["minimum"]:
+            errors.append(f"{path}: below minimum {schema['minimum']}")
+        if "maximum" in schema and data > schema["maximum"]:
+            errors.append(f"{path}: above maximum {schema['maximum']}")
+
+    if "enum" in schema and data not in schema["enum"]:
+        errors.append(f"{path}: must be one of {', '.join(map(str, schema['enum']))}")
+
+    return errors
+
+
+def example_instance(schema):
+    """
+    Smallest value that passes validate() for a schema: required keys only, minItems
+    items, the first enum value, the minimum number. Used by the offline stub model.
+    """
+    if "enum" in schema:
+        return schema["enum"][0]
+    expected = schema.get("type")
+    if expected == "object":
+        properties = schema.get("properties", {})
+        data = {key: example_instance(properties.get(key, {})) for key in schema.get("required", [])}
+        extra = schema.get("additionalProperties")
+        if not properties and isinstance(extra, dict):
+            data["example"] = example_instance(extra)
+        return data
+    if expected == "array":
+        return [example_instance(schema.get("items", {})) for _ in range(max(schema.get("minItems", 0), 1))]
+    if expected in ("integer", "number"):
+        return schema.get("minimum", 1)
+    if expected == "boolean":
+        return False
+    return "example"
+
+
+def parse_structured_response(text, schema, provider=None):
+    """
+    Parses and validates a structured reply.
+
+    Returns:
+        dict: the decoded object
+
+    Raises:
+        StructuredOutputError: if the reply is not JSON or does not match the schema
+    """
+    try:
+        data = parse_json_response(text)
+    except ValueError as e:
+        raise StructuredOutputError(f"The model returned invalid JSON: {str(e)}", provider, text) from e
+
+    errors = validate(data, schema)
+    if errors:
+        shown = "; ".join(errors[:5]) + (f" (+{len(errors) - 5} more)" if len(errors) > 5 else "")
+        raise StructuredOutputError(f"The model's JSON does not match the schema: {shown}", provider, text)
+    return data
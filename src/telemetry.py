@@ -0,0 +1,334 @@
+"""
+LLM Call Telemetry for SOKRATES
+Per-agent latency, token and cost metrics aggregated in process and exported in Prometheus text format
+"""
+
+import bisect
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# USD per 1M tokens (input, output); override with LLM_PRICING in secrets.toml
+DEFAULT_PRICING = {
+    'gemini-2.5-pro': (1.25, 10.00),
+    'gemini-2.5-flash': (0.30, 2.50),
+    'gemini-2.5-flash-lite': (0.10, 0.40),
+    'local-model': (0.0, 0.0),
+}
+
+# histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, float('inf'))
+TOKEN_BUCKETS = (100, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000, float('inf'))
+
+
+class Histogram:
+    """Cumulative-bucket histogram plus a bounded window of raw samples for percentiles"""
+
+    def __init__(self, buckets, window=1000):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self.samples = deque(maxlen=window)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.samples.append(value)
+
+    def percentile(self, q):
+        """q in [0, 100] over the recent sample window (None if empty)"""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+        return ordered[index]
+
+
+class CallTimer:
+    """
+    Measures one LLM call: queue wait (rate limiter), time to first token and total latency.
+
+    Usage: create with start_call(), add queue wait / mark first token while the
+    call runs, then finish() to record it (and, given a session trace, add an
+    llm:<agent> span to it).
+    """
+
+    def __init__(self, telemetry, agent, provider, model, estimated_input_tokens=0, trace=None):
+        self.telemetry = telemetry
+        self.trace = trace
+        self.agent = agent or 'unknown'
+        self.provider = provider
+        self.model = model
+        self.started = time.perf_counter()
+        self.queue_wait = 0.0
+        self.first_token_at = None
+        self.estimated_input_tokens = estimated_input_tokens
+        self.input_tokens = None
+        self.output_tokens = None
+        self.finished = False
+
+    def add_queue_wait(self, seconds):
+        self.queue_wait += seconds
+
+    def first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def set_usage(self, input_tokens=None, output_tokens=None):
+        if input_tokens:
+            self.input_tokens = input_tokens
+        if output_tokens:
+            self.output_tokens = output_tokens
+
+    def finish(self, output_tokens=None, cached=False, error=None):
+        """Record the call (idempotent). output_tokens is the fallback when the provider reported no usage."""
+        if self.finished:
+            return
+        self.finished = True
+        now = time.perf_counter()
+        latency = now - self.started
+        call = {
+            'agent': self.agent,
+            'provider': self.provider,
+            'model': self.model,
+            'queue_wait': self.queue_wait,
+            'ttft': (self.first_token_at or now) - self.started,
+            'latency': latency,
+            'input_tokens': 0 if cached else (self.input_tokens or self.estimated_input_tokens or 0),
+            'output_tokens': 0 if cached else (self.output_tokens or output_tokens or 0),
+            'cached': cached,
+            'error': error,
+        }
+        self.telemetry.record(call)
+        if self.trace is not None:
+            self.trace.add(
+                f"llm:{self.agent}", "llm", self.started, now,
+                provider=self.provider, model=self.model,
+                queue_wait_ms=round(self.queue_wait * 1000, 1), ttft_ms=round(call['ttft'] * 1000, 1),
+                input_tokens=call['input_tokens'], output_tokens=call['output_tokens'],
+                cached=cached, error=error
+            )
+
+
+class Telemetry:
+    """Thread-safe in-process aggregation of LLM call records"""
+
+    def __init__(self, pricing=None, recent_calls=200, dump_path=None):
+        self.pricing = dict(DEFAULT_PRICING)
+        self.set_pricing(pricing)
+        # when set, the Prometheus text is rewritten to this file after every call
+        self.dump_path = dump_path
+        self._lock = threading.Lock()
+        self._series = defaultdict(self._new_series)
+        self.recent = deque(maxlen=recent_calls)
+
+    @staticmethod
+    def _new_series():
+        return {
+            'calls': 0,
+            'errors': 0,
+            'cache_hits': 0,
+            'input_tokens': 0,
+            'output_tokens': 0,
+            'cost_usd': 0.0,
+            'latency': Histogram(LATENCY_BUCKETS),
+            'ttft': Histogram(LATENCY_BUCKETS),
+            'queue_wait': Histogram(LATENCY_BUCKETS),
+            'output_tokens_hist': Histogram(TOKEN_BUCKETS),
+        }
+
+    def set_pricing(self, pricing):
+        """Merge {model: [input_usd_per_1m, output_usd_per_1m]} into the price table"""
+        if pricing:
+            self.pricing.update({model: tuple(prices) for model, prices in pricing.items()})
+
+    def start_call(self, agent, provider, model, estimated_input_tokens=0, trace=None):
+        return CallTimer(self, agent, provider, model, estimated_input_tokens, trace)
+
+    def estimate_cost(self, model, input_tokens, output_tokens):
+        input_price, output_price = self.pricing.get(model, (0.0, 0.0))
+        return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+    def record(self, call):
+        """Add one call record (dict with agent, provider, model, timings and tokens)"""
+        call['cost_usd'] = 0.0 if call['cached'] else self.estimate_cost(
+            call['model'], call['input_tokens'], call['output_tokens']
+        )
+        call['timestamp'] = time.time()
+        with self._lock:
+            series = self._series[(call['agent'], call['provider'], call['model'])]
+            series['calls'] += 1
+            if call['error']:
+                series['errors'] += 1
+            if call['cached']:
+                series['cache_hits'] += 1
+            series['input_tokens'] += call['input_tokens']
+            series['output_tokens'] += call['output_tokens']
+            series['cost_usd'] += call['cost_usd']
+            # cache hits take no time and no tokens; they would pull the percentiles toward zero
+            if not call['cached']:
+                series['latency'].observe(call['latency'])
+                series['ttft'].observe(call['ttft'])
+                series['queue_wait'].observe(call['queue_wait'])
+                series['output_tokens_hist'].observe(call['output_tokens'])
+            self.recent.append(call)
+
+        if self.dump_path:
+            try:
+                self.dump(self.dump_path)
+            except OSError as e:
+                print(f"Metrics dump failed: {str(e)}")
+
+    def recent_calls(self):
+        """Most recent call records, newest first"""
+        with self._lock:
+            return list(reversed(self.recent))
+
+    def summary(self):
+        """
+        Per-agent summary rows (for the admin page).
+
+        Returns:
+            list: dicts with calls, errors, p50/p95 latency and ttft, tokens and cost
+        """
+        rows = []
+        with self._lock:
+            for (agent, provider, model), series in sorted(self._series.items()):
+                rows.append({
+                    'agent': agent,
+                    'provider': provider,
+                    'model': model,
+                    'calls': series['calls'],
+                    'errors': series['errors'],
+                    'cache_hits': series['cache_hits'],
+                    'p50_latency_s': _round(series['latency'].percentile(50)),
+                    'p95_latency_s': _round(series['latency'].percentile(95)),
+                    'p50_ttft_s': _round(series['ttft'].percentile(50)),
+                    'p95_ttft_s': _round(series['ttft'].percentile(95)),
+                    'p95_queue_wait_s': _round(series['queue_wait'].percentile(95)),
+                    'input_tokens': series['input_tokens'],
+                    'output_tokens': series['output_tokens'],
+                    'cost_usd': round(series['cost_usd'], 6),
+                })
+        return rows
+
+    def to_prometheus(self):
+        """Render all series in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            items = sorted(self._series.items())
+
+            counters = [
+                ('sokrates_llm_calls_total', 'calls', 'LLM calls'),
+                ('sokrates_llm_errors_total', 'errors', 'Failed LLM calls'),
+                ('sokrates_llm_cache_hits_total', 'cache_hits', 'LLM calls served from the response cache'),
+                ('sokrates_llm_input_tokens_total', 'input_tokens', 'Input tokens sent'),
+                ('sokrates_llm_output_tokens_total', 'output_tokens', 'Output tokens received'),
+                ('sokrates_llm_cost_usd_total', 'cost_usd', 'Estimated cost in USD'),
+            ]
+            for name, field, help_text in counters:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, series in items:
+                    lines.append(f"{name}{{{_labels(labels)}}} {series[field]}")
+
+            histograms = [
+                ('sokrates_llm_latency_seconds', 'latency', 'Total LLM call latency'),
+                ('sokrates_llm_ttft_seconds', 'ttft', 'Time to first token'),
+                ('sokrates_llm_queue_wait_seconds', 'queue_wait', 'Time spent waiting for the rate limiter'),
+                ('sokrates_llm_output_tokens', 'output_tokens_hist', 'Output tokens per call'),
+            ]
+            for name, field, help_text in histograms:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, series in items:
+                    histogram = series[field]
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float('inf') else repr(bound)
+                        lines.append(f'{name}_bucket{{{_labels(labels)},le="{le}"}} {cumulative}')
+                    lines.append(f"{name}_sum{{{_labels(labels)}}} {histogram.sum}")
+                    lines.append(f"{name}_count{{{_labels(labels)}}} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Write the Prometheus text to a file (atomically, for node_exporter's textfile collector)"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # a temp file per call: worker threads may dump at the same time
+        fd, temp_path = tempfile.mkstemp(dir=directory or ".", prefix=os.path.basename(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(self.to_prometheus())
+            # mkstemp creates the file owner-only; the textfile collector may run as another user
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self.recent.clear()
+
+
+def _labels(key):
+    agent, provider, model = key
+    return f'agent="{agent}",provider="{provider}",model="{model}"'
+
+
+def _round(value):
+    return round(value, 3) if value is not None else None
+
+
+# process-wide telemetry shared by all streamlit sessions
+_telemetry = Telemetry()
+_metrics_server = None
+_metrics_server_lock = threading.Lock()
+
+
+def get_telemetry():
+    """Return the process-wide telemetry"""
+    return _telemetry
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """
+    Serve /metrics in Prometheus text format from a daemon thread (once per process).
+
+    Returns:
+        ThreadingHTTPServer: the running server
+    """
+    global _metrics_server
+    with _metrics_server_lock:
+        if _metrics_server:
+            return _metrics_server
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = _telemetry.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        _metrics_server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=_metrics_server.serve_forever, name="sokrates-metrics", daemon=True).start()
+        return _metrics_server
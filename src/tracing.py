@@ -0,0 +1,169 @@
+"""
+Tracing for SOKRATES
+Per-session span timeline (steps, stages, I/O, extraction passes, LLM calls, rendering) with Chrome trace export
+"""
+
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# the session trace work on this thread (or task) belongs to; StepRunner copies it to its workers
+_current_trace = contextvars.ContextVar("sokrates_trace", default=None)
+
+# the row session steps are drawn on (thread ids are never 0)
+STEPS_TID = 0
+
+
+class Trace:
+    """
+    Spans of one session, as Chrome trace "complete" events.
+
+    Spans nest by time on each thread, so no parent IDs are kept. Open the
+    exported JSON in chrome://tracing or https://ui.perfetto.dev.
+    """
+
+    def __init__(self, trace_id, max_spans=10000):
+        self.trace_id = trace_id
+        self.max_spans = max_spans
+        self.origin = time.perf_counter()
+        self.started_at = time.time()
+        self.spans = []
+        self.dropped = 0
+        self._threads = {STEPS_TID: "session steps"}  # row (thread id) -> name
+        self._step = None  # (name, start) of the open step span
+        self._lock = threading.Lock()
+
+    def _event(self, name, category, start, end, tid, args=None):
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': "X",
+            'ts': round((start - self.origin) * 1e6),
+            'dur': round(max(end - start, 0) * 1e6),
+            'pid': os.getpid(),
+            'tid': tid,
+        }
+        if args:
+            event['args'] = args
+        return event
+
+    def add(self, name, category, start, end, **args):
+        """Records a span measured elsewhere (perf_counter start and end) on the current thread's row"""
+        thread = threading.current_thread()
+        event = self._event(name, category, start, end, thread.ident, args)
+        with self._lock:
+            if len(self.spans) >= self.max_spans:
+                self.dropped += 1
+                return
+            self.spans.append(event)
+            self._threads.setdefault(thread.ident, thread.name)
+
+    @contextmanager
+    def span(self, name, category="pipeline", **args):
+        start = time.perf_counter()
+        try:
+            yield args  # callers may add args while the span is open
+        except BaseException as e:
+            args['error'] = type(e).__name__
+            raise
+        finally:
+            self.add(name, category, start, time.perf_counter(), **args)
+
+    def step(self, name):
+        """
+        Ends the current session step and starts the next on the steps row.
+        Steps cover the whole session, time spent waiting for the user included.
+        """
+        now = time.perf_counter()
+        with self._lock:
+            if self._step and self._step[0] == name:
+                return
+            if self._step:
+                self.spans.append(self._event(f"step:{self._step[0]}", "step", self._step[1], now, STEPS_TID))
+            self._step = (name, now)
+
+    def to_chrome(self):
+        """Chrome trace JSON object (the open step is included up to now)"""
+        with self._lock:
+            events = list(self.spans)
+            threads = dict(self._threads)
+            if self._step:
+                events.append(self._event(
+                    f"step:{self._step[0]}", "step", self._step[1], time.perf_counter(), STEPS_TID
+                ))
+        events.extend(
+            {'name': "thread_name", 'ph': "M", 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}}
+            for tid, name in threads.items()
+        )
+        return {
+            'traceEvents': events,
+            'displayTimeUnit': "ms",
+            'otherData': {'trace_id': self.trace_id, 'started_at': self.started_at, 'dropped_spans': self.dropped},
+        }
+
+    def export(self, path):
+        """Writes the Chrome trace JSON atomically"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.to_chrome(), f)
+        os.replace(path + ".tmp", path)
+        return path
+
+    def waterfall(self):
+        """
+        Spans for a waterfall view, in start order.
+
+        Returns:
+            list: dicts with name, category, start_ms, duration_ms and args
+        """
+        rows = [
+            {
+                'name': event['name'],
+                'category': event['cat'],
+                'start_ms': event['ts'] / 1000,
+                'duration_ms': event['dur'] / 1000,
+                'args': event.get('args', {}),
+            }
+            for event in self.to_chrome()['traceEvents'] if event['ph'] == "X"
+        ]
+        rows.sort(key=lambda row: (row['start_ms'], -row['duration_ms']))
+        return rows
+
+
+def activate(trace):
+    """Makes trace the current trace of this thread (None stops tracing here)"""
+    _current_trace.set(trace)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def span(name, category="pipeline", **args):
+    """Context manager recording a span on the current trace (a no-op without one)"""
+    trace = _current_trace.get()
+    if trace is None:
+        return nullcontext(args)
+    return trace.span(name, category, **args)
+
+
+def traced(category, name=None):
+    """Decorator recording each call of a function as a span on the current trace"""
+    def decorate(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            trace = _current_trace.get()
+            if trace is None:
+                return fn(*args, **kwargs)
+            with trace.span(span_name, category):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
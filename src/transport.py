@@ -0,0 +1,307 @@
+"""
+Resilient LLM Transport for SOKRATES
+Bounded retries with jittered backoff, token-bucket rate limiting and a circuit breaker
+"""
+
+import asyncio
+import hashlib
+import random
+import threading
+import time
+
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """Base class for LLM failures surfaced to the app"""
+
+    def __init__(self, message, provider=None, status_code=None, retryable=False):
+        super().__init__(message)
+        self.provider = provider
+        self.status_code = status_code
+        self.retryable = retryable
+
+
+class LLMConfigurationError(LLMError):
+    """Missing or invalid configuration (e.g. no API key)"""
+
+
+class LLMRateLimitError(LLMError):
+    """The provider kept answering 429 after all retries"""
+
+
+class LLMTimeoutError(LLMError):
+    """The call did not finish within its timeout"""
+
+
+class LLMUnavailableError(LLMError):
+    """The provider is failing (5xx / connection errors) or the circuit is open"""
+
+
+class LLMResponseError(LLMError):
+    """Non-retryable request failure or unusable response"""
+
+
+def _status_code(exc):
+    """Best-effort HTTP status from google-genai / openai / httpx exceptions"""
+    for attr in ("status_code", "code", "status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def classify_error(exc, provider=None):
+    """
+    Convert an SDK exception into a typed LLMError.
+
+    Returns:
+        LLMError: with .retryable set for 429/5xx, timeouts and connection failures
+    """
+    if isinstance(exc, LLMError):
+        return exc
+
+    status = _status_code(exc)
+    name = type(exc).__name__
+    message = f"{name}: {str(exc)}" if str(exc) else name
+
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError)) or "Timeout" in name:
+        return LLMTimeoutError(message, provider, status, retryable=True)
+    if status == 429:
+        return LLMRateLimitError(message, provider, status, retryable=True)
+    if status in RETRYABLE_STATUS or (status and status >= 500):
+        return LLMUnavailableError(message, provider, status, retryable=True)
+    if status is None and ("Connection" in name or "Network" in name or isinstance(exc, ConnectionError)):
+        return LLMUnavailableError(message, provider, status, retryable=True)
+    return LLMResponseError(message, provider, status, retryable=False)
+
+
+class RetryPolicy:
+    """Bounded exponential backoff with full jitter"""
+
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=8.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        """Sleep before retry number `attempt` (1-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at `per_minute` units per minute.
+
+    reserve() takes units immediately (the balance may go negative) and returns how
+    long the caller must wait, so waiting happens outside the lock and callers
+    are served in arrival order.
+    """
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """Take `amount` units and return the seconds to wait before using them"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # a single request larger than the bucket still goes through, it just waits longer
+            self._tokens -= min(amount, self.capacity)
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def debit(self, amount):
+        """Charge units after the fact (e.g. actual output tokens)"""
+        with self._lock:
+            self._tokens -= amount
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for one provider/key"""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def reserve(self, estimated_tokens):
+        """Seconds to wait before sending a request of `estimated_tokens` input tokens"""
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.reserve(1))
+        if self.tokens:
+            wait = max(wait, self.tokens.reserve(estimated_tokens))
+        return wait
+
+    def record_output(self, output_tokens):
+        if self.tokens and output_tokens:
+            self.tokens.debit(output_tokens)
+
+
+class CircuitBreaker:
+    """
+    Fails fast after `failure_threshold` consecutive failures.
+
+    After `reset_timeout` seconds one trial call is let through (half-open) and
+    other callers keep failing fast until it reports back; success closes the
+    circuit, failure opens it again. A trial that never reports back (e.g. a
+    cancelled call) is replaced by a new one after another reset_timeout.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_started = None  # when the half-open trial call in flight started
+        self._lock = threading.Lock()
+
+    def before_call(self, provider=None):
+        """Raise LLMUnavailableError if the circuit is open, or half-open with a trial call in flight"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == "open":
+                if now - self._opened_at < self.reset_timeout:
+                    retry_in = self.reset_timeout - (now - self._opened_at)
+                    raise LLMUnavailableError(
+                        f"{provider or 'LLM'} provider is failing; retry in {retry_in:.0f}s",
+                        provider,
+                        retryable=True
+                    )
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self._trial_started is not None and now - self._trial_started < self.reset_timeout:
+                    raise LLMUnavailableError(
+                        f"{provider or 'LLM'} provider is recovering; a trial call is in flight",
+                        provider,
+                        retryable=True
+                    )
+                self._trial_started = now
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_started = None
+            self.state = "closed"
+
+    def end_trial(self):
+        """A call ended with an error that says nothing about the provider's health (the circuit stays as it is)"""
+        with self._lock:
+            self._trial_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self._trial_started = None
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+class Transport:
+    """
+    Wraps provider calls for one provider/key with rate limiting, retries and a circuit breaker.
+    """
+
+    def __init__(self, provider, limiter=None, breaker=None, retry_policy=None):
+        self.provider = provider
+        self.limiter = limiter or RateLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.retry_policy = retry_policy or RetryPolicy()
+
+    def call(self, fn, estimated_tokens=0, timer=None):
+        """
+        Run fn() with retries. Raises a typed LLMError on failure.
+
+        Args:
+            fn: zero-argument callable performing the SDK request
+            estimated_tokens: input size charged against the tokens-per-minute bucket
+            timer: optional telemetry CallTimer that is charged the rate-limiter wait
+        """
+        for attempt in range(1, self.retry_policy.max_attempts + 1):
+            self.breaker.before_call(self.provider)
+            wait = self.limiter.reserve(estimated_tokens)
+            if wait:
+                if timer:
+                    timer.add_queue_wait(wait)
+                time.sleep(wait)
+            try:
+                result = fn()
+            except Exception as e:
+                error = self._failed(e)
+                if not error.retryable or attempt == self.retry_policy.max_attempts:
+                    raise error from e
+                time.sleep(self.retry_policy.delay(attempt))
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def acall(self, coro_fn, estimated_tokens=0, timer=None):
+        """Async variant of call(); coro_fn() must return a new awaitable per attempt"""
+        for attempt in range(1, self.retry_policy.max_attempts + 1):
+            self.breaker.before_call(self.provider)
+            wait = self.limiter.reserve(estimated_tokens)
+            if wait:
+                if timer:
+                    timer.add_queue_wait(wait)
+                await asyncio.sleep(wait)
+            try:
+                result = await coro_fn()
+            except Exception as e:
+                error = self._failed(e)
+                if not error.retryable or attempt == self.retry_policy.max_attempts:
+                    raise error from e
+                await asyncio.sleep(self.retry_policy.delay(attempt))
+                continue
+            self.breaker.record_success()
+            return result
+
+    def _failed(self, exc):
+        """Classify a failure and update the breaker (only provider-side failures count)"""
+        error = classify_error(exc, self.provider)
+        if error.retryable and not isinstance(error, LLMRateLimitError):
+            self.breaker.record_failure()
+        else:
+            self.breaker.end_trial()
+        return error
+
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(provider, api_key=None, limits=None, retry=None, breaker=None):
+    """
+    Process-wide transport for a provider/key pair (created on first use).
+
+    Args:
+        provider: provider name
+        api_key: key the limits apply to (hashed, never stored)
+        limits: dict with requests_per_minute / tokens_per_minute
+        retry: dict with max_attempts / base_delay / max_delay
+        breaker: dict with failure_threshold / reset_timeout
+    """
+    key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+    key = (provider, key_hash)
+    with _transports_lock:
+        transport = _transports.get(key)
+        if transport is None:
+            limits = limits or {}
+            transport = Transport(
+                provider,
+                limiter=RateLimiter(limits.get("requests_per_minute"), limits.get("tokens_per_minute")),
+                breaker=CircuitBreaker(**(breaker or {})),
+                retry_policy=RetryPolicy(**(retry or {}))
+            )
+            _transports[key] = transport
+        return transport
@@ -1,21 +1,187 @@
 import requests
 from bs4 import BeautifulSoup
 from pypdf import PdfReader
-import io
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 
-def extract_text_from_pdf(file_obj):
+from src.config import get_config
+from src.tracing import span, traced
+
+# budgets for one PDF, overridable in secrets.toml (PDF_MAX_PAGES, PDF_MAX_BYTES, PDF_TIME_BUDGET)
+PDF_MAX_PAGES = 200
+PDF_MAX_BYTES = 1024 * 1024  # extracted text, utf-8
+PDF_TIME_BUDGET = 30.0  # seconds
+# longer documents are split into page ranges across a process pool (PDF_PARALLEL_MIN_PAGES, PDF_WORKERS)
+PDF_PARALLEL_MIN_PAGES = 40
+PDF_DEADLINE_SLACK = 5.0  # seconds
+
+def pdf_budget(config=None):
+    """Page, byte and time budgets plus parallelism settings for PDF extraction"""
+    config = config or get_config()
+    return {
+        'max_pages': config.get("PDF_MAX_PAGES", PDF_MAX_PAGES),
+        'max_bytes': config.get("PDF_MAX_BYTES", PDF_MAX_BYTES),
+        'time_budget': config.get("PDF_TIME_BUDGET", PDF_TIME_BUDGET),
+        'parallel_min_pages': config.get("PDF_PARALLEL_MIN_PAGES", PDF_PARALLEL_MIN_PAGES),
+        'workers': config.get("PDF_WORKERS", min(4, os.cpu_count() or 1)),
+    }
+
+def iter_pdf_pages(reader, start, stop, max_bytes, deadline):
+    """
+    Yields (text, cut) for pages start..stop-1, one page at a time, until a budget is used up.
+
+    Args:
+        reader: PdfReader
+        max_bytes: utf-8 bytes of text to yield at most (the last page is cut to fit; cut is then True)
+        deadline: time.time() after which no further page is read
     """
-    Extracts text from a PDF file object.
+    remaining = max_bytes
+    for index in range(start, stop):
+        if remaining <= 0 or time.time() >= deadline:
+            return
+        text = reader.pages[index].extract_text() or ""
+        size = len(text.encode("utf-8"))
+        cut = size > remaining
+        if cut:
+            text = text.encode("utf-8")[:remaining].decode("utf-8", errors="ignore")
+        remaining -= size
+        yield text, cut
+
+def _extract_page_range(path, start, stop, max_bytes, deadline):
+    """
+    Process pool task: (text, cut) of the pages of one page range (pages past a budget are left out).
+    Stops early once the caller has removed the file at path, i.e. no longer needs the text.
     """
+    pages = []
+    for page in iter_pdf_pages(PdfReader(path), start, stop, max_bytes, deadline):
+        pages.append(page)
+        if not os.path.exists(path):
+            break
+    return pages
+
+# page-range workers, shared by every document of this process (spawned, so they don't inherit the app's threads)
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+def _get_pdf_pool(workers):
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pdf_pool
+
+def _reset_pdf_pool():
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is not None:
+            _pdf_pool.shutdown(wait=False, cancel_futures=True)
+        _pdf_pool = None
+
+def _iter_pdf_pages_parallel(file_obj, pages, budget, deadline):
+    """
+    Yields (text, cut) of the pages in order while the page ranges are extracted in the pdf pool.
+
+    Each range stops on its own at the byte budget or the deadline and returns the
+    pages it has read; a range that hasn't returned shortly after the deadline is given up.
+    The workers read the document from one temp file rather than each getting a copy of
+    its bytes; removing that file once the byte budget is used up stops ranges still running.
+    """
+    file_obj.seek(0)
+    fd, path = tempfile.mkstemp(prefix="sokrates-", suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        shutil.copyfileobj(file_obj, f)
+    # a few ranges per worker, so one slow range doesn't hold the others up
+    size = math.ceil(pages / (budget['workers'] * 2))
+    pool = _get_pdf_pool(budget['workers'])
+    ranges = [(start, min(start + size, pages)) for start in range(0, pages, size)]
+    futures = []
     try:
+        for start, stop in ranges:
+            futures.append(pool.submit(_extract_page_range, path, start, stop, budget['max_bytes'], deadline))
+        remaining = budget['max_bytes']
+        for (start, stop), future in zip(ranges, futures):
+            try:
+                # ranges stop at the deadline on their own; the slack covers the page in progress
+                range_pages = future.result(timeout=max(deadline - time.time(), 0) + PDF_DEADLINE_SLACK)
+            except FutureTimeoutError:
+                return
+            for text, cut in range_pages:
+                yield text, cut
+                remaining -= len(text.encode("utf-8"))
+                if remaining <= 0 or cut:
+                    return
+            # a range cut short by a budget ends the document
+            if len(range_pages) < stop - start:
+                return
+    finally:
+        for future in futures:
+            future.cancel()
+        os.unlink(path)
+
+@traced("io")
+def extract_text_from_pdf(file_obj, config=None):
+    """
+    Extracts text from a PDF file object, page by page, within the page, byte and
+    time budgets (see pdf_budget). Long documents are read in parallel page ranges.
+    A note at the end says when pages were left out or the text was cut to the byte budget.
+    """
+    try:
+        budget = pdf_budget(config)
+        deadline = time.time() + budget['time_budget']
         reader = PdfReader(file_obj)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
+        total = len(reader.pages)
+        pages = min(total, budget['max_pages'])
+        # pool workers (e.g. the command line's) already run in parallel
+        parallel = (
+            pages >= budget['parallel_min_pages'] and budget['workers'] > 1
+            and multiprocessing.parent_process() is None
+        )
+        with span("pdf_pages", "io", pages=total, parallel=parallel) as args:
+            texts = []
+            used = 0
+            truncated = False  # the last page read was cut to fit the byte budget
+            try:
+                page_texts = (
+                    _iter_pdf_pages_parallel(file_obj, pages, budget, deadline) if parallel
+                    else iter_pdf_pages(reader, 0, pages, budget['max_bytes'], deadline)
+                )
+                for text, cut in page_texts:
+                    size = len(text.encode("utf-8"))
+                    if used + size > budget['max_bytes']:
+                        text = text.encode("utf-8")[:budget['max_bytes'] - used].decode("utf-8", errors="ignore")
+                        cut = True
+                    texts.append(text)
+                    used += size
+                    if cut:
+                        truncated = True
+                        break
+                # lets the parallel reader stop the ranges still running
+                page_texts.close()
+            except BrokenProcessPool:
+                _reset_pdf_pool()
+                pages_read = list(iter_pdf_pages(reader, 0, pages, budget['max_bytes'], deadline))
+                texts = [text for text, _ in pages_read]
+                truncated = any(cut for _, cut in pages_read)
+            args['read'] = len(texts)
+            args['truncated'] = truncated
+
+        text = "".join(page + "\n" for page in texts)
+        if truncated:
+            text += f"[PDF truncated: read {len(texts)} of {total} pages, text cut at {budget['max_bytes']} bytes]\n"
+        elif len(texts) < total:
+            text += f"[PDF truncated: read {len(texts)} of {total} pages]\n"
         return text
     except Exception as e:
         return f"Error reading PDF: {str(e)}"
 
+@traced("http")
 def extract_text_from_url(url):
     """
     Extracts main text content from a URL.
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the tests import the app's modules as src.*, like the app and the command line do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,167 @@
+"""
+Job API tests for SOKRATES
+Runs src.job_server on a free port against the offline stub model
+"""
+
+import http.client
+import json
+import threading
+import time
+
+import pytest
+
+from src.config import SokratesConfig
+from src.job_server import make_server
+
+CANDIDATE = {
+    'name': "Ada Lovelace",
+    'notes': "Built compilers in Python and Rust since 2015. Led a team of 5.",
+    'documents': [{'name': "cv.txt", 'text': "Learned Go in two weeks."}],
+    'answers': ["first answer", "second answer", "third answer"],
+}
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # caches and traces default to paths relative to the working directory
+    monkeypatch.chdir(tmp_path)
+
+
+def serve(workers=2, max_queued=8, **settings):
+    config = SokratesConfig(dict({'LLM_PROVIDER': "stub"}, **settings))
+    server = make_server(port=0, workers=workers, max_queued=max_queued, config=config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def server():
+    server = serve()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def request(server, method, path, body=None, headers=None):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=30)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        connection.close()
+
+
+def submit(server, candidate=CANDIDATE):
+    return request(server, "POST", "/jobs", json.dumps(candidate), {"Content-Type": "application/json"})
+
+
+def wait_for(server, job_id, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        _, _, body = request(server, "GET", f"/jobs/{job_id}")
+        job = json.loads(body)
+        if job['status'] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_submit_poll_and_results(server):
+    status, headers, body = submit(server)
+    assert status == 202
+    job_id = json.loads(body)['job_id']
+    assert headers['Location'] == f"/jobs/{job_id}"
+
+    job = wait_for(server, job_id)
+    assert job['status'] == "succeeded", job['error']
+
+    status, headers, html = request(server, "GET", f"/jobs/{job_id}/result.html")
+    assert status == 200
+    assert headers['Content-Type'].startswith("text/html")
+    assert html.startswith(b"<!DOCTYPE html>")
+
+    status, _, body = request(server, "GET", f"/jobs/{job_id}/result.json")
+    result = json.loads(body)
+    assert status == 200
+    assert result['job_id'] == job_id
+    assert result['name'] == "Ada Lovelace"
+    assert any(message['role'] == "user" and message['content'] == "first answer" for message in result['transcript'])
+
+
+def test_unknown_job_answers_404(server):
+    status, _, _ = request(server, "GET", "/jobs/nope")
+    assert status == 404
+    status, _, _ = request(server, "GET", "/jobs/nope/result.html")
+    assert status == 404
+
+
+def test_queue_full_answers_429():
+    server = serve(workers=1, max_queued=1, STUB_LATENCY=0.5)
+    try:
+        statuses = [submit(server)[0] for _ in range(3)]
+        assert 429 in statuses
+        assert statuses[0] == 202
+        # a full queue answers before reading the body, so even an invalid one gets 429
+        status, headers, _ = request(server, "POST", "/jobs", b"{not json")
+        assert status == 429
+        assert headers['Retry-After'] == "30"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.parametrize("body", [
+    b"{not json",
+    b"[]",
+    json.dumps({'answers': []}).encode("utf-8"),
+    json.dumps({'answers': ["a"], 'documents': 5}).encode("utf-8"),
+    json.dumps({'answers': ["a"], 'documents': [{'name': 5, 'content_base64': "YQ=="}]}).encode("utf-8"),
+    json.dumps({'answers': ["a"], 'documents': [{'name': "cv.pdf", 'content_base64': "not base64!"}]}).encode("utf-8"),
+    json.dumps({'answers': ["a"], 'documents': [{'name': "cv.txt"}]}).encode("utf-8"),
+    json.dumps({'answers': ["a"], 'notes': {'free': "text"}}).encode("utf-8"),
+    json.dumps({'answers': ["a"], 'name': 5}).encode("utf-8"),
+    json.dumps({'answers': ["a"], 'github': ["ada"]}).encode("utf-8"),
+    json.dumps({'answers': ["a"], 'urls': "https://example.com"}).encode("utf-8"),
+])
+def test_invalid_candidates_answer_400(server, body):
+    status, _, response = request(server, "POST", "/jobs", body)
+    assert status == 400
+    assert json.loads(response)['error']
+    # the server is still answering afterwards
+    assert request(server, "GET", "/health")[0] == 200
+
+
+def test_invalid_content_length_answers_400(server):
+    status, _, _ = request(server, "POST", "/jobs", b"{}", {"Content-Length": "abc"})
+    assert status == 400
+
+
+def read_events(server, job_id, last_event_id=None):
+    """(id, event, data) of every server-sent event on the job's stream"""
+    headers = {} if last_event_id is None else {"Last-Event-ID": str(last_event_id)}
+    status, headers, body = request(server, "GET", f"/jobs/{job_id}/events", headers=headers)
+    assert status == 200
+    assert headers['Content-Type'] == "text/event-stream"
+    events = []
+    for block in body.decode("utf-8").split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if line and not line.startswith(":"))
+        if fields:
+            events.append((fields.get('id'), fields['event'], json.loads(fields['data'])))
+    return events
+
+
+def test_events_resume_after_last_event_id(server):
+    job_id = json.loads(submit(server)[2])['job_id']
+    wait_for(server, job_id)
+
+    events = read_events(server, job_id)
+    progress = [event for event in events if event[1] == "progress"]
+    assert [event[0] for event in progress] == [str(index) for index in range(len(progress))]
+    assert events[-1][1] == "done"
+    assert events[-1][2]['status'] == "succeeded"
+    assert len(progress) > 3
+
+    resumed = read_events(server, job_id, last_event_id=2)
+    assert resumed[:-1] == progress[3:]
+    assert resumed[-1][1] == "done"